@@ -8,7 +8,7 @@ class AISquirrel(Squirrel):
     def __init__(self, coordinate, board):
         super(Squirrel, self).__init__(coordinate, board)
         self.nuts = 0
-        self.pic = pygame.image.load(os.path.join("imgs/squirrelright.png"))
+        self.pic = loadImage("imgs/squirrelright.png")
         self.priority = Priority.player
         super().setSpeed((0,0))
         self.tileType = "squirrel"
@@ -59,7 +59,8 @@ class AISquirrel(Squirrel):
         if (x < 0): return -x
         return x
 
-    # Uses |x| + |y| fuel
+    # Uses |x| + |y| fuel, on top of what Squirrel.move takes (see
+    # `moveFuel`)
     def move(self,x,y):
         print('at move')
         if (x < -1 or x > 1 or y < -1 or y > 1):
@@ -67,7 +68,7 @@ class AISquirrel(Squirrel):
             raise InvalidRequestException()
         if self.canMoveTo(self.getX() + x, self.getY() + y):
             super().move(x,y)
-            self.board.state.decrementFuel(self.abs(x) + self.abs(y))
+            self.board.state.decrementFuel(moveFuel(x, y) - stepFuel)
         else:
             print("here2")
             raise InvalidRequestException()
@@ -92,6 +93,7 @@ class AISquirrel(Squirrel):
             self.board.addTile(stone)
             self.board.registerForClockTick(stone)
             self.board.state.decrementFuel((self.abs(x) + self.abs(y)) * 3)
+            self.board.state.countStoneFired()
         else:
             raise InvalidRequestException()
 
@@ -183,8 +185,10 @@ class MyAISquirrel(AISquirrel):
             print('getting the position of the exit tile')
             print(self.getExit())
 
-        x = randint(-1, 1)
-        y = randint(-1, 1)
+        # The board's random numbers, so that seeded games (see
+        # simulate.py) play out the same way every time
+        x = self.board.rng.randint(-1, 1)
+        y = self.board.rng.randint(-1, 1)
         print("I am doing something boring..")
         print(x,y)
         if (self.canMove(x,y)):
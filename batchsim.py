@@ -0,0 +1,546 @@
+# Batched headless simulation of HaverQuest, using NumPy
+#
+# A Simulation (see simulate.py) plays one game on a GameBoard full of
+# Python objects, and spends nearly all of its time calling their
+# methods. This module plays many games at once, in lockstep: the state
+# of every game is kept in NumPy arrays with one row per game (the
+# squirrels' positions and fuel, the ferrets', the stones', ...), and a
+# clock tick is a few dozen array operations covering all of the games.
+#
+# The rules are those of players.py and ai.py, quirks included (see
+# `BatchedSimulation.moveStones`), so a game here goes exactly as it
+# would on a GameBoard given the same moves and the same aim for the
+# ferrets' stones. Instead of being an AI class, the squirrels are
+# driven from outside, with an action per game per tick (see `Action`).
+
+import numpy as np
+
+import players
+from players import Priority, fireDirections, stoneSpeed, moveFuel
+from ai import AISquirrel
+from simulate import buildLevel
+
+# The actions a squirrel can take on a tick, one for each call an
+# AISquirrel can make: waiting (making no call at all), `move` and
+# `fireStone` in each of the 8 directions, and the sense calls that
+# cost fuel. `getStones` and `canMove` are free, so their answers come
+# with every observation instead. Directions are numbered as in
+# `fireDirections`.
+class Action:
+    wait           = 0
+    getFerrets     = 17
+    getHealthPacks = 18
+    getExit        = 19
+    count          = 20
+
+    # The fuel each sense call costs (see AISquirrel)
+    senseCosts = {getFerrets: 5, getHealthPacks: 20, getExit: 30}
+
+    # The action that calls move(dx, dy)
+    @staticmethod
+    def move(dx, dy):
+        return 1 + fireDirections.index((dx, dy))
+
+    # The action that calls fireStone(dx, dy)
+    @staticmethod
+    def fireStone(dx, dy):
+        return 9 + fireDirections.index((dx, dy))
+
+# Directions as arrays, indexed by direction number
+directionX = np.array([d[0] for d in fireDirections])
+directionY = np.array([d[1] for d in fireDirections])
+
+# The speeds a SquareAIFerret walks at, in the order it turns through
+# them (see `SquareAIFerret.move`)
+ferretSpeedX = np.array([5, 0, -5, 0])
+ferretSpeedY = np.array([0, -5, 0, 5])
+
+# `count` games of HaverQuest played side by side. `levels` is a level
+# number, or a list of one per game, and games of different sizes are
+# laid out on a grid big enough for the largest. Each game ends when
+# its squirrel wins or runs out of fuel, after an illegal action (one
+# that would raise InvalidRequestException), or after `maxTicks` ticks.
+#
+# `reset` starts games over and `step` plays one clock tick of every
+# game that isn't over, taking each squirrel's actions for the tick.
+# Both return an observation: a dictionary of arrays with one row per
+# game.
+#
+#   - position -- (x, y) of the squirrel.
+#
+#   - fuel -- The fuel left.
+#
+#   - canMove -- Whether the squirrel can move in each direction (the
+#   answer to `canMove`).
+#
+#   - stones -- The (x, y) of the stones ferrets have fired that are
+#   still flying, oldest first, padded with (-1, -1) (the answer to
+#   `getStones`).
+#
+#   - ferrets, healthPacks, exit -- The answers to `getFerrets`,
+#   `getHealthPacks` and `getExit` in the games that called them this
+#   tick, and -1 elsewhere. Dead ferrets come back as (-1, -1).
+#
+# The state of the games is kept in the arrays named below, which can
+# be read between ticks; positions are in board coordinates. Stones
+# live in slots, with `queue` holding the order they hear clock ticks
+# in (see `moveStones`), and the arrays of stones and of the queue grow
+# as more are needed.
+class BatchedSimulation:
+    def __init__(self, cfg, tileFactory, count, levels=1, seed=None, fps=10,
+                 maxTicks=10000, winReward=100):
+        if (isinstance(levels, int)):
+            levels = [levels] * count
+        if (len(levels) != count):
+            raise ValueError("need a level for each of the {} games".format(count))
+        for n in levels:
+            if (not 1 <= n <= len(cfg["levels"])):
+                raise ValueError("there is no level {}".format(n))
+        self.count     = count
+        self.fps       = fps
+        self.maxTicks  = maxTicks
+        self.winReward = winReward
+        self.rng       = np.random.default_rng(seed)
+        self.levelOf   = np.array(levels)
+        self.templates = {}
+        # The levels are only read, so their tiles needn't load pictures
+        loadImages = players.loadImages
+        players.loadImages = False
+        try:
+            for n in set(levels):
+                self.templates[n] = self.template(cfg, tileFactory, n)
+        finally:
+            players.loadImages = loadImages
+        templates = self.templates.values()
+
+        # The grid has a border of wall all round, so moving off the
+        # edge of a board is the same as moving into a wall
+        self.width  = max(t["width"] for t in templates) + 2
+        self.height = max(t["height"] for t in templates) + 2
+        self.size   = self.width * self.height
+        ferrets = max(len(t["ferrets"]) for t in templates)
+        packs   = max(len(t["packs"]) for t in templates)
+        self.blocked = np.ones((count, self.size), dtype=bool)
+
+        # The squirrels, and the games as a whole
+        self.x           = np.zeros(count, dtype=int)
+        self.y           = np.zeros(count, dtype=int)
+        self.fuel        = np.zeros(count, dtype=int)
+        self.aiTicks     = np.zeros(count, dtype=int)
+        self.ticks       = np.zeros(count, dtype=int)
+        self.over        = np.zeros(count, dtype=bool)
+        self.won         = np.zeros(count, dtype=bool)
+        self.error       = np.zeros(count, dtype=bool)
+        self.stonesFired = np.zeros(count, dtype=int)
+        self.ferretHits  = np.zeros(count, dtype=int)
+        self.stoneHits   = np.zeros(count, dtype=int)
+        self.exitX       = np.zeros(count, dtype=int)
+        self.exitY       = np.zeros(count, dtype=int)
+
+        # The health packs, which stay listed after being picked up
+        self.packX  = np.zeros((count, packs), dtype=int)
+        self.packY  = np.zeros((count, packs), dtype=int)
+        self.packOn = np.zeros((count, packs), dtype=bool)
+
+        # The ferrets, in the order they hear clock ticks. `ferretDir`
+        # indexes `ferretSpeedX`/`ferretSpeedY`, `ferretMoves` is
+        # SquareAIFerret's `numTicks` and `ferretFires` its
+        # `ticksSinceFire`.
+        self.ferretX      = np.zeros((count, ferrets), dtype=int)
+        self.ferretY      = np.zeros((count, ferrets), dtype=int)
+        self.ferretDir    = np.zeros((count, ferrets), dtype=int)
+        self.ferretTicksX = np.zeros((count, ferrets))
+        self.ferretTicksY = np.zeros((count, ferrets))
+        self.ferretMoves  = np.zeros((count, ferrets), dtype=int)
+        self.ferretFires  = np.zeros((count, ferrets), dtype=int)
+        self.ferretHp     = np.zeros((count, ferrets), dtype=int)
+        self.ferretAlive  = np.zeros((count, ferrets), dtype=bool)
+
+        # The stones. `stoneEntries` is the number of times a stone is
+        # in the queue (0 for a free slot), `stoneListed` whether it is
+        # in the board's `stones` list, and `stoneSerial` orders stones
+        # by when they were fired.
+        self.stoneCapacity = 0
+        self.stoneSerial   = np.zeros((count, 0), dtype=int)
+        self.growStones(4)
+        self.serial = 0
+        self.queue       = np.full((count, 8), -1, dtype=int)
+        self.queueLength = np.zeros(count, dtype=int)
+
+        # What the sense calls found this tick, see `observe`
+        self.sensedFerrets = np.full((count, ferrets, 2), -1, dtype=int)
+        self.sensedPacks   = np.zeros(count, dtype=bool)
+        self.sensedExit    = np.zeros(count, dtype=bool)
+        self.reset()
+
+    # The starting state of level `n`, read off a board built for it
+    def template(self, cfg, tileFactory, n):
+        board, squirrel, endTile = buildLevel(cfg, tileFactory, n, squirrelClass=AISquirrel)
+        mask = np.frombuffer(board.blockedMask(squirrel.getPriority()), dtype=np.uint8)
+        ferrets = []
+        for ferret in board.ferrets:
+            direction = list(zip(ferretSpeedX, ferretSpeedY)).index(ferret.speed)
+            ferrets.append((ferret.getX(), ferret.getY(), direction, ferret.hp))
+        return {
+            "width":   board.width,
+            "height":  board.height,
+            "blocked": mask.reshape(board.width, board.height) != 0,
+            "start":   (squirrel.getX(), squirrel.getY()),
+            "fuel":    board.state.getFuel(),
+            "exit":    (endTile.getX(), endTile.getY()),
+            "ferrets": ferrets,
+            "packs":   [(p.getX(), p.getY()) for p in board.healthpacks],
+        }
+
+    # Make room for at least `capacity` stones per game
+    def growStones(self, capacity):
+        old = self.stoneCapacity
+        if (capacity <= old):
+            return
+        capacity = max(capacity, 2 * old)
+        def grow(name, dtype, fill=0):
+            array = np.full((self.count, capacity), fill, dtype=dtype)
+            if (old > 0):
+                array[:, :old] = getattr(self, name)
+            setattr(self, name, array)
+        grow("stoneX", int)
+        grow("stoneY", int)
+        grow("stoneSpeedX", float)
+        grow("stoneSpeedY", float)
+        grow("stoneTicksX", float)
+        grow("stoneTicksY", float)
+        grow("stoneEntries", int)
+        grow("stoneListed", bool, False)
+        grow("stoneSerial", int)
+        self.stoneCapacity = capacity
+
+    # Make room for at least `length` entries in each game's queue
+    def growQueue(self, length):
+        old = self.queue.shape[1]
+        if (length <= old):
+            return
+        queue = np.full((self.count, max(length, 2 * old)), -1, dtype=int)
+        queue[:, :old] = self.queue
+        self.queue = queue
+
+    # Start the games numbered in `games` (all of them if None) over,
+    # reseeding the ferrets' aim first if given a `seed`. Returns an
+    # observation.
+    def reset(self, games=None, seed=None):
+        if (seed is not None):
+            self.rng = np.random.default_rng(seed)
+        if (games is None):
+            games = np.arange(self.count)
+        games = np.asarray(games)
+        if (games.dtype == bool):
+            games = np.nonzero(games)[0]
+        for n, t in self.templates.items():
+            g = games[self.levelOf[games] == n]
+            if (len(g) == 0):
+                continue
+            blocked = np.ones((self.width, self.height), dtype=bool)
+            blocked[1:t["width"] + 1, 1:t["height"] + 1] = t["blocked"]
+            self.blocked[g] = blocked.ravel()
+            self.x[g], self.y[g] = t["start"]
+            self.exitX[g], self.exitY[g] = t["exit"]
+            self.fuel[g] = t["fuel"]
+            for name in ["aiTicks", "ticks", "stonesFired", "ferretHits", "stoneHits"]:
+                getattr(self, name)[g] = 0
+            for name in ["over", "won", "error"]:
+                getattr(self, name)[g] = False
+            self.packOn[g] = False
+            for i, (x, y) in enumerate(t["packs"]):
+                self.packX[g, i], self.packY[g, i] = x, y
+                self.packOn[g, i] = True
+            self.ferretAlive[g] = False
+            for i, (x, y, direction, hp) in enumerate(t["ferrets"]):
+                self.ferretX[g, i], self.ferretY[g, i] = x, y
+                self.ferretDir[g, i] = direction
+                self.ferretHp[g, i]  = hp
+                self.ferretAlive[g, i] = True
+            for name in ["ferretTicksX", "ferretTicksY", "ferretMoves", "ferretFires"]:
+                getattr(self, name)[g] = 0
+            self.stoneEntries[g] = 0
+            self.stoneListed[g]  = False
+            self.queue[g]        = -1
+            self.queueLength[g]  = 0
+        self.sensedFerrets[games] = -1
+        self.sensedPacks[games]   = False
+        self.sensedExit[games]    = False
+        return self.observe()
+
+    # Which games are over (or stopped)
+    def done(self):
+        return self.over | self.error | (self.ticks >= self.maxTicks)
+
+    # Whether the cells at (x, y) of games `g` are walled off
+    def blockedAt(self, g, x, y):
+        return self.blocked.ravel()[g * self.size + (x + 1) * self.height + y + 1]
+
+    # The directions (numbered as in `fireDirections`) of the stones
+    # the ferrets of games `g` fire, in the order they fire them. This
+    # is where SquareAIFerret.fireStone calls `board.rng`.
+    def aim(self, g):
+        return self.rng.integers(0, 8, len(g))
+
+    # Play one clock tick of every game that isn't over. `actions`
+    # holds an action (see `Action`) for each game, or a row of actions
+    # for each game, taken in order; games that are over ignore
+    # theirs. Returns (observation, reward, done): the reward is the
+    # fuel gained (negative when lost) over the tick, plus `winReward`
+    # in a game that is won on it.
+    def step(self, actions):
+        actions = np.asarray(actions)
+        if (actions.ndim == 1):
+            actions = actions[:, None]
+        if (actions.ndim != 2 or actions.shape[0] != self.count):
+            raise ValueError("need actions for each of the {} games".format(self.count))
+        if (((actions < 0) | (actions >= Action.count)).any()):
+            raise ValueError("unknown action")
+        going  = ~self.done()
+        fuel   = self.fuel.copy()
+        won    = self.won.copy()
+        self.sensedFerrets[:] = -1
+        self.sensedPacks[:]   = False
+        self.sensedExit[:]    = False
+        self.ticks[going] += 1
+        going = self.actSquirrels(actions, going)
+        self.moveFerrets(going)
+        self.moveStones(going)
+        reward = self.fuel - fuel + self.winReward * (self.won & ~won)
+        return (self.observe(), reward, self.done())
+
+    # The squirrels' part of a tick: AISquirrel.clockTick, then the
+    # actions. An illegal action ends the game there and then, as the
+    # exception it raises would. Returns the games still going.
+    def actSquirrels(self, actions, going):
+        regen = going & (self.aiTicks + 1 > 5)
+        self.aiTicks[going] += 1
+        self.fuel[regen]    += 3
+        self.aiTicks[regen] -= 5
+        going = going.copy()
+        for column in actions.T:
+            action = np.where(going, column, Action.wait)
+            g = np.nonzero((action >= 1) & (action < 17))[0]
+            if (len(g) > 0):
+                d  = (action[g] - 1) % 8
+                dx = directionX[d]
+                dy = directionY[d]
+                tx = self.x[g] + dx
+                ty = self.y[g] + dy
+                illegal = self.blockedAt(g, tx, ty)
+                self.error[g[illegal]] = True
+                going[g[illegal]]      = False
+                legal = ~illegal
+                moving = legal & (action[g] < 9)
+                self.moveSquirrels(g[moving], tx[moving], ty[moving],
+                                   moveFuel(dx[moving], dy[moving]))
+                firing = legal & (action[g] >= 9)
+                f = g[firing]
+                self.addStones(f, tx[firing], ty[firing], dx[firing] * stoneSpeed[0],
+                               dy[firing] * stoneSpeed[0], False)
+                self.fuel[f] -= 3 * (np.abs(dx[firing]) + np.abs(dy[firing]))
+                self.stonesFired[f] += 1
+                self.over[f] |= self.fuel[f] <= 0
+            for code, cost in Action.senseCosts.items():
+                g = np.nonzero(action == code)[0]
+                if (len(g) == 0):
+                    continue
+                self.fuel[g] -= cost
+                self.over[g] |= self.fuel[g] <= 0
+                if (code == Action.getFerrets):
+                    alive = self.ferretAlive[g]
+                    self.sensedFerrets[g, :, 0] = np.where(alive, self.ferretX[g], -1)
+                    self.sensedFerrets[g, :, 1] = np.where(alive, self.ferretY[g], -1)
+                elif (code == Action.getHealthPacks):
+                    self.sensedPacks[g] = True
+                else:
+                    self.sensedExit[g] = True
+        return going
+
+    # Move the squirrels of games `g` to (x, y), picking up any health
+    # packs there and winning at the exit, then take `cost` fuel
+    # (Squirrel.move takes 1 and AISquirrel.move |dx| + |dy|)
+    def moveSquirrels(self, g, x, y, cost):
+        self.x[g] = x
+        self.y[g] = y
+        packs = self.packOn[g] & (self.packX[g] == x[:, None]) & (self.packY[g] == y[:, None])
+        self.fuel[g]   += 15 * packs.sum(axis=1)
+        self.packOn[g] &= ~packs
+        win = (self.exitX[g] == x) & (self.exitY[g] == y)
+        self.won[g[win]]  = True
+        self.over[g[win]] = True
+        self.fuel[g] -= cost
+        self.over[g] |= self.fuel[g] <= 0
+
+    # Fire a stone from (x, y) at speed (speedX, speedY) in each of the
+    # games `g` (one each), appending it to the queue twice, once for
+    # each time a fired stone registers for clock ticks. `listed` says
+    # whether it goes on the board's `stones` list, as ferrets' stones
+    # do.
+    def addStones(self, g, x, y, speedX, speedY, listed):
+        if (len(g) == 0):
+            return
+        free = self.stoneEntries[g] == 0
+        if (not free.any(axis=1).all()):
+            self.growStones(self.stoneCapacity + 1)
+            free = self.stoneEntries[g] == 0
+        s = free.argmax(axis=1)
+        self.stoneX[g, s]       = x
+        self.stoneY[g, s]       = y
+        self.stoneSpeedX[g, s]  = speedX
+        self.stoneSpeedY[g, s]  = speedY
+        self.stoneTicksX[g, s]  = 0
+        self.stoneTicksY[g, s]  = 0
+        self.stoneEntries[g, s] = 2
+        self.stoneListed[g, s]  = listed
+        self.stoneSerial[g, s]  = self.serial + np.arange(len(g))
+        self.serial += len(g)
+        end = self.queueLength[g]
+        self.growQueue(end.max() + 2)
+        self.queue[g, end]     = s
+        self.queue[g, end + 1] = s
+        self.queueLength[g]   += 2
+
+    # The arithmetic of `Player.clockTick` for tick counters `ticksX`,
+    # `ticksY` and speeds `speedX`, `speedY`, returning the new
+    # counters and the move (mx, my)
+    def advance(self, ticksX, ticksY, speedX, speedY):
+        ticksX = ticksX + speedX / self.fps
+        ticksY = ticksY + speedY / self.fps
+        mx = np.where(np.abs(ticksX) > 1, np.where(speedX >= 0, 1, -1), 0)
+        my = np.where(np.abs(ticksY) > 1, np.where(speedY >= 0, 1, -1), 0)
+        return (ticksX - mx, ticksY - my, mx, my)
+
+    # The ferrets' part of a tick, one ferret of every game at a time:
+    # Player.clockTick with the turns and firing of SquareAIFerret.move
+    def moveFerrets(self, going):
+        for f in range(self.ferretX.shape[1]):
+            g = np.nonzero(going & self.ferretAlive[:, f])[0]
+            if (len(g) == 0):
+                continue
+            d = self.ferretDir[g, f]
+            ticksX, ticksY, mx, my = self.advance(self.ferretTicksX[g, f], self.ferretTicksY[g, f],
+                                                  ferretSpeedX[d], ferretSpeedY[d])
+            self.ferretTicksX[g, f] = ticksX
+            self.ferretTicksY[g, f] = ticksY
+            x  = self.ferretX[g, f]
+            y  = self.ferretY[g, f]
+            tx = x + mx
+            ty = y + my
+            moving = ((mx != 0) | (my != 0)) & ~self.blockedAt(g, tx, ty)
+            g, x, y, tx, ty = g[moving], x[moving], y[moving], tx[moving], ty[moving]
+            turn = self.ferretMoves[g, f] % 5 == 0
+            self.ferretDir[g[turn], f]   = (self.ferretDir[g[turn], f] + 1) % 4
+            self.ferretMoves[g[turn], f] = 0
+            self.ferretMoves[g, f] += 1
+            self.ferretFires[g, f] += 1
+            # Fire from the cell the ferret is leaving
+            firing = self.ferretFires[g, f] % 7 == 1
+            if (firing.any()):
+                shooters = g[firing]
+                d  = self.aim(shooters)
+                sx = x[firing] + directionX[d]
+                sy = y[firing] + directionY[d]
+                ok = ~self.blockedAt(shooters, sx, sy)
+                d  = d[ok]
+                self.addStones(shooters[ok], sx[ok], sy[ok], directionX[d] * stoneSpeed[0],
+                               directionY[d] * stoneSpeed[1], True)
+            self.ferretX[g, f] = tx
+            self.ferretY[g, f] = ty
+            hit = g[(self.x[g] == tx) & (self.y[g] == ty)]
+            self.fuel[hit]       -= 15
+            self.ferretHits[hit] += 1
+            self.over[hit] |= self.fuel[hit] <= 0
+
+    # The stones' part of a tick: `Stone.clockTick` for each entry of
+    # each game's queue in turn, with every game taking a step down its
+    # queue at once.
+    #
+    # GameBoard.clockTick walks a list that its listeners take
+    # themselves off of, and each stone is on that list twice, so:
+    #
+    #   - A stone moves twice per tick, and one that can't move is taken
+    #   off the board and the list once, leaving a "ghost" entry that
+    #   still gets ticks. A ghost that moves is back on the board (but
+    #   not in `board.stones`); the next time it can't move it is gone.
+    #
+    #   - Whenever a listener is taken off the list (a stone that can't
+    #   move, or a ferret a stone kills) the listener after the current
+    #   one misses the tick.
+    def moveStones(self, going):
+        queue    = self.queue
+        length   = np.where(going, self.queueLength, 0)
+        position = np.zeros(self.count, dtype=int)
+        removed  = np.zeros(queue.shape, dtype=bool)
+        while True:
+            g = np.nonzero(position < length)[0]
+            if (len(g) == 0):
+                break
+            i = position[g]
+            s = queue[g, i]
+            ticksX, ticksY, mx, my = self.advance(self.stoneTicksX[g, s], self.stoneTicksY[g, s],
+                                                  self.stoneSpeedX[g, s], self.stoneSpeedY[g, s])
+            self.stoneTicksX[g, s] = ticksX
+            self.stoneTicksY[g, s] = ticksY
+            tx = self.stoneX[g, s] + mx
+            ty = self.stoneY[g, s] + my
+            stuck  = self.blockedAt(g, tx, ty)
+            moving = ~stuck & ((mx != 0) | (my != 0))
+            skip   = stuck.astype(int)
+
+            m, tx, ty = g[moving], tx[moving], ty[moving]
+            self.stoneX[m, s[moving]] = tx
+            self.stoneY[m, s[moving]] = ty
+            hit = m[(self.x[m] == tx) & (self.y[m] == ty)]
+            self.fuel[hit]      -= 10
+            self.stoneHits[hit] += 1
+            self.over[hit] |= self.fuel[hit] <= 0
+            if (self.ferretX.shape[1] > 0):
+                ferrets = (self.ferretAlive[m] & (self.ferretX[m] == tx[:, None])
+                           & (self.ferretY[m] == ty[:, None]))
+                self.ferretHp[m] -= 15 * ferrets
+                killed = ferrets & (self.ferretHp[m] <= 0)
+                self.ferretAlive[m] &= ~killed
+                skip[moving] += killed.sum(axis=1)
+
+            # A stone's two entries are always next to one another, so
+            # it doesn't matter which of them is taken out
+            stopped = g[stuck]
+            self.stoneEntries[stopped, s[stuck]] -= 1
+            self.stoneListed[stopped, s[stuck]]   = False
+            removed[stopped, i[stuck]] = True
+            position[g] += 1 + skip
+
+        if (removed.any()):
+            keep = (np.arange(queue.shape[1]) < self.queueLength[:, None]) & ~removed
+            order = np.argsort(~keep, axis=1, kind="stable")
+            self.queue = np.take_along_axis(queue, order, axis=1)
+            self.queueLength = keep.sum(axis=1)
+            self.queue[np.arange(queue.shape[1]) >= self.queueLength[:, None]] = -1
+
+    # The observation of every game, as described above
+    def observe(self):
+        g = np.arange(self.count)
+        canMove = ~self.blockedAt(g[:, None], self.x[:, None] + directionX,
+                                  self.y[:, None] + directionY)
+        listed = self.stoneListed
+        order  = np.argsort(np.where(listed, self.stoneSerial, np.iinfo(int).max),
+                            axis=1, kind="stable")
+        shown  = np.take_along_axis(listed, order, axis=1)
+        stones = np.stack([np.take_along_axis(self.stoneX, order, axis=1),
+                           np.take_along_axis(self.stoneY, order, axis=1)], axis=2)
+        stones[~shown] = -1
+        packs = np.stack([self.packX, self.packY], axis=2)
+        packs[~self.sensedPacks] = -1
+        exit = np.stack([self.exitX, self.exitY], axis=1)
+        exit[~self.sensedExit] = -1
+        return {
+            "position":    np.stack([self.x, self.y], axis=1),
+            "fuel":        self.fuel.copy(),
+            "canMove":     canMove,
+            "stones":      stones,
+            "ferrets":     self.sensedFerrets.copy(),
+            "healthPacks": packs,
+            "exit":        exit,
+        }
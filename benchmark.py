@@ -0,0 +1,1031 @@
+# CS 107, Fall 2018
+# Microbenchmarks for HaverQuest
+#
+# Run as `python benchmark.py <name>`, where <name> is one of the
+# benchmarks listed at the bottom of this file. With no name, every
+# benchmark is run.
+
+import sys, os, json, time, random, tempfile, tracemalloc
+
+from pqueue import PriorityQueue
+
+# The original list-based priority queue, kept here as the baseline
+# that the current implementation is measured against.
+class ListPriorityQueue:
+    def __init__(self):
+        self.lst = []
+
+    def add(self,element,priority):
+        i = 0
+        while (i < len(self.lst) and self.lst[i][0] > priority):
+            i += 1
+        self.lst = self.lst[0:i] + [(priority,element)] + self.lst[i:]
+
+    def remove(self,element):
+        i = 0
+        while (i < len(self.lst) and self.lst[i][1] != element):
+            i += 1
+        self.lst = self.lst[0:i] + self.lst[i+1:]
+
+    def __iter__(self):
+        return iter(self.lst)
+
+# Run `fn` `repeat` times and return the best wall-clock time in
+# seconds
+def bestOf(fn, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if (best is None or elapsed < best):
+            best = elapsed
+    return best
+
+def report(name, seconds, count):
+    print("  {:<28} {:>10.3f} ms  {:>8.2f} us/op".format(
+        name, seconds * 1000, seconds / count * 1e6))
+
+# Simulate entities moving through one crowded cell: the cell holds
+# `crowd` tiles at mixed priorities, and one tile at a time leaves and
+# comes back (which is what `GameBoard.handleMove` does). The cell is
+# drawn once every `movesPerFrame` moves.
+def benchPqueue():
+    moves = 2000
+    for crowd, movesPerFrame in [(4, 1), (16, 1), (64, 4), (256, 4), (256, 16)]:
+        print("crowd of {} tiles, {} moves, drawn every {} moves".format(
+            crowd, moves, movesPerFrame))
+        rng = random.Random(crowd)
+        tiles = [object() for i in range(crowd)]
+        priorities = [rng.randint(1, 4) for i in range(crowd)]
+        order = [rng.randrange(crowd) for i in range(moves)]
+        for name, cls in [("list (baseline)", ListPriorityQueue),
+                          ("bucketed", PriorityQueue)]:
+            def run():
+                q = cls()
+                for i in range(crowd):
+                    q.add(tiles[i], priorities[i])
+                for n, i in enumerate(order):
+                    q.remove(tiles[i])
+                    q.add(tiles[i], priorities[i])
+                    if (n % movesPerFrame == 0):
+                        for entry in q:
+                            pass
+            report(name, bestOf(run), moves)
+
+def loadConfig():
+    return json.loads(open(os.path.join("./config.json")).read())
+
+# Write a width-by-height map of grass with scattered brick walls to a
+# temporary file and return its name
+def generateMap(width, height, wallFraction=0.1, seed=0):
+    rng = random.Random(seed)
+    f = tempfile.NamedTemporaryFile("w", suffix=".map", delete=False)
+    f.write("# Generated map\n")
+    for y in range(height):
+        f.write("".join("B" if rng.random() < wallFraction else "G"
+                        for x in range(width)))
+        f.write("\n")
+    f.close()
+    return f.name
+
+# Load generated maps of increasing size onto a board, measuring the
+# time taken and the memory the board keeps afterwards
+def benchMapLoad():
+    from players import TileFactory
+    from gameboard import GameBoard
+    from map import Map
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size in [100, 300, 1000]:
+        filename = generateMap(size, size)
+        tracemalloc.start()
+        start = time.perf_counter()
+        board = GameBoard(cfg, size, size)
+        levelMap = Map(tileFactory, filename, size, size)
+        levelMap.loadMap()
+        levelMap.loadToBoard(board)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        del levelMap
+        kept = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        os.remove(filename)
+        print("  {0}x{0}: load {1:8.3f} s   peak {2:8.1f} MB   kept {3:8.1f} MB".format(
+            size, elapsed, peak / 1e6, kept / 1e6))
+        del board
+
+# Build a board holding just the terrain of `filename`
+def loadBoard(cfg, tileFactory, filename, width, height):
+    from gameboard import GameBoard
+    from map import Map
+    board = GameBoard(cfg, width, height)
+    levelMap = Map(tileFactory, filename, width, height)
+    levelMap.loadMap()
+    levelMap.loadToBoard(board)
+    return board
+
+# Build a width-by-height board of open ground with brick walls placed
+# straight onto it (skipping the map file, which is slow to parse at
+# large sizes). With `segments`, the walls are straight runs of brick
+# like the shipped levels have; otherwise they are scattered.
+def generateBoard(cfg, tileFactory, width, height, wallFraction=0.1,
+                  seed=0, segments=True):
+    from gameboard import GameBoard
+    rng   = random.Random(seed)
+    board = GameBoard(cfg, width, height)
+    brick = tileFactory.fromChar("B")
+    walls = int(width * height * wallFraction)
+    while (walls > 0):
+        x = rng.randrange(width)
+        y = rng.randrange(height)
+        length = 1
+        if (segments):
+            length = rng.randint(2, max(2, min(width, height, 80) // 4))
+        dx, dy = rng.choice([(1, 0), (0, 1)])
+        for i in range(length):
+            if (x >= width or y >= height):
+                break
+            board.addTileAt(brick, x, y)
+            x += dx
+            y += dy
+            walls -= 1
+    return board
+
+# A bare tile standing in for the squirrel at (x,y)
+def standIn(x, y):
+    from players import Tile, Priority
+    player = Tile("player")
+    player.xPosition = x
+    player.yPosition = y
+    player.priority  = Priority.player
+    return player
+
+# Time repeated corner-to-corner `findPath` queries on the shipped
+# levels and on generated maps, and measure the memory each query
+# allocates at its peak
+def benchPathfinder():
+    from players import TileFactory
+    from pathfinder import PathFinder
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    cases = [("maps/level1.map", 20, None), ("maps/level3.map", 20, None),
+             (None, 100, 1), (None, 300, 2)]
+    for filename, size, seed in cases:
+        generated = filename is None
+        if (generated):
+            filename = generateMap(size, size, seed=seed)
+        board = loadBoard(cfg, tileFactory, filename, size, size)
+        if (generated):
+            os.remove(filename)
+        # Corner-to-corner, skipping walls
+        start = standIn(size - 2, size - 2)
+        goal  = (1, 1)
+        queries = max(1, 20000 // (size * size))
+        def run():
+            for i in range(queries):
+                PathFinder(board, start).findPath(goal)
+        seconds = bestOf(run, 3)
+        tracemalloc.start()
+        path = PathFinder(board, start).findPath(goal)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        steps = len(path) - 1 if path else None
+        print("  {:<18} {:>4}x{:<4} steps {:>5}  {:>9.3f} ms/query  peak {:>9.1f} KB".format(
+            filename if not generated else "generated", size, size, str(steps),
+            seconds / queries * 1000, peak / 1000))
+
+# Compare the cells expanded (and time taken) by breadth-first search
+# and A* at both connectivities on the same queries
+def benchAStar():
+    from players import TileFactory
+    from pathfinder import PathFinder, AStarPathFinder
+    from players import moveFuel
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    cases = [("maps/level1.map", 20, None), ("maps/level3.map", 20, None),
+             (None, 100, 1), (None, 300, 2)]
+    for filename, size, seed in cases:
+        generated = filename is None
+        if (generated):
+            filename = generateMap(size, size, wallFraction=0.05, seed=seed)
+        board = loadBoard(cfg, tileFactory, filename, size, size)
+        if (generated):
+            os.remove(filename)
+        print("  {} {}x{}".format(filename if not generated else "generated",
+                                  size, size))
+        start = standIn(size - 2, size - 2)
+        goal  = (1, 1)
+        for name, make in [("bfs", lambda: PathFinder(board, start)),
+                           ("astar 4-way", lambda: AStarPathFinder(board, start, 4)),
+                           ("astar 8-way", lambda: AStarPathFinder(board, start, 8))]:
+            finder = make()
+            path = finder.findPath(goal)
+            fuel = sum(moveFuel(dx, dy) for (dx, dy) in path[1:]) if path else None
+            seconds = bestOf(lambda: make().findPath(goal), 3)
+            print("    {:<12} expanded {:>7}  moves {:>5}  fuel {:>5}  {:>9.3f} ms".format(
+                name, finder.expanded, len(path) - 1 if path else "-", str(fuel),
+                seconds * 1000))
+
+# Compare jump point search against breadth-first search on generated
+# maps of open ground with scattered runs of brick wall
+def benchJps():
+    from players import TileFactory
+    from pathfinder import PathFinder, JumpPointPathFinder
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size in [100, 300, 1000, 2000]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        start = standIn(1, 1)
+        goal  = (size - 2, size - 2)
+        print("  {0}x{0}".format(size))
+        for name, cls in [("bfs", PathFinder), ("jps", JumpPointPathFinder)]:
+            # Time construction too, which builds the jump tables
+            begin = time.perf_counter()
+            finder = cls(board, start)
+            path = finder.findPath(goal)
+            elapsed = time.perf_counter() - begin
+            print("    {:<5} length {:>6}  expanded {:>8}  {:>10.1f} ms".format(
+                name, len(path) - 1 if path else "-", finder.expanded,
+                elapsed * 1000))
+
+# Many squirrels each asking for their next step towards the exit
+# every tick: a fresh search per squirrel per tick, against one shared
+# distance field
+def benchField():
+    from players import TileFactory
+    from pathfinder import PathFinder, distanceFieldFor
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    squirrels, ticks = 20, 10
+    for size in [20, 100, 300]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        rng = random.Random(size)
+        goal = (size // 2, size // 2)
+        players = [standIn(rng.randrange(size), rng.randrange(size))
+                   for i in range(squirrels)]
+        print("  {0}x{0}, {1} squirrels, {2} ticks".format(size, squirrels, ticks))
+        def searches():
+            for t in range(ticks):
+                for player in players:
+                    PathFinder(board, player).findPath(goal)
+        def field():
+            for t in range(ticks):
+                for player in players:
+                    distanceFieldFor(board, goal, player.getPriority()).nextStep(
+                        player.getX(), player.getY())
+        start = time.perf_counter()
+        distanceFieldFor(board, goal, players[0].getPriority())
+        build = time.perf_counter() - start
+        report("search per query", bestOf(searches, 1), squirrels * ticks)
+        report("field (build once)", build, 1)
+        report("field lookups", bestOf(field, 3), squirrels * ticks)
+
+# Drop stones onto the current path and replan: incrementally, against
+# searching again from scratch
+def benchReplan():
+    from players import TileFactory, Stone
+    from pathfinder import AStarPathFinder, CostModel
+    from replanner import IncrementalPlanner
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size in [100, 300]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        player = standIn(1, 1)
+        goal   = (size - 2, size - 2)
+        start = time.perf_counter()
+        planner = IncrementalPlanner(board, player, goal)
+        path = planner.findPath()
+        print("  {0}x{0}: first plan expanded {1} cells in {2:.1f} ms".format(
+            size, planner.expanded, (time.perf_counter() - start) * 1000))
+        rng = random.Random(size)
+        for changes in [1, 5, 20]:
+            # Block cells part way along the current path
+            cells = []
+            x, y = path[0]
+            for (dx, dy) in path[1:]:
+                x += dx
+                y += dy
+                cells.append((x, y))
+            stones = []
+            for (x, y) in rng.sample(cells[len(cells) // 4:], changes):
+                stone = Stone((x, y), board)
+                board.addTile(stone)
+                stones.append(stone)
+            start = time.perf_counter()
+            path = planner.findPath()
+            incremental = time.perf_counter() - start
+            expanded = planner.expanded
+            # Searching again would also need to treat the stones as
+            # walls, so charge it for each stone as a cell cost
+            class StoneCosts(CostModel):
+                def cellCosts(self, board):
+                    return [float("inf") if b else 0 for b in planner.blocked]
+            start = time.perf_counter()
+            finder = AStarPathFinder(board, player, 4, StoneCosts())
+            finder.findPath(goal)
+            scratch = time.perf_counter() - start
+            print("    {:>3} stones: replan expanded {:>6} in {:>8.1f} ms,"
+                  " A* from scratch expanded {:>6} in {:>8.1f} ms".format(
+                      changes, expanded, incremental * 1000,
+                      finder.expanded, scratch * 1000))
+            for stone in stones:
+                board.removeTile(stone)
+            path = planner.findPath()
+        planner.close()
+
+# Plan past moving stones and ferrets in space-time, and count how
+# many predicted collisions the plain A* path would have run into
+def benchSpaceTime():
+    from players import TileFactory, Stone, SquareAIFerret
+    from pathfinder import AStarPathFinder, FuelCostModel
+    from spacetime import SpaceTimePlanner, Forecast
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size, count in [(20, 12), (100, 150), (300, 1000)]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        rng = random.Random(size)
+        placed = 0
+        while (placed < count):
+            x, y = rng.randrange(size), rng.randrange(size)
+            if (board.topPriority[x * size + y] < 2):
+                continue
+            if (placed % 4 == 0):
+                mover = SquareAIFerret((x, y), board)
+            else:
+                mover = Stone((x, y), board)
+                mover.setSpeed((rng.choice([-8, 0, 8]), rng.choice([-4, 0, 4])))
+                board.registerForClockTick(mover)
+            mover.setPosition(x, y)
+            board.addTile(mover)
+            placed += 1
+        player = standIn(1, 1)
+        goal   = (size - 2, size - 2)
+        planner = SpaceTimePlanner(board, player, horizon=2 * size)
+        # The first plan also builds the distance field to the goal
+        start = time.perf_counter()
+        planner.findPath(goal)
+        first = time.perf_counter() - start
+        path = planner.findPath(goal)
+        seconds = bestOf(lambda: planner.findPath(goal), 3)
+        waits = sum(1 for move in path[1:] if move == (0, 0))
+        # Walk the plain A* path one move per tick against the forecast
+        plain = AStarPathFinder(board, player, 8, FuelCostModel()).findPath(goal)
+        forecast = Forecast(board, len(plain))
+        x, y = plain[0]
+        hits = 0
+        for t, (dx, dy) in enumerate(plain[1:]):
+            x += dx
+            y += dy
+            if (forecast.isOccupied(x * size + y, t) or forecast.isOccupied(x * size + y, t + 1)):
+                hits += 1
+        print("  {0}x{0}, {1} movers: first plan {2:.1f} ms, replan {3:.1f} ms,"
+              " expanded {4}, {5} moves with {6} waits (A*: {7} moves, {8} predicted hits)".format(
+                  size, count, first * 1000, seconds * 1000, planner.expanded,
+                  len(path) - 1, waits, len(plain) - 1, hits))
+
+# Squirrels asking over and over for paths to a few goals while the
+# odd wall goes up or comes down, with and without the shared path
+# cache
+def benchPathCache():
+    from players import TileFactory
+    from pathfinder import PathFinder, PathCache
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    wall = tileFactory.fromChar("R")
+    size, queries = 100, 2000
+    board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                          seed=size)
+    rng = random.Random(size)
+    open_ = [(x, y) for x in range(size) for y in range(size)
+             if board.topPriority[x * size + y] > 1]
+    starts = [standIn(x, y) for (x, y) in rng.sample(open_, 20)]
+    goals  = rng.sample(open_, 5)
+    # Every 200 queries, put up or take down a wall
+    work = []
+    for i in range(queries):
+        change = None
+        if (i % 200 == 199):
+            change = rng.choice(open_)
+        work.append((rng.choice(starts), rng.choice(goals), change))
+    def run(find):
+        added = []
+        for (player, goal, change) in work:
+            if (change is not None):
+                if (len(added) > 0 and rng.random() < 0.5):
+                    board.removeTileAt(wall, *added.pop())
+                else:
+                    board.addTileAt(wall, *change)
+                    added.append(change)
+            find(player, goal)
+        for (x, y) in added:
+            board.removeTileAt(wall, x, y)
+    print("  {0}x{0}, {1} queries over {2} starts and {3} goals".format(
+        size, queries, len(starts), len(goals)))
+    rng.seed(1)
+    start = time.perf_counter()
+    run(lambda player, goal: PathFinder(board, player).findPath(goal))
+    report("uncached", time.perf_counter() - start, queries)
+    for capacity in [16, 64, 256]:
+        cache = PathCache(board, capacity)
+        rng.seed(1)
+        start = time.perf_counter()
+        run(cache.findPath)
+        report("cache of {}".format(capacity), time.perf_counter() - start, queries)
+        print("      {}".format(cache.stats()))
+
+# Queries on very large generated maps: flat breadth-first search
+# against the hierarchical search, whose cluster graph is built as
+# searches reach it (or all at once by `build`)
+def benchHpa():
+    from players import TileFactory
+    from pathfinder import PathFinder, HierarchicalPathFinder, clusterGraphFor
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    wall = tileFactory.fromChar("R")
+    def line(name, path, seconds, expanded=None):
+        print("    {:<26} length {:>6}  {:>10.1f} ms{}".format(
+            name, len(path) - 1 if path else "-", seconds * 1000,
+            "" if expanded is None else "  (expanded {})".format(expanded)))
+    def timed(source, goal):
+        start = time.perf_counter()
+        finder = HierarchicalPathFinder(board, standIn(*source))
+        path = finder.findPath(goal)
+        return path, time.perf_counter() - start, finder.expanded
+    for size in [300, 1000, 2000]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        rng = random.Random(size)
+        pairs = []
+        while (len(pairs) < 10):
+            x1, y1, x2, y2 = [rng.randrange(size) for i in range(4)]
+            if (board.topPriority[x1 * size + y1] > 1 and board.topPriority[x2 * size + y2] > 1):
+                pairs.append(((x1, y1), (x2, y2)))
+        corner, far = (1, 1), (size - 2, size - 2)
+        print("  {0}x{0}".format(size))
+        start = time.perf_counter()
+        path = PathFinder(board, standIn(*corner)).findPath(far)
+        line("bfs corner to corner", path, time.perf_counter() - start)
+        line("hpa corner to corner", *timed(corner, far))
+        line("hpa again", *timed(corner, far))
+        # Put up a wall in the middle of the path and ask again
+        board.addTileAt(wall, size // 2, size // 2)
+        line("hpa after a wall change", *timed(corner, far))
+        board.removeTileAt(wall, size // 2, size // 2)
+        graph = clusterGraphFor(board, standIn(*corner).getPriority())
+        start = time.perf_counter()
+        graph.build()
+        line("build every cluster", None, time.perf_counter() - start)
+        results = [timed(source, goal) for (source, goal) in pairs]
+        print("    {:<26} length {:>6}  {:>10.1f} ms  (expanded {})".format(
+            "hpa, 10 random pairs", sum(len(p) - 1 for (p, s, e) in results) // 10,
+            sum(s for (p, s, e) in results) / 10 * 1000,
+            sum(e for (p, s, e) in results) // 10))
+        graph.close()
+
+# Whole-map distance transforms: the NumPy wavefront against the
+# per-cell DistanceField, and a single path from each against a
+# breadth-first `findPath`
+def benchWavefront():
+    from players import TileFactory
+    from pathfinder import PathFinder, DistanceField
+    from wavefront import Wavefront
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size in [20, 100, 300, 1000, 2000]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        player = standIn(1, 1)
+        goal   = (size - 2, size - 2)
+        print("  {0}x{0}".format(size))
+        repeat = 3 if size <= 300 else 1
+        for connectivity in [4, 8]:
+            wave  = bestOf(lambda: Wavefront(board, goal, player.getPriority(),
+                                             connectivity), repeat)
+            field = bestOf(lambda: DistanceField(board, goal, player.getPriority(),
+                                                 connectivity), repeat)
+            wavefront = Wavefront(board, goal, player.getPriority(), connectivity)
+            start = time.perf_counter()
+            path = wavefront.findPath(1, 1)
+            extract = time.perf_counter() - start
+            print("    {}-way: wavefront {:>9.1f} ms, DistanceField {:>9.1f} ms,"
+                  " path of {} extracted in {:.1f} ms".format(
+                      connectivity, wave * 1000, field * 1000, len(path) - 1,
+                      extract * 1000))
+        seconds = bestOf(lambda: PathFinder(board, player).findPath(goal), repeat)
+        print("    bfs findPath {:>9.1f} ms".format(seconds * 1000))
+
+# Route planning through health packs to the exit: the one-search
+# distance matrix against a breadth-first search per pair, and the
+# exact and heuristic orderings as the number of packs grows
+def benchRoute():
+    from players import TileFactory
+    from pathfinder import PathFinder
+    from routeplanner import RoutePlanner, pairwiseDistances
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size, counts in [(40, [4, 8, 10, 16]), (200, [4, 8, 10, 30])]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.1,
+                              seed=size)
+        rng = random.Random(size)
+        free = [(x, y) for x in range(size) for y in range(size)
+                if board.topPriority[x * size + y] > 1]
+        print("  {0}x{0}".format(size))
+        for count in counts:
+            points = rng.sample(free, count + 2)
+            player = standIn(*points[0])
+            def pairwise():
+                for a in points:
+                    finder = PathFinder(board, standIn(*a))
+                    for b in points:
+                        if (a != b):
+                            finder.findPath(b)
+            matrix = bestOf(lambda: pairwiseDistances(board, points,
+                                                      player.getPriority()), 3)
+            perPair = bestOf(pairwise, 1)
+            planner = RoutePlanner(board, player, points[1], points[2:], fuel=5)
+            start = time.perf_counter()
+            route = planner.plan()
+            seconds = time.perf_counter() - start
+            print("    {:>2} packs: distances {:>8.1f} ms (bfs per pair {:>8.1f} ms),"
+                  " {} plan {:>8.1f} ms, arrival {}, {} packs, {} waits".format(
+                      count, matrix * 1000, perPair * 1000,
+                      "exact" if count <= planner.exactLimit else "heuristic",
+                      seconds * 1000, route.arrival, route.packs, route.waits))
+
+# Risk maps: building one from every ferret's patrol and stone lanes,
+# taking dead ferrets away again, and the risk-weighted search against
+# the plain fuel-cost one
+def benchRisk():
+    from players import TileFactory, SquareAIFerret
+    from pathfinder import AStarPathFinder
+    from riskmap import RiskMap, RiskPathFinder, riskMapFor
+    from players import moveFuel
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    for size, count in [(40, 4), (200, 50), (1000, 200)]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        rng = random.Random(size)
+        while (len(board.ferrets) < count):
+            x, y = rng.randrange(size), rng.randrange(size)
+            if (board.topPriority[x * size + y] > 1):
+                ferret = SquareAIFerret([x, y], board)
+                board.addTile(ferret)
+                board.ferrets.append(ferret)
+        print("  {0}x{0}, {1} ferrets".format(size, count))
+        seconds = bestOf(lambda: RiskMap(board), 3)
+        print("    build {:>9.1f} ms".format(seconds * 1000))
+        riskMap = riskMapFor(board)
+        player  = standIn(1, 1)
+        goal    = (size - 2, size - 2)
+        def expectedLoss(path):
+            x, y = path[0]
+            loss = 0
+            for (dx, dy) in path[1:]:
+                x += dx
+                y += dy
+                loss += riskMap.riskAt(x, y)
+            return loss
+        for name, finder in [("astar", AStarPathFinder(board, player)),
+                             ("risk", RiskPathFinder(board, player))]:
+            start = time.perf_counter()
+            path = finder.findPath(goal)
+            seconds = time.perf_counter() - start
+            fuel = sum(moveFuel(dx, dy) for (dx, dy) in path[1:])
+            print("    {:<5} path fuel {:>5}, expected loss {:>7.2f}, {:>8.1f} ms".format(
+                name, fuel, expectedLoss(path), seconds * 1000))
+        for ferret in board.ferrets[:count // 2]:
+            ferret.subtractHp(ferret.hp)
+        start = time.perf_counter()
+        riskMap.update()
+        print("    remove {} dead ferrets {:>6.2f} ms".format(
+            count // 2, (time.perf_counter() - start) * 1000))
+
+# Every point-to-point strategy on the same queries on large sparse
+# maps: corner to corner, random pairs, and a goal walled in on all
+# sides, comparing cells expanded and time taken
+def benchBidir():
+    from players import TileFactory
+    from pathfinder import (PathFinder, BidirectionalPathFinder, AStarPathFinder,
+                            JumpPointPathFinder)
+    cfg = loadConfig()
+    tileFactory = TileFactory(cfg)
+    wall = tileFactory.fromChar("R")
+    finders = [("bfs", PathFinder), ("bidir", BidirectionalPathFinder),
+               ("astar 4-way", lambda board, player: AStarPathFinder(board, player, 4)),
+               ("jps", JumpPointPathFinder)]
+    for size in [300, 1000]:
+        board = generateBoard(cfg, tileFactory, size, size, wallFraction=0.05,
+                              seed=size)
+        rng = random.Random(size)
+        queries = [("corner to corner", (1, 1), (size - 2, size - 2))]
+        while (len(queries) < 11):
+            x1, y1, x2, y2 = [rng.randrange(size) for i in range(4)]
+            if (board.topPriority[x1 * size + y1] > 1 and board.topPriority[x2 * size + y2] > 1):
+                queries.append(("10 random pairs", (x1, y1), (x2, y2)))
+        # Wall in a goal near the far corner
+        gx, gy = size - 5, size - 5
+        for (dx, dy) in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+            board.addTileAt(wall, gx + dx, gy + dy)
+        board.removeTileAt(wall, gx, gy)
+        queries.append(("walled-in goal", (1, 1), (gx, gy)))
+        print("  {0}x{0}".format(size))
+        for name, cls in finders:
+            # name of query group -> [expanded, seconds, total length]
+            totals = {}
+            for (group, source, goal) in queries:
+                finder = cls(board, standIn(*source))
+                start  = time.perf_counter()
+                path   = finder.findPath(goal)
+                seconds = time.perf_counter() - start
+                entry = totals.setdefault(group, [0, 0, 0])
+                entry[0] += finder.expanded
+                entry[1] += seconds
+                entry[2] += len(path) - 1 if path else 0
+            for group, (expanded, seconds, length) in totals.items():
+                print("    {:<12} {:<17} expanded {:>8}  length {:>6}  {:>9.1f} ms".format(
+                    name, group, expanded, length, seconds * 1000))
+
+# Clock ticks per second of CPU time: headless Simulations, one game at
+# a time, against BatchedSimulations of growing numbers of games. The
+# batched squirrels take a random legal move every fourth tick, roughly
+# as often as MyAISquirrel does.
+def benchBatch():
+    import numpy as np
+    import players
+    from players import TileFactory
+    from simulate import Simulation
+    from batchsim import BatchedSimulation, Action
+    cfg = loadConfig()
+    cfg["initialfuel"] = 1000
+    loadImages = players.loadImages
+    players.loadImages = False
+    try:
+        tileFactory = TileFactory(cfg)
+        ticks, seconds = 0, 0
+        for seed in range(20):
+            sim = Simulation(cfg, tileFactory, seed=seed, maxTicks=500).run()
+            ticks   += sim.ticks
+            seconds += sim.seconds
+        print("  {:<24} {:>10.0f} ticks/s".format("Simulation", ticks / seconds))
+        for count in [1, 64, 1024, 8192]:
+            sim = BatchedSimulation(cfg, tileFactory, count, seed=0, maxTicks=500)
+            rng = np.random.default_rng(0)
+            obs = sim.reset()
+            ticks = 0
+            start = time.perf_counter()
+            for t in range(200):
+                # A random legal direction, or none
+                choice = np.where(obs["canMove"], rng.random(obs["canMove"].shape),
+                                  -1).argmax(axis=1)
+                moving = obs["canMove"].any(axis=1) & (t % 4 == 3)
+                ticks += (~sim.done()).sum()
+                obs, reward, done = sim.step(np.where(moving, 1 + choice, Action.wait))
+            seconds = time.perf_counter() - start
+            print("  {:<24} {:>10.0f} ticks/s".format("batched, {} games".format(count),
+                                                     ticks / seconds))
+    finally:
+        players.loadImages = loadImages
+
+# Saving and restoring a board, and forking a sandbox copy of it, on a
+# level part way through a game, against copy.deepcopy of the board
+def benchSnapshot():
+    import copy
+    import players
+    from players import TileFactory
+    from simulate import Simulation
+    cfg = loadConfig()
+    cfg["initialfuel"] = 1000
+    loadImages = players.loadImages
+    players.loadImages = False
+    try:
+        sim = Simulation(cfg, TileFactory(cfg), seed=0, maxTicks=60).run()
+        board = sim.board
+        print("  {} tiles ticking, {} cells of entities".format(
+            len(board.clockTickListeners), len(board.entities)))
+        snapshot = board.snapshot()
+        def tick():
+            board.clockTick(10, 1)
+            board.restore(snapshot)
+        n = 1000
+        for name, fn in [("snapshot", board.snapshot),
+                         ("restore", lambda: board.restore(snapshot)),
+                         ("tick and restore", tick),
+                         ("fork", board.fork),
+                         ("copy.deepcopy", lambda: copy.deepcopy(board))]:
+            seconds = bestOf(lambda: [fn() for i in range(n)], 5)
+            print("    {:<18} {:>9.1f} us".format(name, seconds / n * 1e6))
+    finally:
+        players.loadImages = loadImages
+
+# The original game loop, kept as the baseline the current one is
+# measured against: it spins in Clock.tick_busy_loop to draw 40 frames
+# a second, and ticks the board by however many tenths of a second of
+# wall clock time have started since the last frame
+def busyGameLoop(game):
+    import pygame
+    clock   = pygame.time.Clock()
+    running = True
+    fps     = 10
+    millis  = int(round(time.time() * fps))
+    while running:
+        clock.tick_busy_loop(40)
+        nmillis = int(round(time.time() * fps))
+        if (nmillis > millis):
+            for observer in game.tickObservers:
+                observer.clockTick(fps, nmillis - millis)
+        millis = nmillis
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            for observer in game.observers:
+                observer.handleEvent(event)
+        game.board.renderScreen(game.screen)
+        pygame.display.update()
+
+# CPU use and timing of the game loop, the original against the
+# current one, each playing level 1 for a few seconds on a dummy
+# display: how often the board ticks and how far the gaps between
+# ticks stray from a tenth of a second, how many ticks came in bursts
+# (a `num` over 1), and the same for frames. Each is run on its own
+# and again with another process keeping a CPU busy.
+def benchGameLoop():
+    import subprocess
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from contextlib import redirect_stdout
+    from ai import InvalidRequestException
+    import game
+    seconds = 5
+    def stats(times, ideal):
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        if (len(gaps) == 0):
+            return "none"
+        mean = sum(gaps) / len(gaps)
+        sd   = (sum((g - mean) ** 2 for g in gaps) / len(gaps)) ** 0.5
+        return "{:>4} gaps {:>6.1f} ms mean, {:>5.2f} ms sd, {:>6.2f} ms worst off".format(
+            len(gaps), mean * 1000, sd * 1000, max(abs(g - ideal) for g in gaps) * 1000)
+    runs = [(name, loop, loaded) for loaded in [False, True]
+            for name, loop in [("busy loop (original)", busyGameLoop),
+                               ("fixed step", lambda g: g.gameLoop())]]
+    for name, loop, loaded in runs:
+        spinner = None
+        if (loaded):
+            name += ", CPU busy"
+            spinner = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+        with redirect_stdout(open(os.devnull, "w")):
+            g = game.Game()
+            ticks  = []
+            frames = []
+            # The AI may make an illegal move; keep going regardless
+            board = g.board
+            tick  = board.clockTick
+            def safeTick(fps, num):
+                ticks.append((time.perf_counter(), num))
+                try:
+                    tick(fps, num)
+                except InvalidRequestException:
+                    pass
+            board.clockTick = safeTick
+            render = board.renderScreen
+            def timedRender(*args):
+                rects = render(*args)
+                frames.append(time.perf_counter())
+                return rects
+            board.renderScreen = timedRender
+            pygame.time.set_timer(pygame.QUIT, seconds * 1000, 1)
+            wall = time.perf_counter()
+            cpu  = time.process_time()
+            loop(g)
+            cpu  = time.process_time() - cpu
+            wall = time.perf_counter() - wall
+        if (spinner is not None):
+            spinner.kill()
+            spinner.wait()
+        print("  {}: {:.0f}% of a CPU over {:.1f} s".format(name, 100 * cpu / wall, wall))
+        print("    ticks  {}, {} in bursts".format(
+            stats([t for (t, num) in ticks], 0.1), sum(1 for (t, num) in ticks if num > 1)))
+        print("    frames {}".format(stats(frames, 1 / 40)))
+
+# The original way of drawing the screen, kept as the baseline the
+# current one is measured against: every tile of every cell is drawn
+# every frame, a font is made every frame for the fuel, and the whole
+# display is flipped, then updated again by the game loop
+def fullRender(board, screen, previous=None, alpha=1.0):
+    import pygame
+    moving = []
+    if (previous is not None and alpha < 1):
+        moving = board.movedTiles(previous)
+    skip = set(tile for (tile, fromX, fromY) in moving)
+    size = board.cfg["tileSize"]
+    for x in range(board.width):
+        for y in range(board.height):
+            for (priority, tile) in board.tilesAt(x, y):
+                if (tile not in skip):
+                    screen.blit(tile.getImage(), (x * size, y * size))
+            board.dirty[x][y] = False
+    for (tile, fromX, fromY) in sorted(moving, key=lambda m: -m[0].getPriority()):
+        x = fromX + (tile.getX() - fromX) * alpha
+        y = fromY + (tile.getY() - fromY) * alpha
+        screen.blit(tile.getImage(), (round(x * size), round(y * size)))
+    font = pygame.font.SysFont('Comic Sans MS', 30)
+    textsurface = font.render('Fuel: ' + str(board.state.hp), False, (255, 255, 255))
+    screen.blit(textsurface,(0,0))
+    pygame.display.flip()
+    pygame.display.update()
+
+# Frames per second and CPU time per frame drawing a busy level (level
+# 1 with 25 more ferrets, all firing stones) on a dummy display, four
+# frames to a clock tick as in the game: redrawing every tile, against
+# redrawing the whole board from the static background, against
+# redrawing the dirty cells only
+def benchRender():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from contextlib import redirect_stdout
+    from ai import InvalidRequestException
+    from players import TileFactory, InvalidMoveException
+    from simulate import buildLevel
+    cfg = json.loads(open("config.json").read())
+    size = cfg["tileSize"]
+    pygame.init()
+    screen = pygame.display.set_mode((cfg["screenX"] * size, cfg["screenY"] * size))
+    tileFactory = TileFactory(cfg)
+    ticks  = 100
+    frames = 4
+    def wholeBoard(board, *args):
+        board.markAllDirty()
+        pygame.display.update(board.renderScreen(*args))
+    for name, draw in [("full redraw (original)", fullRender),
+                       ("whole board, background", wholeBoard),
+                       ("dirty cells", lambda board, *args:
+                        pygame.display.update(board.renderScreen(*args)))]:
+        with redirect_stdout(open(os.devnull, "w")):
+            board, squirrel, endTile = buildLevel(cfg, tileFactory, 1)
+            board.rng = random.Random(0)
+            rng = random.Random(1)
+            mask = board.blockedMask(2)
+            free = [(x, y) for x in range(board.width) for y in range(board.height)
+                    if (mask[x * board.height + y] == 0 and (x, y) not in board.entities)]
+            board.setupCharacters([{"type": "squareferret", "startX": x, "startY": y}
+                                   for (x, y) in rng.sample(free, 25)])
+            board.state.hp = 100000
+            wall = 0
+            cpu  = 0
+            drawn = 0
+            for t in range(ticks):
+                previous = {tile: (tile.getX(), tile.getY())
+                            for tile in board.clockTickListeners}
+                try:
+                    board.clockTick(10, 1)
+                except (InvalidRequestException, InvalidMoveException):
+                    pass
+                for f in range(frames):
+                    w = time.perf_counter()
+                    c = time.process_time()
+                    draw(board, screen, previous, f / frames)
+                    cpu  += time.process_time() - c
+                    wall += time.perf_counter() - w
+                    drawn += 1
+        print("  {:<24} {:>7.0f} frames/s, {:>6.2f} ms CPU per frame ({} ferrets, {} frames)".format(
+            name, drawn / wall, cpu / drawn * 1000, len(board.ferrets), drawn))
+
+# CPU time per frame drawing boards from the size of the screen up to
+# a thousand cells on a side, with grass everywhere, a ferret to every
+# 400 cells, and the squirrel walking diagonally across with the
+# camera following: the original full redraw (a couple of frames
+# only, it gets slow) against drawing just the view, four frames to a
+# clock tick
+def benchCamera():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from contextlib import redirect_stdout
+    from players import TileFactory, Squirrel
+    from gameboard import GameBoard
+    from camera import Camera
+    cfg = json.loads(open("config.json").read())
+    size = cfg["tileSize"]
+    pygame.init()
+    screen = pygame.display.set_mode((cfg["screenX"] * size, cfg["screenY"] * size))
+    tileFactory = TileFactory(cfg)
+    grass = tileFactory.fromChar("G")
+    ticks  = 40
+    frames = 4
+    for side in [20, 100, 500, 1000]:
+        with redirect_stdout(open(os.devnull, "w")):
+            board = GameBoard(cfg, side, side)
+            board.rng = random.Random(0)
+            for x in range(side):
+                for y in range(side):
+                    board.addTileAt(grass, x, y)
+            squirrel = Squirrel((2, 2), board)
+            board.addTile(squirrel)
+            rng = random.Random(1)
+            cells = [(x, y) for x in range(side) for y in range(side) if x != y]
+            board.setupCharacters([{"type": "squareferret", "startX": x, "startY": y}
+                                   for (x, y) in rng.sample(cells, side * side // 400)])
+            board.state.hp = 10 ** 9
+            full = time.process_time()
+            for f in range(2):
+                fullRender(board, screen)
+            full = (time.process_time() - full) / 2
+            camera = Camera(board, squirrel)
+            cpu = 0
+            for t in range(ticks):
+                previous = {tile: (tile.getX(), tile.getY())
+                            for tile in board.clockTickListeners
+                            if board.inView(tile.getX(), tile.getY(), 1)}
+                board.clockTick(10, 1)
+                if (squirrel.getX() < side - 1):
+                    squirrel.move(1, 1)
+                for f in range(frames):
+                    c = time.process_time()
+                    camera.update()
+                    pygame.display.update(board.renderScreen(screen, previous, f / frames))
+                    cpu += time.process_time() - c
+        print("  {:>4} x {:<4} {:>5} ferrets: full redraw {:>8.2f} ms, view only {:>5.2f} ms CPU per frame".format(
+            side, side, len(board.ferrets), full * 1000, cpu / (ticks * frames) * 1000))
+
+# The original way tiles loaded their pictures, kept as the baseline
+# the current one is measured against: from disk every time, and never
+# converted to the display's pixel format
+def uncachedLoadImage(filename):
+    import pygame
+    return pygame.image.load(os.path.join(filename))
+
+# What loading pictures costs: making stones (as ferrets do when they
+# fire) with each reading its picture from disk against sharing one,
+# the memory their pictures take, and blitting pictures as loaded
+# against converted to the display's format, on a dummy display
+def benchAssets():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    import players
+    from players import Stone
+    from gameboard import GameBoard
+    cfg = json.loads(open("config.json").read())
+    size = cfg["tileSize"]
+    screen = pygame.display.set_mode((cfg["screenX"] * size, cfg["screenY"] * size))
+    board = GameBoard(cfg, 20, 20)
+    n = 1000
+    loadImage = players.loadImage
+    for name, load in [("from disk (original)", uncachedLoadImage),
+                       ("shared", loadImage)]:
+        # Stones load their pictures through players.loadImage
+        players.loadImage = load
+        stones = []
+        seconds = bestOf(lambda: stones.extend(Stone((1, 1), board) for i in range(n)), 5)
+        pictures = {id(stone.getImage()): stone.getImage() for stone in stones}
+        memory = sum(p.get_bytesize() * p.get_width() * p.get_height() for p in pictures.values())
+        print("  {:<22} {:>7.1f} us per stone, {:>5} pictures for {} stones, {:>8} bytes".format(
+            name, seconds / n * 1e6, len(pictures), len(stones), memory))
+        board.clockTickListeners = []
+    players.loadImage = loadImage
+    for filename in ["imgs/grass.png", "imgs/ferret.png"]:
+        for name, image in [("as loaded", uncachedLoadImage(filename)),
+                            ("converted", players.loadImage(filename))]:
+            seconds = bestOf(lambda: [screen.blit(image, (64, 64)) for i in range(n)], 5)
+            print("  blit {:<18} {:<10} {:>6.2f} us".format(filename, name, seconds / n * 1e6))
+    files = players.imageFiles(cfg)
+    players.images.clear()
+    start = time.perf_counter()
+    players.preloadImages(files)
+    queued = time.perf_counter() - start
+    for filename in files:
+        players.loadImage(filename)
+    print("  preloading {} pictures: {:.2f} ms to start, {:.2f} ms until all are loaded".format(
+        len(set(files)), queued * 1000, (time.perf_counter() - start) * 1000))
+
+benchmarks = {
+    "pqueue": benchPqueue,
+    "mapload": benchMapLoad,
+    "pathfinder": benchPathfinder,
+    "astar": benchAStar,
+    "jps": benchJps,
+    "field": benchField,
+    "replan": benchReplan,
+    "spacetime": benchSpaceTime,
+    "pathcache": benchPathCache,
+    "hpa": benchHpa,
+    "wavefront": benchWavefront,
+    "route": benchRoute,
+    "risk": benchRisk,
+    "bidir": benchBidir,
+    "batch": benchBatch,
+    "snapshot": benchSnapshot,
+    "gameloop": benchGameLoop,
+    "render": benchRender,
+    "camera": benchCamera,
+    "assets": benchAssets,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        print("== {} ==".format(name))
+        benchmarks[name]()
@@ -0,0 +1,51 @@
+# The camera for HaverQuest: which part of a level is on the screen
+#
+# config.json gives the size of the screen in cells (`screenX` by
+# `screenY`) and each level its own `width` and `height`, which may be
+# larger. The board only draws the cells in its view (see
+# `GameBoard.setView`); the camera decides where the view goes.
+
+# A camera following `tile` (the squirrel) around `board`. The view
+# stays put while the tile moves about its middle, and moves along
+# with it once the tile comes within `margin` cells of an edge, so
+# the screen scrolls a cell at a time rather than on every move. It
+# never goes past the edges of the board.
+class Camera:
+    def __init__(self, board, tile, margin=4):
+        self.board  = board
+        self.tile   = tile
+        self.margin = margin
+        self.center()
+
+    # Put the tile in the middle of the view
+    def center(self):
+        board = self.board
+        x = self.tile.getX()
+        y = self.tile.getY()
+        if (x is None):
+            return
+        board.setView(x - board.viewWidth // 2, y - board.viewHeight // 2)
+
+    # Move the view if the tile has come too near one of its edges.
+    # This is called before each frame is drawn.
+    def update(self):
+        board = self.board
+        x = self.tile.getX()
+        y = self.tile.getY()
+        if (x is None):
+            return
+        # A margin can't take up more than half the view
+        marginX = min(self.margin, (board.viewWidth - 1) // 2)
+        marginY = min(self.margin, (board.viewHeight - 1) // 2)
+        viewX = board.viewX
+        viewY = board.viewY
+        if (x < viewX + marginX):
+            viewX = x - marginX
+        elif (x >= viewX + board.viewWidth - marginX):
+            viewX = x - board.viewWidth + marginX + 1
+        if (y < viewY + marginY):
+            viewY = y - marginY
+        elif (y >= viewY + board.viewHeight - marginY):
+            viewY = y - board.viewHeight + marginY + 1
+        if (viewX != board.viewX or viewY != board.viewY):
+            board.setView(viewX, viewY)
@@ -0,0 +1,16 @@
+# Shared fixtures for the tests
+
+import os, json
+
+import pytest
+
+import players
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+# config.json, with images turned off so no display is needed
+@pytest.fixture
+def cfg(monkeypatch):
+    monkeypatch.setattr(players, "loadImages", False)
+    with open(os.path.join(here, "config.json")) as f:
+        return json.load(f)
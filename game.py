@@ -16,6 +16,8 @@ from pqueue import *
 from map import *
 from gameboard import *
 from pathfinder import *
+from camera import Camera
+from simulate import buildLevel
 
 class Game:
     """This class ties all of the other classes together, and represents
@@ -31,23 +33,35 @@ class Game:
         self.startY = None
         self.endX = None
         self.endY = None
+        strategy = "bfs"
 
-        # If the player has requested that the game be solved
+        # If the player has requested that the game be solved, i.e.,
+        # `python game.py solve startX startY endX endY [strategy]`
+        # where the optional strategy names one of the path finders in
+        # pathfinder.py (see `strategies` there, e.g. bfs, bidir, astar, jps)
         if (len(sys.argv) > 1 and sys.argv[1] == "solve"):
             solve = True
             self.startX = int(sys.argv[2])
             self.startY = int(sys.argv[3])
             self.endX = int(sys.argv[4])
             self.endY = int(sys.argv[5])
+            if (len(sys.argv) > 6):
+                strategy = sys.argv[6]
+            if (strategy not in strategies):
+                print("Unknown path finding strategy {}".format(strategy))
+                exit(1)
 
         # Load the configuration
         print("Loading configuration")
         self.loadJson()
     
-        # Pull various elements from the configuration file
+        # Pull various elements from the configuration file: the
+        # screen is `screenX` cells across and `screenY` down
         height = self.cfg["tileSize"] * self.cfg["screenY"]
         width = self.cfg["tileSize"] * self.cfg["screenX"]
-        self.screen = pygame.display.set_mode((height, width))
+        self.screen = pygame.display.set_mode((width, height))
+        # Start reading the pictures while the rest is set up
+        preloadImages(imageFiles(self.cfg))
         self.height = self.cfg["screenY"]
         self.width = self.cfg["screenX"]
         self.tileSize = self.cfg["tileSize"]
@@ -70,8 +84,11 @@ class Game:
 
         # Solve the level if the command-line arguments specified it
         if (solve):
-            pathfinder = PathFinder(self.board, self.mainCharacter)
+            pathfinder = makePathFinder(self.board, self.mainCharacter, strategy)
             sol = pathfinder.findPath((self.endX, self.endY))
+            # The number of cells searched, for comparing strategies
+            # on the same query
+            print("{} search expanded {} cells".format(strategy, pathfinder.expanded))
             if (sol != False):
                 print("found winning path:")
                 print(sol)
@@ -81,9 +98,13 @@ class Game:
         
         # Register for events from clock ticks
         self.registerForClockTick(self.board)
-        
-        # Finally, set up the game clock time
-        self.clock = pygame.time.Clock()
+
+        # Finally, the timing of the game loop (see `gameLoop`): clock
+        # ticks and frames per second, and the most ticks to take at
+        # once when catching up
+        self.fps        = self.cfg.get("fps", 10)
+        self.frameRate  = self.cfg.get("frameRate", 40)
+        self.maxCatchUp = self.cfg.get("maxCatchUp", 5)
 
     # Constants for arrows: these must be the same as the map
     # characters from config.json. I.e., the right arrow picture must
@@ -106,16 +127,23 @@ class Game:
             y = curPoint[1]
             if (path[cur][0] == 1 and path[cur][1] == 0):
                 # Right
-                self.board.addTile(self.tileFactory.fromChar(self.rightChar,x,y))
+                self.board.addTileAt(self.tileFactory.fromChar(self.rightChar),x,y)
             elif (path[cur][0] == -1 and path[cur][1] == 0):
                 # Left
-                self.board.addTile(self.tileFactory.fromChar(self.leftChar,x,y))
+                self.board.addTileAt(self.tileFactory.fromChar(self.leftChar),x,y)
             elif (path[cur][0] == 0 and path[cur][1] == 1):
                 # Down
-                self.board.addTile(self.tileFactory.fromChar(self.downChar,x,y))
+                self.board.addTileAt(self.tileFactory.fromChar(self.downChar),x,y)
             elif (path[cur][0] == 0 and path[cur][1] == -1):
                 # Up
-                self.board.addTile(self.tileFactory.fromChar(self.upChar,x,y))
+                self.board.addTileAt(self.tileFactory.fromChar(self.upChar),x,y)
+            elif (path[cur][0] == 1):
+                # Diagonally right. There are no diagonal arrows, so
+                # point right.
+                self.board.addTileAt(self.tileFactory.fromChar(self.rightChar),x,y)
+            elif (path[cur][0] == -1):
+                # Diagonally left
+                self.board.addTileAt(self.tileFactory.fromChar(self.leftChar),x,y)
             curPoint = (curPoint[0] + path[cur][0], curPoint[1] + path[cur][1])
             cur += 1
 
@@ -131,43 +159,16 @@ class Game:
 
     # Load level numbered `n`
     def loadLevel(self,n):
-        level = self.cfg["levels"][n - 1]
-        mapfile = level["file"]
-        width = level["width"]
-        height = level["height"]
-        self.board = GameBoard(self.cfg, level["width"], level["height"])
-        # Load these if they aren't specified via the command line
-        startX = self.startX or level["startX"]
-        startY = self.startY or level["startY"]
-
-        # Create the main character and place him on the screen
-        self.mainCharacter = MyAISquirrel((startX,startY), self.board)
-
-        # Optionally load the start and end x values
-        endX = self.endX or level["endX"]
-        endY = self.endY or level["endY"]
-        self.endX = endX
-        self.endY = endY
-
-        # Create the "end" tile (i.e., picture of a nut). Once the
-        # character reaches this tile, they win the game.
-        self.endTile = Exit((endX,endY), self.board)
-        self.board.endTile = self.endTile
-
-        # Add the main tile to the board
-        self.board.addTile(self.mainCharacter)
-
-        # Add the main tile to the board
-        self.board.addTile(self.endTile)
-
-        # Add the enemies / healthpacks / etc...
-        if 'characters' in level:
-            self.board.setupCharacters(level["characters"])
-
-        # Load a map in from a file
-        levelMap = Map(self.tileFactory, mapfile, width, height)
-        levelMap.loadMap()
-        levelMap.loadToBoard(self.board)
+        # The start and end coordinates come from the level unless
+        # they were given on the command line
+        self.board, self.mainCharacter, self.endTile = buildLevel(
+            self.cfg, self.tileFactory, n,
+            self.startX, self.startY, self.endX, self.endY)
+        self.endX = self.endTile.getX()
+        self.endY = self.endTile.getY()
+        # The view follows the squirrel around levels larger than the
+        # screen
+        self.camera = Camera(self.board, self.mainCharacter)
     
     def registerForEvents(self,observer):
         self.observers.append(observer)
@@ -175,26 +176,50 @@ class Game:
     def registerForClockTick(self,observer):
         self.tickObservers.append(observer)
     
+    # Where each tile that listens for clock ticks is now, for those
+    # in view or near enough to come into view by the next frame
+    def tickPositions(self):
+        board = self.board
+        return {tile: (tile.getX(), tile.getY()) for tile in board.clockTickListeners
+                if board.inView(tile.getX(), tile.getY(), self.maxCatchUp)}
+
     # Main Game Loop
+    # 
+    # The game moves on in fixed steps of one clock tick, `fps` of them
+    # per second, however quickly frames are drawn: the time that
+    # passes goes into an accumulator, and a tick is taken for each
+    # tick's worth of time in it. When the game falls behind (the
+    # window was dragged, or a tick took too long) it takes at most
+    # `maxCatchUp` ticks in a row and lets the rest of the lost time
+    # go, so it slows down for a moment rather than trying ever harder
+    # to catch up. Frames are drawn `frameRate` times a second, with
+    # moving tiles drawn part way along their last move (by the
+    # fraction of a tick left in the accumulator), and in between the
+    # loop sleeps until the next tick or frame is due.
     def gameLoop(self):
-        ticks = 0
-        running = True
-        fps    = 10
-        millis = int(round(time.time() * fps))
+        running    = True
+        fps        = self.fps
+        tickTime   = 1 / fps
+        frameTime  = 1 / self.frameRate
+        accumulator = 0
+        previous   = self.tickPositions()
+        last       = time.perf_counter()
+        nextFrame  = last
         while running:
-            self.clock.tick_busy_loop(40)
-            ticks += 1
-
-            nmillis = int(round(time.time() * fps))
-            
-            # Is it time to tick the clock again yet..?
-            if (nmillis > millis):
-                # Process all the clock tick observers
+            now = time.perf_counter()
+            accumulator += now - last
+            last = now
+
+            # Take the ticks that are due
+            ticks = 0
+            while (accumulator >= tickTime and ticks < self.maxCatchUp):
+                previous = self.tickPositions()
                 for observer in self.tickObservers:
-                    observer.clockTick(fps,nmillis-millis)
-            
-            # Update clock
-            millis = nmillis
+                    observer.clockTick(fps, 1)
+                accumulator -= tickTime
+                ticks += 1
+            if (accumulator >= tickTime):
+                accumulator %= tickTime
 
             # Process events to happen in the game
             for event in pygame.event.get():
@@ -205,8 +230,20 @@ class Game:
                     observer.handleEvent(event)
 
             # Redraw the screen
-            self.board.renderScreen(self.screen)
-            pygame.display.update()
-
-# Play the game
-Game().gameLoop()
+            if (now >= nextFrame):
+                self.camera.update()
+                rects = self.board.renderScreen(self.screen, previous, accumulator / tickTime)
+                pygame.display.update(rects)
+                nextFrame += frameTime
+                if (nextFrame < now):
+                    nextFrame = now + frameTime
+
+            # Sleep until the next tick or frame
+            wake  = min(nextFrame, now + tickTime - accumulator)
+            delay = wake - time.perf_counter()
+            if (delay > 0):
+                time.sleep(delay)
+
+if __name__ == "__main__":
+    # Play the game
+    Game().gameLoop()
@@ -1,7 +1,7 @@
 # CS 107, Fall 2018
 # Representation of the game board
 
-import pygame
+import pygame, random
 from pqueue import PriorityQueue
 from levelState import *
 from players    import *
@@ -16,14 +16,61 @@ from players    import *
 #   - width / height (natural numbers) -- The width / height of the
 #   game board
 # 
-#   - board -- A two-dimensional array of priority queues representing
-#   the tiles at each (x,y) coordinate on the board.
+#   - terrain -- A flat bytearray holding, for each (x,y) coordinate
+#   at index x * height + y, the id of the static terrain tile (grass,
+#   brick, ...) there, or 0 for none. `terrainTiles` maps each id back
+#   to a tile that can be drawn.
+# 
+#   - entities -- A dictionary from (x,y) coordinates to priority
+#   queues holding every other tile at that coordinate (players,
+#   stones, health packs, and any static tile placed on top of the
+#   terrain). Only coordinates that hold such tiles have a queue, so
+#   the board's memory grows with the number of entities rather than
+#   with its area.
 # 
 #   - dirty -- A two-dimensional array saying--for each (x,y)
 #   coordinate on the board--whether it needs to be drawn again or
-#   not.
+#   not. `markDirty` sets it, and also notes the cell in
+#   `dirtyCells`, so that drawing a frame only visits the cells that
+#   need it.
+# 
+#   - backgroundChunks -- The static tiles (the terrain, and static
+#   tiles in the entity layer, such as arrows) drawn once and kept as
+#   pictures, so that drawing a cell takes one blit for all of its
+#   static tiles. The board is cut into square chunks of `chunkSize`
+#   cells on a side, each with its own surface, made the first time a
+#   cell in it is drawn; when a static tile is added or removed, just
+#   its cell is drawn again in its chunk.
+# 
+#   - topPriority -- A flat bytearray holding, for each (x,y)
+#   coordinate at index x * height + y, the highest priority (lowest
+#   number) of any tile there, or EMPTY if the cell holds no tiles.
+#   It is kept up to date as tiles are added, removed and moved, so
+#   asking whether a cell is blocked never walks the cell's tiles.
+# 
+#   - rng -- Where ferrets get the random numbers that aim their
+#   stones, and MyAISquirrel the ones that pick its moves: the
+#   `random` module, unless a seeded random.Random is put here so that
+#   games can be replayed (see simulate.py).
+# 
+#   - viewX / viewY / viewWidth / viewHeight -- The part of the board
+#   shown on the screen, which may be smaller than the board: the cell
+#   at the top left corner of the screen, and the number of cells
+#   across and down the screen (config.json's `screenX` / `screenY`).
+#   Only the cells in view are drawn; `setView` moves it (see
+#   camera.py for what decides where to), and the next frame scrolls
+#   what is on the screen rather than drawing it all again.
+# 
+#   - sandbox / copies -- Whether this board is a copy made by `fork`,
+#   for trying moves out on, and if it is, a dictionary from each tile
+#   of the board it was copied from to the tile's copy here.
 #   
 class GameBoard:
+    # The `topPriority` value of a cell with no tiles in it
+    EMPTY = 255
+    # The width and height in cells of a chunk of `backgroundChunks`
+    chunkSize = 16
+
     def __init__(self, cfg, width, height):
         self.cfg    = cfg
         # Set up the state of the game board using the LevelState
@@ -37,23 +84,57 @@ class GameBoard:
         except:
           pass
         self.state  = LevelState(initialFuel)
-        # The actual board, represented as an width-by-height matrix
-        # (array of arrays)
-        self.board  = [[0 for x in range(height)] for y in range(width)]
+        # The view, see above, and the view shown by the last frame
+        # (None before the first)
+        self.viewX      = 0
+        self.viewY      = 0
+        self.viewWidth  = cfg.get("screenX", width)
+        self.viewHeight = cfg.get("screenY", height)
+        self.drawnView  = None
         # A "dirty" matrix. This is used for efficiency: don't redraw
         # tiles that don't need to be redrawn.
         self.dirty  = [[True for x in range(height)] for y in range(width)]
+        # The cells in view marked dirty since the last frame, or all
+        # of them when `allDirty` is set
+        self.dirtyCells = set()
+        self.allDirty   = True
+        # What the last frame drew over the cells: the (tile, rect) of
+        # each tile drawn between cells (in board pixels), and the rect
+        # of the fuel display (in screen pixels) with the fuel it showed
+        self.sprites    = []
+        self.hudRect    = None
+        self.hudFuel    = None
+        # Whether the game over screen is showing
+        self.showingEnd = False
+        # (x,y) of a chunk -> its surface, see above
+        self.backgroundChunks = {}
         # Set the width/height
         self.width  = width
         self.height = height
-        
-        # Build the board as a matrix of priority queues
-        for x in range(width):
-            for y in range(height):
-                self.board[x][y] = PriorityQueue()
+        # The terrain layer, see above. Id 0 means no terrain, so
+        # `terrainTiles` starts with a placeholder.
+        self.terrain      = bytearray(width * height)
+        self.terrainTiles = [None]
+        # Terrain tile `id` (from config.json) -> terrain id
+        self.terrainIds   = {}
+        # The sparse entity layer, see above
+        self.entities = {}
+        # The highest priority at each cell, see above
+        self.topPriority = bytearray([GameBoard.EMPTY]) * (width * height)
+        # Translation tables used by `blockedMask`, one per priority
+        self.maskTables = {}
+        # The masks `blockedMask` has built that are still current,
+        # one per priority
+        self.masks      = {}
+        self.rng        = random
+        self.sandbox    = False
+        self.copies     = {}
 
         # The set of things that want to listen to clock ticks.
         self.clockTickListeners = []
+        # The set of things that want to know when the tiles at a
+        # coordinate change (see `refreshCell`)
+        self.cellChangeListeners = []
         self.ferrets = []
         self.healthpacks = []
         self.stones = []
@@ -61,52 +142,433 @@ class GameBoard:
     def getWidth(self): return self.width
     def getHeight(self): return self.height
 
-    # Render all of the tiles at (x,y)
-    def renderAt(self, screen, x, y):
-        actualX = self.cfg["tileSize"] * x
-        actualY = self.cfg["tileSize"] * y
+    # Return the tiles at (x,y) as a list of (priority, tile) pairs in
+    # the order they are drawn, terrain included
+    def tilesAt(self, x, y):
+        tiles = []
+        queue = self.entities.get((x, y))
+        if (queue is not None):
+            tiles = queue.lst
+        terrainId = self.terrain[x * self.height + y]
+        if (terrainId == 0):
+            return tiles
+        terrain  = self.terrainTiles[terrainId]
+        priority = terrain.getPriority()
+        # The terrain goes underneath entities of the same priority
+        i = 0
+        while (i < len(tiles) and tiles[i][0] > priority):
+            i += 1
+        return tiles[0:i] + [(priority, terrain)] + tiles[i:]
+
+    # Render all of the tiles at (x,y), except any in the set `skip`
+    def renderAt(self, screen, x, y, skip=()):
+        size    = self.cfg["tileSize"]
+        actualX = size * (x - self.viewX)
+        actualY = size * (y - self.viewY)
+        tiles   = self.tilesAt(x, y)
+        # The static tiles that come first are drawn in one go from
+        # the background, unless another static tile is drawn over a
+        # moving one, in which case every tile is drawn in turn
+        i = 0
+        while (i < len(tiles) and tiles[i][1].isStatic()):
+            i += 1
+        if (i > 0 and not any(tile.isStatic() for (priority, tile) in tiles[i:])):
+            C = GameBoard.chunkSize
+            chunk = self.backgroundChunk(x // C, y // C, screen)
+            screen.blit(chunk, (actualX, actualY),
+                        ((x % C) * size, (y % C) * size, size, size))
+            tiles = tiles[i:]
         # Iterate through the tiles at (x,y) in priority order
-        for priorityItem in self.board[x][y].lst:
-            screen.blit(priorityItem[1].getImage(), (actualX, actualY))
+        for priorityItem in tiles:
+            if (priorityItem[1] not in skip):
+                screen.blit(priorityItem[1].getImage(), (actualX, actualY))
 
         # Since all the images in this tile have been blitted, clean
         # the dirty bit
         self.dirty[x][y] = False
         return
 
+    # Draw every cell in view, as `renderAt` would: the background a
+    # chunk at a time, then the tiles of the entity layer
+    def renderAll(self, screen, skip=()):
+        C    = GameBoard.chunkSize
+        size = self.cfg["tileSize"]
+        x0, y0, x1, y1 = self.viewBounds()
+        if (x0 >= x1 or y0 >= y1):
+            return
+        for cx in range(x0 // C, (x1 - 1) // C + 1):
+            for cy in range(y0 // C, (y1 - 1) // C + 1):
+                chunk = self.backgroundChunk(cx, cy, screen)
+                screen.blit(chunk, ((cx * C - self.viewX) * size, (cy * C - self.viewY) * size),
+                            (0, 0, min(C, self.width - cx * C) * size,
+                             min(C, self.height - cy * C) * size))
+        # Look the cells in view up in the entity layer, or the other
+        # way round, whichever is fewer
+        if (len(self.entities) < (x1 - x0) * (y1 - y0)):
+            cells = [cell for cell in self.entities if self.inView(cell[0], cell[1])]
+        else:
+            cells = [(x, y) for x in range(x0, x1) for y in range(y0, y1)
+                     if (x, y) in self.entities]
+        for (x, y) in cells:
+            self.renderAt(screen, x, y, skip)
+        for x in range(x0, x1):
+            self.dirty[x][y0:y1] = [False] * (y1 - y0)
+
+    # The cells in view, as (x0, y0, x1, y1): those with x0 <= x < x1
+    # and y0 <= y < y1
+    def viewBounds(self):
+        return (self.viewX, self.viewY, min(self.width, self.viewX + self.viewWidth),
+                min(self.height, self.viewY + self.viewHeight))
+
+    # Whether (x,y) is in view, or within `margin` cells of it
+    def inView(self, x, y, margin=0):
+        return (x is not None
+                and self.viewX - margin <= x < self.viewX + self.viewWidth + margin
+                and self.viewY - margin <= y < self.viewY + self.viewHeight + margin)
+
+    # Move the view so that (x,y) is at the top left corner of the
+    # screen, or as near as it can be without going past the edges of
+    # the board
+    def setView(self, x, y):
+        self.viewX = max(0, min(x, self.width - self.viewWidth))
+        self.viewY = max(0, min(y, self.height - self.viewHeight))
+
+    # Bring the screen from the view the last frame drew to the view
+    # now. What stays in view is moved across in one go, by scrolling
+    # the screen, and only the cells coming into view are marked
+    # dirty; the first frame, or a jump of a screen or more, draws
+    # everything. Returns whether the screen changed.
+    def scrollView(self, screen):
+        view = (self.viewX, self.viewY)
+        if (self.drawnView == view):
+            return False
+        size = self.cfg["tileSize"]
+        if (self.drawnView is None):
+            self.markAllDirty()
+        else:
+            dx = self.viewX - self.drawnView[0]
+            dy = self.viewY - self.drawnView[1]
+            if (abs(dx) >= self.viewWidth or abs(dy) >= self.viewHeight):
+                self.markAllDirty()
+            else:
+                screen.scroll(-dx * size, -dy * size)
+                # The fuel display was scrolled along with the rest
+                if (self.hudRect is not None):
+                    self.markScreenRect(self.hudRect.move(-dx * size, -dy * size))
+                width  = self.viewWidth * size
+                height = self.viewHeight * size
+                if (dx > 0):
+                    self.markScreenRect(pygame.Rect(width - dx * size, 0, dx * size, height))
+                elif (dx < 0):
+                    self.markScreenRect(pygame.Rect(0, 0, -dx * size, height))
+                if (dy > 0):
+                    self.markScreenRect(pygame.Rect(0, height - dy * size, width, dy * size))
+                elif (dy < 0):
+                    self.markScreenRect(pygame.Rect(0, 0, width, -dy * size))
+        self.drawnView = view
+        return True
+
+    # The surface of the background chunk (cx,cy), drawing it first if
+    # it hasn't been yet. It is made in the same pixel format as
+    # `screen`, so blitting it is a plain copy.
+    def backgroundChunk(self, cx, cy, screen):
+        chunk = self.backgroundChunks.get((cx, cy))
+        if (chunk is None):
+            C     = GameBoard.chunkSize
+            size  = self.cfg["tileSize"]
+            chunk = pygame.Surface((C * size, C * size), 0, screen)
+            self.backgroundChunks[(cx, cy)] = chunk
+            for x in range(cx * C, min(self.width, (cx + 1) * C)):
+                for y in range(cy * C, min(self.height, (cy + 1) * C)):
+                    self.paintBackground(x, y)
+        return chunk
+
+    # Draw the static tiles at (x,y) into its background chunk, if it
+    # has been made
+    def paintBackground(self, x, y):
+        C     = GameBoard.chunkSize
+        chunk = self.backgroundChunks.get((x // C, y // C))
+        if (chunk is None):
+            return
+        size  = self.cfg["tileSize"]
+        where = ((x % C) * size, (y % C) * size)
+        chunk.fill((0, 0, 0), where + (size, size))
+        for (priority, tile) in self.tilesAt(x, y):
+            if (tile.isStatic()):
+                chunk.blit(tile.getImage(), where)
+
+    # Mark (x,y) as needing to be drawn again. Cells out of view are
+    # drawn when they come into view, so only those in view are kept
+    # for the next frame.
+    def markDirty(self, x, y):
+        self.dirty[x][y] = True
+        if (self.viewX <= x < self.viewX + self.viewWidth
+            and self.viewY <= y < self.viewY + self.viewHeight):
+            self.dirtyCells.add((x, y))
+
+    # Mark the whole board as needing to be drawn again
+    def markAllDirty(self):
+        for column in self.dirty:
+            column[:] = [True] * self.height
+        self.allDirty = True
+
+    # Mark the cells under `rect` (in screen pixels) as dirty
+    def markScreenRect(self, rect):
+        size = self.cfg["tileSize"]
+        self.markRect(rect.move(self.viewX * size, self.viewY * size))
+
+    # Mark the cells under `rect` (in board pixels) as dirty
+    def markRect(self, rect):
+        size = self.cfg["tileSize"]
+        for x in range(max(0, rect.left // size), min(self.width, (rect.right - 1) // size + 1)):
+            for y in range(max(0, rect.top // size), min(self.height, (rect.bottom - 1) // size + 1)):
+                self.markDirty(x, y)
+
     # Add the tile to the board, coordinate is drawn from tile's (x,y)
     # position
     def addTile(self, tile):
-        self.board[tile.getX()][tile.getY()].add(tile, tile.getPriority())
-        self.dirty[tile.getX()][tile.getY()] = True
-        tile.registerMoveObserver(self)
+        self.addTileAt(tile, tile.getX(), tile.getY())
+
+    # Add the tile to the board at (x,y). This is how the shared
+    # static tiles from the TileFactory, which have no position of
+    # their own, are placed.
+    # 
+    # A static tile goes into the terrain layer if there is no terrain
+    # at its coordinate yet. Everything else goes into the entity
+    # layer. Static tiles never move, so the board only listens for
+    # moves of the other tiles.
+    def addTileAt(self, tile, x, y):
+        if (tile.isStatic() and self.terrain[x * self.height + y] == 0):
+            terrainId = self.terrainId(tile)
+            if (terrainId is not None):
+                self.terrain[x * self.height + y] = terrainId
+                self.refreshCell(x, y)
+                self.paintBackground(x, y)
+                self.markDirty(x, y)
+                return
+        self.addEntity(tile, x, y)
+        self.refreshCell(x, y)
+        self.markDirty(x, y)
+        if (tile.isStatic()):
+            self.paintBackground(x, y)
+        else:
+            tile.registerMoveObserver(self)
 
     def removeTile(self,tile):
-        self.board[tile.getX()][tile.getY()].remove(tile)
-        self.dirty[tile.getX()][tile.getY()] = True
+        self.removeTileAt(tile, tile.getX(), tile.getY())
+
+    # Remove the tile at (x,y) from the board
+    def removeTileAt(self, tile, x, y):
+        queue = self.entities.get((x, y))
+        if (queue is not None and tile in queue):
+            self.removeEntity(tile, x, y)
+        elif (tile.isStatic()
+              and self.terrainIds.get(tile.id) == self.terrain[x * self.height + y]):
+            self.terrain[x * self.height + y] = 0
+        self.refreshCell(x, y)
+        self.markDirty(x, y)
+        if (tile.isStatic()):
+            self.paintBackground(x, y)
+
+    # Return the terrain id for a static tile, assigning a new one the
+    # first time a kind of tile is seen. Returns None if the terrain
+    # ids have run out, in which case the tile belongs in the entity
+    # layer instead.
+    def terrainId(self, tile):
+        terrainId = self.terrainIds.get(tile.id)
+        if (terrainId is None):
+            if (len(self.terrainTiles) > 255):
+                return None
+            terrainId = len(self.terrainTiles)
+            self.terrainTiles.append(tile)
+            self.terrainIds[tile.id] = terrainId
+        return terrainId
+
+    # Add a tile to the entity layer at (x,y)
+    def addEntity(self, tile, x, y):
+        queue = self.entities.get((x, y))
+        if (queue is None):
+            queue = self.entities[(x, y)] = PriorityQueue()
+        queue.add(tile, tile.getPriority())
+
+    # Remove a tile from the entity layer at (x,y), dropping the
+    # cell's queue once it is empty
+    def removeEntity(self, tile, x, y):
+        queue = self.entities.get((x, y))
+        if (queue is None):
+            return
+        queue.remove(tile)
+        if (len(queue) == 0):
+            del self.entities[(x, y)]
+
+    # Bring `topPriority` up to date after the tiles at (x,y) change,
+    # and tell the cell change listeners
+    def refreshCell(self, x, y):
+        priority  = GameBoard.EMPTY
+        terrainId = self.terrain[x * self.height + y]
+        if (terrainId != 0):
+            priority = self.terrainTiles[terrainId].getPriority()
+        queue = self.entities.get((x, y))
+        if (queue is not None and queue.topPriority() < priority):
+            priority = queue.topPriority()
+        old = self.topPriority[x * self.height + y]
+        if (old != priority):
+            self.topPriority[x * self.height + y] = priority
+            # Drop the masks this cell's change affects. The others,
+            # and anything computed from them, stay good.
+            for p in [p for p in self.masks if (old < p) != (priority < p)]:
+                del self.masks[p]
+        for observer in self.cellChangeListeners:
+            observer.handleCellChange(x, y)
 
     # Return true if a higher-priority object is on the board at the
     # specified place
     def higherPriorityObjectAt(self, tile, x, y):
-        for t in self.board[x][y]:
-            if (t[0] < tile.getPriority()):
-                return True
-        return False
+        return self.topPriority[x * self.height + y] < tile.getPriority()
+
+    # Return a bytearray laid out like `topPriority` that is 1 at each
+    # cell holding a higher-priority object than `priority` (i.e., a
+    # cell that a tile of that priority cannot move to) and 0
+    # elsewhere. The whole mask is built in one pass with no per-cell
+    # Python code, and is reused until some cell becomes blocked or
+    # unblocked for `priority`, so callers must not modify it. Holding
+    # on to the mask and checking whether `blockedMask` still returns
+    # the same object tells a caller whether its view is current.
+    def blockedMask(self, priority):
+        mask = self.masks.get(priority)
+        if (mask is not None):
+            return mask
+        mask = self.topPriority.translate(self.maskTable(priority))
+        self.masks[priority] = mask
+        return mask
+
+    # The translation table that turns `topPriority` into the mask for
+    # `priority`
+    def maskTable(self, priority):
+        table = self.maskTables.get(priority)
+        if (table is None):
+            table = bytes([1 if p < priority else 0 for p in range(256)])
+            self.maskTables[priority] = table
+        return table
+
+    # Save everything about the board that playing changes--its tiles,
+    # the state of its level, and where its random numbers are up
+    # to--so that `restore` can put it back, or `fork` copy it
+    def snapshot(self):
+        return BoardSnapshot(self)
+
+    # Put the board back as it was when `snapshot` was taken. No moves
+    # or collisions happen: the tiles just go back where they were,
+    # with their fields as they were. Cells that change are redrawn and
+    # reported to the cell change listeners. The snapshot can be
+    # restored any number of times.
+    def restore(self, snapshot):
+        if (snapshot.board is not self):
+            raise ValueError("the snapshot is of a different board")
+        self.load(snapshot, None)
+
+    # A new board, in the state of `snapshot` (by default, of this
+    # board now), with a copy of each tile. The copy shares nothing
+    # that changes with this board: playing on it (or restoring it)
+    # never touches this board, and its random numbers come from a
+    # generator of its own that starts where this board's is. An AI
+    # squirrel's own fields are copied, but not what is inside them.
+    # 
+    # The copies are made with none of their constructors run, so no
+    # pictures are loaded; `copies` says which tile is which.
+    def fork(self, snapshot=None):
+        if (snapshot is None):
+            snapshot = BoardSnapshot(self)
+        source = snapshot.board
+        board  = GameBoard(source.cfg, source.width, source.height)
+        board.sandbox = True
+        board.rng     = random.Random()
+        copies = {id(source): board}
+        for (tile, state) in snapshot.tiles:
+            copies[id(tile)] = object.__new__(type(tile))
+        board.load(snapshot, copies)
+        board.copies  = {tile: copies[id(tile)] for (tile, state) in snapshot.tiles}
+        return board
+
+    # Load `snapshot` onto this board. `copies` maps the ids of the
+    # snapshot's board and tiles to the ones to use here, or is None
+    # to load it back onto the board it was taken from.
+    def load(self, snapshot, copies):
+        if (copies is None):
+            translate = None
+            tileFor   = lambda tile: tile
+        else:
+            translate = lambda v: copies.get(id(v), v)
+            tileFor   = translate
+        for (tile, state) in snapshot.tiles:
+            tileFor(tile).loadState(state, translate)
+        self.state.loadState(snapshot.state)
+        self.rng.setstate(snapshot.rng)
+        self.clockTickListeners = [tileFor(t) for t in snapshot.clockTickListeners]
+        self.ferrets     = [tileFor(t) for t in snapshot.ferrets]
+        self.healthpacks = [tileFor(t) for t in snapshot.healthpacks]
+        self.stones      = [tileFor(t) for t in snapshot.stones]
+        if (snapshot.endTile is not None):
+            self.endTile = tileFor(snapshot.endTile)
+
+        # The cells whose tiles change
+        changed = []
+        height  = self.height
+        if (self.terrain != snapshot.terrain):
+            # A new board is drawn in full anyway
+            if (copies is None):
+                changed.extend(divmod(i, height) for i in range(len(self.terrain))
+                               if self.terrain[i] != snapshot.terrain[i])
+            self.terrain[:] = snapshot.terrain
+        self.terrainTiles = list(snapshot.terrainTiles)
+        self.terrainIds   = dict(snapshot.terrainIds)
+        entities = self.entities
+        for cell in [c for c in entities if c not in snapshot.cells]:
+            del entities[cell]
+            changed.append(cell)
+        for cell, pairs in snapshot.cells.items():
+            queue = entities.get(cell)
+            if (copies is None and queue is not None and tuple(queue.lst) == pairs):
+                continue
+            queue = entities[cell] = PriorityQueue()
+            # The most recently added comes first among equals
+            for (priority, tile) in reversed(pairs):
+                queue.add(tileFor(tile), priority)
+            changed.append(cell)
+
+        old = self.topPriority
+        if (old != snapshot.topPriority):
+            for p in list(self.masks):
+                table = self.maskTable(p)
+                if (old.translate(table) != snapshot.topPriority.translate(table)):
+                    del self.masks[p]
+            old[:] = snapshot.topPriority
+        for (x, y) in changed:
+            self.markDirty(x, y)
+            self.paintBackground(x, y)
+            for observer in self.cellChangeListeners:
+                observer.handleCellChange(x, y)
 
     # Handle a move from one coordinate to another
     def handleMove(self, tile, fromX, fromY, toX, toY):
         # If fromX/Y are None (since they have never been set before)
         if (fromX != None and fromY != None):
-            self.board[fromX][fromY].remove(tile)
+            self.removeEntity(tile, fromX, fromY)
+            self.refreshCell(fromX, fromY)
+
+        self.addEntity(tile, toX, toY)
+        self.refreshCell(toX, toY)
 
-        self.board[toX][toY].add(tile, tile.getPriority())
+        # Dirty the screen. A tile that stays put has still been taken
+        # out of its cell and put back, so it is now drawn first among
+        # its equals, and the cell must be drawn again.
+        if (fromX != None and fromY != None):
+            self.markDirty(fromX, fromY)
+        self.markDirty(toX, toY)
 
-        # Dirty the screen, also process collisions
+        # Process collisions
         if (fromX != toX or fromY != toY):
-            if (fromX and fromY):
-                self.dirty[fromX][fromY] = True
-            self.dirty[toX][toY] = True
-            for observer in self.board[toX][toY]:
+            for observer in self.entities[(toX, toY)]:
                 if (observer[1].getPriority() >= tile.getPriority()):
                     observer[1].handleCollisionWith(tile)
                 #if tile.getPriority() >= observer[1].getPriority():
@@ -120,6 +582,16 @@ class GameBoard:
     def unregisterForClockTick(self,observer):
         self.clockTickListeners.remove(observer)
 
+    # Register for cell change events: `observer.handleCellChange(x, y)`
+    # is called whenever a tile is added to, removed from, or moves
+    # into or out of (x,y)
+    def registerForCellChanges(self,observer):
+        self.cellChangeListeners.append(observer)
+
+    # Unregister for cell change events
+    def unregisterForCellChanges(self,observer):
+        self.cellChangeListeners.remove(observer)
+
     # Clock tick event
     # This is called from game.py
     def clockTick(self,fps,num):
@@ -140,32 +612,158 @@ class GameBoard:
                 self.addTile(hp)
                 self.healthpacks.append(hp)
 
-    # Render the whole screen
-    def renderScreen(self,screen):
-        # Walk through all of the x,y coordinates, redraw the screen
-        # if necessary. Take care to avoid drawing when the screen is
-        # not dirty
-        for x in range(self.width):
-            for y in range(self.height):
-                self.renderAt(screen, x, y)
-
-        # Draw life
-        font = pygame.font.SysFont('Comic Sans MS', 30)
-        textsurface = font.render('Fuel: ' + str(self.state.hp),
-                                  False, (255, 255, 255))
-        screen.blit(textsurface,(0,0))
+    # The tiles in `previous` (a dictionary from tiles to the (x,y)
+    # they were at) that are on the board somewhere else now, as a list
+    # of (tile, fromX, fromY)
+    def movedTiles(self, previous):
+        moved = []
+        for tile, (fromX, fromY) in previous.items():
+            x = tile.getX()
+            y = tile.getY()
+            if (fromX is not None and (fromX != x or fromY != y)
+                and tile in self.entities.get((x, y), ())):
+                moved.append((tile, fromX, fromY))
+        return moved
 
+    # Draw the screen, returning the list of rects (in screen pixels)
+    # that changed, to be passed to `pygame.display.update`. Only the
+    # dirty cells in view are drawn again, along with the tiles drawn
+    # between cells and the fuel display; fonts and the rendered fuel
+    # are kept, and made again only when the fuel changes. If the view
+    # has moved, the screen is scrolled first (see `scrollView`).
+    # 
+    # `previous` maps tiles to where they were before the last clock
+    # tick, and `alpha` is how far through the next tick the game is.
+    # A tile still on the board that has moved since then is drawn
+    # `alpha` of the way from there to its cell, on top of the cells,
+    # so that movement looks smooth when there are several frames to a
+    # tick.
+    def renderScreen(self, screen, previous=None, alpha=1.0):
         if (self.state.gameOver()):
+            if (self.showingEnd):
+                return []
+            self.showingEnd = True
             screen.fill((0,0,0))
-            font = pygame.font.SysFont('Comic Sans MS', 80)
             wl   = 'Lose :-('
             if (self.state.hasWon()):
                 wl = 'Win :-)'
-            textsurface = font.render('You ' + wl,
-                                      False, (0, 255, 0))
-            screen.blit(textsurface,(100,200))
-            
-
-        # Redraw the whole screen
-        pygame.display.flip()
-                
+            screen.blit(renderText('You ' + wl, 80, (0, 255, 0)), (100,200))
+            return [screen.get_rect()]
+        if (self.showingEnd):
+            # The game has been restored to before it ended
+            self.showingEnd = False
+            self.markAllDirty()
+
+        size     = self.cfg["tileSize"]
+        scrolled = self.scrollView(screen)
+        x0, y0, x1, y1 = self.viewBounds()
+        view = pygame.Rect(x0 * size, y0 * size, (x1 - x0) * size, (y1 - y0) * size)
+        moving = []
+        if (previous is not None and alpha < 1):
+            moving = self.movedTiles(previous)
+        skip = set(tile for (tile, fromX, fromY) in moving)
+        sprites = []
+        for (tile, fromX, fromY) in sorted(moving, key=lambda m: -m[0].getPriority()):
+            x = fromX + (tile.getX() - fromX) * alpha
+            y = fromY + (tile.getY() - fromY) * alpha
+            sprites.append((tile, tile.getImage().get_rect(topleft=(round(x * size), round(y * size)))))
+
+        # Whatever was drawn between cells last frame is drawn over,
+        # along with the cells of the tiles drawn there, which may have
+        # come to rest
+        for (tile, rect) in self.sprites + sprites:
+            self.markRect(rect)
+            if (tile.getX() is not None):
+                self.markDirty(tile.getX(), tile.getY())
+
+        # Draw life
+        fuel = self.state.hp
+        hud  = renderText('Fuel: ' + str(fuel), 30, (255, 255, 255))
+        if (fuel != self.hudFuel):
+            if (self.hudRect is not None):
+                self.markScreenRect(self.hudRect)
+            self.hudRect = hud.get_rect()
+            self.markScreenRect(self.hudRect)
+            self.hudFuel = fuel
+
+        # Walk through the dirty cells and draw them
+        rects = []
+        if (self.allDirty or scrolled):
+            rects.append(view.move(-x0 * size, -y0 * size))
+        if (self.allDirty):
+            self.renderAll(screen, skip)
+        else:
+            for (x, y) in self.dirtyCells:
+                if (x0 <= x < x1 and y0 <= y < y1):
+                    self.renderAt(screen, x, y, skip)
+                    rects.append(pygame.Rect((x - x0) * size, (y - y0) * size, size, size))
+        self.dirtyCells.clear()
+        self.allDirty = False
+
+        for (tile, rect) in sprites:
+            if (rect.colliderect(view)):
+                rect = rect.move(-x0 * size, -y0 * size)
+                screen.blit(tile.getImage(), rect)
+                rects.append(rect)
+        self.sprites = sprites
+
+        if (self.hudRect.collidelist(rects) != -1):
+            screen.blit(hud, self.hudRect)
+            rects.append(self.hudRect)
+        return rects
+
+# Fonts, by size, and the text rendered in them, so that they are only
+# made once
+fonts = {}
+renderedText = {}
+
+# `text` rendered in the font of size `size` in `color`, kept for the
+# next time the same text is wanted
+def renderText(text, size, color):
+    key = (text, size, color)
+    surface = renderedText.get(key)
+    if (surface is None):
+        font = fonts.get(size)
+        if (font is None):
+            font = fonts[size] = pygame.font.SysFont('Comic Sans MS', size)
+        # The fuel goes up and down a long way over a game, so only
+        # keep the most recent renderings
+        if (len(renderedText) > 64):
+            renderedText.clear()
+        surface = renderedText[key] = font.render(text, False, color)
+    return surface
+
+# Everything about a board that playing changes, saved by
+# `GameBoard.snapshot`: the terrain and `topPriority` as bytes, the
+# tiles in each cell of the entity layer, the board's lists of tiles,
+# and the state of every tile that isn't static scenery (see
+# `Tile.saveState`), of the LevelState and of the random number
+# generator. Static tiles are shared flyweights that never change, so
+# they are only referred to.
+class BoardSnapshot:
+    def __init__(self, board):
+        self.board        = board
+        self.terrain      = bytes(board.terrain)
+        self.topPriority  = bytes(board.topPriority)
+        self.terrainTiles = list(board.terrainTiles)
+        self.terrainIds   = dict(board.terrainIds)
+        # (x,y) -> the (priority, tile) pairs there, in drawing order
+        self.cells = {cell: tuple(queue.lst) for cell, queue in board.entities.items()}
+        self.state = board.state.saveState()
+        self.rng   = board.rng.getstate()
+        self.clockTickListeners = list(board.clockTickListeners)
+        self.ferrets     = list(board.ferrets)
+        self.healthpacks = list(board.healthpacks)
+        self.stones      = list(board.stones)
+        self.endTile     = getattr(board, "endTile", None)
+        tiles = {}
+        for pairs in self.cells.values():
+            for (priority, tile) in pairs:
+                if (not tile.isStatic()):
+                    tiles[id(tile)] = tile
+        for tile in (self.clockTickListeners + self.ferrets + self.healthpacks
+                     + self.stones + [self.endTile]):
+            if (tile is not None):
+                tiles[id(tile)] = tile
+        # (tile, its state) for every tile that can change
+        self.tiles = [(tile, tile.saveState()) for tile in tiles.values()]
@@ -6,6 +6,11 @@ class LevelState:
         self.hp   = initialHP
         self.won  = False
         self.over = False
+        # How often the player fired a stone, and was hit by a ferret
+        # or a stone (see `Squirrel.handleCollisionWith`)
+        self.stonesFired = 0
+        self.ferretHits  = 0
+        self.stoneHits   = 0
 
     # Get the fuel level
     def getFuel(self):
@@ -21,6 +26,25 @@ class LevelState:
     def incrementFuel(self,i):
         self.hp += i
 
+    # Count a stone fired by the player
+    def countStoneFired(self):
+        self.stonesFired += 1
+
+    # Count a hit on the player by a tile of type `tileType`
+    def countHit(self,tileType):
+        if (tileType == "ferret"):
+            self.ferretHits += 1
+        elif (tileType == "stone"):
+            self.stoneHits += 1
+
+    # The state as a dictionary, for a snapshot of the board
+    def saveState(self):
+        return dict(self.__dict__)
+
+    # Put back a state from `saveState`
+    def loadState(self, state):
+        self.__dict__.update(state)
+
     # Set whether the game has been won
     def setWon(self):
         self.won  = True
@@ -39,7 +39,7 @@ class Map:
                         print("Line {} of map is malformed".format(lineno))
                         exit(1)
                     for x in range(self.width):
-                        self.tiles[x][y] = self.tileFactory.fromChar(line[x], x, y)
+                        self.tiles[x][y] = self.tileFactory.fromChar(line[x])
                 y += 1
             file.close()
         except:
@@ -53,5 +53,5 @@ class Map:
         """
         for x in range(self.width):
             for y in range(self.height):
-                board.addTile(self.tiles[x][y])
+                board.addTileAt(self.tiles[x][y], x, y)
         return
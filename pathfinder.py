@@ -1,3 +1,55 @@
+from array import array
+from collections import deque, OrderedDict
+from heapq import heappush, heappop
+import weakref
+
+from players import moveFuel
+
+# The scratch space used by breadth-first search on one board. It is
+# shared by every PathFinder on that board, so repeated searches
+# (e.g., one per clock tick) reuse it instead of allocating.
+# 
+#   - stamp -- For each cell (at index x * height + y), the
+#   generation of the last search that reached it. A cell has been
+#   visited by the current search exactly when its stamp equals
+#   `generation`, so nothing needs clearing between searches.
+# 
+#   - parent -- For each cell reached by the current search, the
+#   index of the cell it was reached from.
+# 
+#   - cost -- For each cell reached by the current search, the
+#   cheapest known cost of getting there (used by weighted searches).
+# 
+#   - queue -- The search frontier.
+class SearchBuffers:
+    def __init__(self, size):
+        self.stamp      = array('I', bytes(4 * size))
+        self.parent     = array('i', bytes(4 * size))
+        self.cost       = array('d', bytes(8 * size))
+        self.queue      = deque()
+        self.generation = 0
+
+    # Start a new search, returning its generation
+    def nextGeneration(self):
+        self.generation += 1
+        if (self.generation > 0xFFFFFFFF):
+            # The stamps have wrapped around, so start them over
+            self.stamp = array('I', bytes(4 * len(self.stamp)))
+            self.generation = 1
+        self.queue.clear()
+        return self.generation
+
+# The SearchBuffers for each board
+searchBuffers = weakref.WeakKeyDictionary()
+
+# Get the SearchBuffers for `board`, creating them the first time
+def buffersFor(board):
+    buffers = searchBuffers.get(board)
+    if (buffers is None):
+        buffers = SearchBuffers(board.width * board.height)
+        searchBuffers[board] = buffers
+    return buffers
+
 # A path finder object isolates the logic to perform a path-finding
 # problem on:
 # 
@@ -21,13 +73,21 @@ class PathFinder:
         self.width   = self.board.width
         self.height  = self.board.height
 
-        # A two-dimensional array to store whether or not the tile has
-        # been visited.
-        self.visited = [[False for x in range(board.height)]
-                        for y in range(board.width)]
+        # Scratch space for the search, shared with other path
+        # finders on this board
+        self.buffers = buffersFor(board)
 
-        # XXX
-        self.winning = False
+        # The number of cells the last search expanded
+        self.expanded = 0
+
+    # A flat array, indexed by x * height + y, that is 1 wherever
+    # there is a wall (or other solid object) in the player's way. It
+    # is asked of the board every time, so a path finder that is kept
+    # and used again sees walls that have changed since it was made;
+    # the board keeps the mask until they do, so this costs a lookup.
+    @property
+    def blocked(self):
+        return self.board.blockedMask(self.player.getPriority())
 
     # Check whether `path` is a valid path
     def checkValidPath(self,path):
@@ -45,7 +105,7 @@ class PathFinder:
     # Check whether or not there is a wall (or other solid object) at
     # the coordinates (x,y)
     def wallAt(self,x,y):
-        return self.board.higherPriorityObjectAt(self.player,x,y)
+        return self.blocked[x * self.height + y] == 1
     
     # Check whether or not we can move to (x,y) I.e., is there a wall
     # there, or is it out of bounds?
@@ -65,16 +125,6 @@ class PathFinder:
             # is there
             return False
         
-    def shouldGo(self,x,y):
-        return self.canMoveTo(x,y) and self.visited[x][y] == False
-        
-    def go(self,x,y,lst):
-        nxt = [(x,y)] + lst
-        self.visited[x][y] = nxt
-        if x == self.to[0] and y == self.to[1]:
-            self.winning = nxt
-        return (x,y)
-
     def canSolve(self, toCoordinate):
         return (self.findPath(toCoordinate) != False)
 
@@ -97,25 +147,1272 @@ class PathFinder:
                 ret.append(n)
         return ret
 
+    # Breadth-first search from the start to `toCoordinate`. Returns
+    # the list of coordinates on the path, from `toCoordinate` back to
+    # the start, or False if there is no path.
+    # 
+    # Cells are numbered x * height + y. Each cell reached records
+    # the cell it was reached from in `parent`, and the path is read
+    # back along those pointers once the goal is reached.
     def solve(self,toCoordinate):
         self.to = toCoordinate
-        queue = [(self.startX,self.startY)]
-        self.visited[self.startX][self.startY] = [(self.startX, self.startY)]
+        width   = self.width
+        height  = self.height
+        blocked = self.blocked
+        buffers = self.buffers
+        generation = buffers.nextGeneration()
+        stamp   = buffers.stamp
+        parent  = buffers.parent
+        queue   = buffers.queue
+
+        goal = -1
+        if (0 <= toCoordinate[0] < width and 0 <= toCoordinate[1] < height):
+            goal = toCoordinate[0] * height + toCoordinate[1]
+        start = self.startX * height + self.startY
+        stamp[start] = generation
+        queue.append(start)
+        found = False
+        expanded = 0
         while (len(queue) > 0):
-            c = queue[0]
-            queue = queue[1:]
-            lst = self.visited[c[0]][c[1]]
-            mostRecent = lst[0]
-            x = mostRecent[0]
-            y = mostRecent[1]
-            if (self.shouldGo(x+1,y)):
-                queue.append(self.go(x+1,y,lst))
-            if (self.shouldGo(x-1,y)):
-                queue.append(self.go(x-1,y,lst))
-            if (self.shouldGo(x,y+1)):
-                queue.append(self.go(x,y+1,lst))
-            if (self.shouldGo(x,y-1)):
-                queue.append(self.go(x,y-1,lst))
-            if (self.winning != False):
+            c = queue.popleft()
+            expanded += 1
+            x, y = divmod(c, height)
+            # Expand right, left, down, then up
+            if (x + 1 < width):
+                n = c + height
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n]  = generation
+                    parent[n] = c
+                    queue.append(n)
+                    found = found or n == goal
+            if (x > 0):
+                n = c - height
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n]  = generation
+                    parent[n] = c
+                    queue.append(n)
+                    found = found or n == goal
+            if (y + 1 < height):
+                n = c + 1
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n]  = generation
+                    parent[n] = c
+                    queue.append(n)
+                    found = found or n == goal
+            if (y > 0):
+                n = c - 1
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n]  = generation
+                    parent[n] = c
+                    queue.append(n)
+                    found = found or n == goal
+            if (found):
                 break
-        return self.winning
+        queue.clear()
+        self.expanded = expanded
+        if (not found):
+            return False
+        return self.tracePath(goal)
+
+    # Walk the parent pointers from cell number `goal` back to the
+    # start, returning the coordinates on the way (as `solve` does)
+    def tracePath(self, goal):
+        height = self.height
+        parent = self.buffers.parent
+        start  = self.startX * height + self.startY
+        path = []
+        c = goal
+        while (c != start):
+            path.append(divmod(c, height))
+            c = parent[c]
+        path.append((self.startX, self.startY))
+        return path
+
+# A path finder that runs two breadth-first searches at once, one out
+# from the start and one back from the goal, and stops where they
+# meet. Each search only has to get about half way, so on open maps it
+# expands far fewer cells than PathFinder, and when the goal is walled
+# off the search on its side runs dry almost at once. Its paths are
+# shortest paths, as PathFinder's are, though not always the same
+# ones.
+#
+# The searches take turns a whole level at a time, the one with the
+# smaller frontier going next. Both use the board's shared search
+# buffers: the two searches stamp their cells with consecutive
+# generations, so a cell stamped by the other search is where they
+# meet, and `parent` points towards the start for cells of the forward
+# search and towards the goal for cells of the backward one.
+class BidirectionalPathFinder(PathFinder):
+    def __init__(self, board, player):
+        super().__init__(board, player)
+        # The cells each search expanded last time (`expanded` is
+        # their sum)
+        self.expandedForward  = 0
+        self.expandedBackward = 0
+
+    # Expand the cells of `frontier` (all stamped `mine`) in turn,
+    # returning the next level, the number of cells expanded, and, if
+    # the search ran into a cell stamped `other` (at which point it
+    # stops), the meeting as (cell, cell of the other search)
+    def expandLevel(self, frontier, mine, other):
+        width   = self.width
+        height  = self.height
+        blocked = self.blocked
+        stamp   = self.buffers.stamp
+        parent  = self.buffers.parent
+        level   = []
+        i = 0
+        for c in frontier:
+            i += 1
+            x, y = divmod(c, height)
+            # Right, left, down, then up, as in PathFinder
+            if (x + 1 < width):
+                n = c + height
+                s = stamp[n]
+                if (s == other):
+                    return (level, i, (c, n))
+                if (s != mine and not blocked[n]):
+                    stamp[n]  = mine
+                    parent[n] = c
+                    level.append(n)
+            if (x > 0):
+                n = c - height
+                s = stamp[n]
+                if (s == other):
+                    return (level, i, (c, n))
+                if (s != mine and not blocked[n]):
+                    stamp[n]  = mine
+                    parent[n] = c
+                    level.append(n)
+            if (y + 1 < height):
+                n = c + 1
+                s = stamp[n]
+                if (s == other):
+                    return (level, i, (c, n))
+                if (s != mine and not blocked[n]):
+                    stamp[n]  = mine
+                    parent[n] = c
+                    level.append(n)
+            if (y > 0):
+                n = c - 1
+                s = stamp[n]
+                if (s == other):
+                    return (level, i, (c, n))
+                if (s != mine and not blocked[n]):
+                    stamp[n]  = mine
+                    parent[n] = c
+                    level.append(n)
+        return (level, i, None)
+
+    def solve(self,toCoordinate):
+        self.to = toCoordinate
+        self.expanded = self.expandedForward = self.expandedBackward = 0
+        height = self.height
+        tx, ty = toCoordinate
+        if (not (0 <= tx < self.width and 0 <= ty < height)):
+            return False
+        goal  = tx * height + ty
+        start = self.startX * height + self.startY
+        # As with PathFinder, there is no path from a cell to itself,
+        # nor to a cell that can't be entered
+        if (goal == start or self.blocked[goal]):
+            return False
+
+        buffers  = self.buffers
+        forward  = buffers.nextGeneration()
+        backward = buffers.nextGeneration()
+        stamp    = buffers.stamp
+        stamp[start] = forward
+        stamp[goal]  = backward
+        ahead  = [start]
+        behind = [goal]
+        meeting = None
+        while (len(ahead) > 0 and len(behind) > 0):
+            if (len(ahead) <= len(behind)):
+                ahead, count, meeting = self.expandLevel(ahead, forward, backward)
+                self.expandedForward += count
+                if (meeting is not None):
+                    a, b = meeting
+                    break
+            else:
+                behind, count, meeting = self.expandLevel(behind, backward, forward)
+                self.expandedBackward += count
+                if (meeting is not None):
+                    b, a = meeting
+                    break
+        self.expanded = self.expandedForward + self.expandedBackward
+        if (meeting is None):
+            return False
+        # From the goal back to the meeting, then on to the start
+        parent = buffers.parent
+        path = []
+        c = b
+        while (c != goal):
+            path.append(divmod(c, height))
+            c = parent[c]
+        path.append((tx, ty))
+        path.reverse()
+        return path + self.tracePath(a)
+
+# A cost model says how much a path costs, for the searches that
+# weigh their moves (see AStarPathFinder). It has three parts:
+# 
+#   - moveCost(dx, dy) -- The cost of one move by (dx, dy).
+# 
+#   - cellCosts(board) -- Either None, or a flat sequence indexed by
+#   x * height + y giving an extra cost for entering each cell. Extra
+#   costs must not be negative.
+# 
+#   - heuristic(dx, dy, connectivity) -- A lower bound on the cost of
+#   getting |dx| tiles across and |dy| tiles down using moves of the
+#   given connectivity. It must never overestimate, or the paths
+#   found are no longer the cheapest.
+# 
+# This base model charges 1 for every move, so the cheapest path is
+# the one with the fewest moves.
+class CostModel:
+    def moveCost(self, dx, dy):
+        return 1
+
+    def cellCosts(self, board):
+        return None
+
+    def heuristic(self, dx, dy, connectivity):
+        if (connectivity == 8):
+            return max(dx, dy)
+        return dx + dy
+
+# Charges what an AISquirrel pays in fuel to move (see `moveFuel`):
+# 1 + |x| + |y| for a move by (x, y), so a diagonal step (3) is
+# cheaper than the two straight ones (2 each) it replaces.
+# 
+# Getting |dx| across and |dy| down takes at least max(dx, dy) moves
+# with diagonals, or dx + dy without, and those moves cover dx + dy
+# between them, so the fuel is at least that many moves plus dx + dy.
+# With diagonals this is exact on an open board.
+class FuelCostModel(CostModel):
+    def moveCost(self, dx, dy):
+        return moveFuel(dx, dy)
+
+    def heuristic(self, dx, dy, connectivity):
+        return CostModel.heuristic(self, dx, dy, connectivity) + dx + dy
+
+# A path finder that uses A* search to find the cheapest path under a
+# CostModel (by default, the one using the least fuel). With
+# `connectivity` 8 it also considers diagonal moves, which the
+# AISquirrel can make. It answers `findPath` the same way as the
+# breadth-first PathFinder, and its paths may include diagonal
+# moves such as (1, -1).
+class AStarPathFinder(PathFinder):
+    # The moves available at each connectivity, in the order they are
+    # tried
+    straightMoves = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    diagonalMoves = [(1, 1), (-1, -1), (1, -1), (-1, 1)]
+
+    def __init__(self, board, player, connectivity=8, costModel=None):
+        super().__init__(board, player)
+        if (connectivity != 4 and connectivity != 8):
+            raise ValueError("connectivity must be 4 or 8")
+        self.connectivity = connectivity
+        self.costModel    = costModel or FuelCostModel()
+
+        # The cost of the last path found
+        self.pathCost = None
+
+    # The moves to try from each cell, as (dx, dy, index offset, cost)
+    def moves(self):
+        moves = AStarPathFinder.straightMoves
+        if (self.connectivity == 8):
+            moves = moves + AStarPathFinder.diagonalMoves
+        return [(dx, dy, dx * self.height + dy, self.costModel.moveCost(dx, dy))
+                for (dx, dy) in moves]
+
+    # A* search from the start to `toCoordinate`, returning the path
+    # in the same form as `PathFinder.solve`
+    def solve(self,toCoordinate):
+        self.to = toCoordinate
+        self.pathCost = None
+        self.expanded = 0
+        width   = self.width
+        height  = self.height
+        blocked = self.blocked
+        tx, ty  = toCoordinate
+        if (not (0 <= tx < width and 0 <= ty < height)):
+            return False
+        goal  = tx * height + ty
+        start = self.startX * height + self.startY
+        # As with PathFinder, there is no path from a cell to itself
+        if (goal == start):
+            return False
+
+        buffers    = self.buffers
+        generation = buffers.nextGeneration()
+        stamp      = buffers.stamp
+        parent     = buffers.parent
+        cost       = buffers.cost
+        moves      = self.moves()
+        cellCosts  = self.costModel.cellCosts(self.board)
+        heuristic  = self.costModel.heuristic
+        connectivity = self.connectivity
+
+        stamp[start] = generation
+        cost[start]  = 0
+        # Entries are (estimated total, -cost so far, cell), so ties
+        # go to the cell furthest along its path
+        heap = [(heuristic(abs(self.startX - tx), abs(self.startY - ty),
+                           connectivity), 0, start)]
+        expanded = 0
+        while (len(heap) > 0):
+            f, g, c = heappop(heap)
+            g = -g
+            if (g > cost[c]):
+                # A cheaper way here was found after this was queued
+                continue
+            if (c == goal):
+                break
+            expanded += 1
+            x, y = divmod(c, height)
+            for (dx, dy, offset, step) in moves:
+                nx = x + dx
+                ny = y + dy
+                if (nx < 0 or nx >= width or ny < 0 or ny >= height):
+                    continue
+                n = c + offset
+                if (blocked[n]):
+                    continue
+                ng = g + step
+                if (cellCosts is not None):
+                    ng += cellCosts[n]
+                if (stamp[n] != generation or ng < cost[n]):
+                    stamp[n]  = generation
+                    cost[n]   = ng
+                    parent[n] = c
+                    heappush(heap, (ng + heuristic(abs(nx - tx), abs(ny - ty),
+                                                   connectivity), -ng, n))
+        self.expanded = expanded
+        if (stamp[goal] != generation):
+            return False
+        self.pathCost = cost[goal]
+        return self.tracePath(goal)
+
+# The tables JumpPointPathFinder uses to jump along columns, built
+# from one blocked mask (see GameBoard.blockedMask). Columns are
+# contiguous in the mask, so a jump up or down a column is a search of
+# these byte strings rather than a step-by-step walk.
+# 
+#   - forcedDown / forcedUp -- 1 at each cell that has a "forced"
+#   neighbour when entered moving down (y increasing) / up: a cell to
+#   its left or right that is open although the cell beside the one
+#   it was entered from is not. Only a turn at such a cell can lead
+#   somewhere that a turn earlier in the column could not reach.
+# 
+# All of the shifting is done on the whole mask at once as one big
+# integer, one byte per cell.
+class JumpTables:
+    def __init__(self, mask, width, height):
+        self.mask = mask
+        size   = width * height
+        shift  = 8 * height
+        full   = (1 << (8 * size)) - 1
+        ones   = int.from_bytes(b'\x01' * size, 'little')
+        column = int.from_bytes(b'\x01' * height, 'little')
+        blocked = int.from_bytes(mask, 'little')
+        # The edges of the board count as blocked
+        leftBlocked  = ((blocked << shift) | column) & full
+        rightBlocked = (blocked >> shift) | (column << (8 * (size - height)))
+        leftOpen  = leftBlocked ^ ones
+        rightOpen = rightBlocked ^ ones
+        self.forcedDown = ((leftOpen  & (leftBlocked  << 8)) |
+                           (rightOpen & (rightBlocked << 8))).to_bytes(size, 'little')
+        self.forcedUp   = ((leftOpen  & (leftBlocked  >> 8)) |
+                           (rightOpen & (rightBlocked >> 8))).to_bytes(size, 'little')
+
+# The JumpTables for each board, rebuilt when its blocked mask changes
+jumpTables = weakref.WeakKeyDictionary()
+
+# A path finder that uses jump point search (JPS), which finds the
+# same length paths as the breadth-first PathFinder (4-way moves, each
+# costing 1) but is much faster on large open maps.
+# 
+# Shortest paths on an open grid come in many equivalent orderings of
+# the same moves. JPS only considers one of them: runs across a row,
+# from each cell of which it looks straight up and down the column,
+# turning back across a row only at cells with a forced neighbour (see
+# JumpTables). The search then only queues the "jump points" where a
+# path can turn, and jumps over everything in between.
+class JumpPointPathFinder(PathFinder):
+    def __init__(self, board, player):
+        super().__init__(board, player)
+        self.tables = self.currentTables()
+
+    # The JumpTables for the board's blocked mask as it is now, shared
+    # with other finders on the board, built if the mask has changed
+    def currentTables(self):
+        blocked = self.blocked
+        tables  = jumpTables.get(self.board)
+        if (tables is None or tables.mask is not blocked):
+            tables = JumpTables(blocked, self.width, self.height)
+            jumpTables[self.board] = tables
+        return tables
+
+    # Jump from cell `c` along its column in direction `dy`, returning
+    # the first jump point reached or -1 if there is none before a wall
+    def jumpVertical(self, c, dy):
+        height   = self.height
+        blocked  = self.blocked
+        goal     = self.goal
+        colStart = c - c % height
+        if (dy > 0):
+            end = blocked.find(1, c + 1, colStart + height)
+            if (end == -1):
+                end = colStart + height
+            jump = self.tables.forcedDown.find(1, c + 1, end)
+            if (c < goal < end and (jump == -1 or goal < jump)):
+                jump = goal
+        else:
+            start = blocked.rfind(1, colStart, c) + 1
+            if (start == 0):
+                start = colStart
+            jump = self.tables.forcedUp.rfind(1, start, c)
+            if (start <= goal < c and goal > jump):
+                jump = goal
+        return jump
+
+    # Run from cell `c` along its row in direction `dx`, returning the
+    # first cell from which a vertical jump finds a jump point (or
+    # that is the goal), or -1 if a wall or the edge comes first
+    def jumpHorizontal(self, c, dx):
+        height  = self.height
+        blocked = self.blocked
+        step    = dx * height
+        x       = c // height
+        while True:
+            x += dx
+            if (x < 0 or x >= self.width):
+                return -1
+            c += step
+            if (blocked[c]):
+                return -1
+            if (c == self.goal
+                or self.jumpVertical(c, 1) != -1
+                or self.jumpVertical(c, -1) != -1):
+                return c
+
+    # The jumps to make from cell `c`, as (horizontal?, direction)
+    # pairs, given the jump point `p` it was reached from
+    def directions(self, c, p):
+        height = self.height
+        if (p == -1):
+            # The start: try everything
+            return [(True, 1), (True, -1), (False, 1), (False, -1)]
+        if (p // height != c // height):
+            # Arrived across a row: keep going, and look up and down
+            dx = 1 if c > p else -1
+            return [(True, dx), (False, 1), (False, -1)]
+        # Arrived along a column: keep going, and turn only towards
+        # forced neighbours
+        dy = 1 if c > p else -1
+        blocked = self.blocked
+        dirs = [(False, dy)]
+        x = c // height
+        if (x > 0 and not blocked[c - height] and blocked[c - dy - height]):
+            dirs.append((True, -1))
+        if (x + 1 < self.width and not blocked[c + height] and blocked[c - dy + height]):
+            dirs.append((True, 1))
+        return dirs
+
+    # Jump point search from the start to `toCoordinate`, returning
+    # the path in the same form as `PathFinder.solve`
+    def solve(self,toCoordinate):
+        self.to = toCoordinate
+        self.expanded = 0
+        width  = self.width
+        height = self.height
+        tx, ty = toCoordinate
+        if (not (0 <= tx < width and 0 <= ty < height)):
+            return False
+        goal  = tx * height + ty
+        start = self.startX * height + self.startY
+        # As with PathFinder, there is no path from a cell to itself
+        if (goal == start):
+            return False
+        self.goal = goal
+        # The walls may have changed since the last search
+        if (self.tables.mask is not self.blocked):
+            self.tables = self.currentTables()
+
+        buffers    = self.buffers
+        generation = buffers.nextGeneration()
+        stamp      = buffers.stamp
+        parent     = buffers.parent
+        cost       = buffers.cost
+
+        stamp[start]  = generation
+        cost[start]   = 0
+        parent[start] = -1
+        heap = [(abs(self.startX - tx) + abs(self.startY - ty), 0, start)]
+        expanded = 0
+        while (len(heap) > 0):
+            f, g, c = heappop(heap)
+            g = -g
+            if (g > cost[c]):
+                continue
+            if (c == goal):
+                break
+            expanded += 1
+            for (horizontal, d) in self.directions(c, parent[c]):
+                if (horizontal):
+                    n = self.jumpHorizontal(c, d)
+                else:
+                    n = self.jumpVertical(c, d)
+                if (n == -1):
+                    continue
+                if (horizontal):
+                    ng = g + abs(n - c) // height
+                else:
+                    ng = g + abs(n - c)
+                if (stamp[n] != generation or ng < cost[n]):
+                    stamp[n]  = generation
+                    cost[n]   = ng
+                    parent[n] = c
+                    nx, ny = divmod(n, height)
+                    heappush(heap, (ng + abs(nx - tx) + abs(ny - ty), -ng, n))
+        self.expanded = expanded
+        if (stamp[goal] != generation):
+            return False
+
+        # Walk back along the jump points, filling in the cells
+        # between each one and the one before it
+        path = []
+        c = goal
+        while (c != start):
+            p = parent[c]
+            x, y   = divmod(c, height)
+            px, py = divmod(p, height)
+            dx = (px > x) - (px < x)
+            dy = (py > y) - (py < y)
+            while ((x, y) != (px, py)):
+                path.append((x, y))
+                x += dx
+                y += dy
+            c = p
+        path.append((self.startX, self.startY))
+        return path
+
+# A distance field holds, for every cell on the board, the cost of the
+# cheapest path from that cell to one goal, along with the first move
+# of that path. It is built with a single search outward from the goal,
+# after which any number of players, anywhere on the board, can look
+# up their next step in O(1). The goal never has to be searched for
+# again until the walls change.
+# 
+# The field is built against the board's blocked mask for `priority`
+# (see GameBoard.blockedMask), and `isCurrent` tells whether that mask
+# is still the board's current one. Moves and costs work as in
+# AStarPathFinder; by default every 4-way move costs 1, as in
+# PathFinder. Blocked cells have no distance.
+class DistanceField:
+    # Every move, numbered from 1 in `step` (0 means no move)
+    allMoves = AStarPathFinder.straightMoves + AStarPathFinder.diagonalMoves
+
+    def __init__(self, board, goal, priority, connectivity=4, costModel=None):
+        if (connectivity != 4 and connectivity != 8):
+            raise ValueError("connectivity must be 4 or 8")
+        # Only a weak reference, so the field doesn't keep the board
+        # alive through the cache in `distanceFieldFor`
+        self.board        = weakref.ref(board)
+        self.goal         = goal
+        self.priority     = priority
+        self.connectivity = connectivity
+        self.costModel    = costModel
+        self.width        = board.width
+        self.height       = board.height
+        self.mask         = board.blockedMask(priority)
+        size = self.width * self.height
+        # The cost from each cell (x * height + y) to the goal
+        self.distance = array('d', [float("inf")]) * size
+        # The first move from each cell towards the goal, numbered as
+        # in `allMoves`
+        self.step     = bytearray(size)
+        self.solve()
+
+    # Search outward from the goal, filling in `distance` and `step`
+    def solve(self):
+        width    = self.width
+        height   = self.height
+        blocked  = self.mask
+        distance = self.distance
+        step     = self.step
+        gx, gy   = self.goal
+        if (not (0 <= gx < width and 0 <= gy < height)):
+            return
+        goal = gx * height + gy
+        if (blocked[goal]):
+            return
+        # Each entry is (number in `step`, dx, dy, index offset, cost)
+        # for reaching a cell *from* the cell `offset` away
+        moves = []
+        for k in range(self.connectivity):
+            dx, dy = DistanceField.allMoves[k]
+            cost = 1
+            if (self.costModel is not None):
+                cost = self.costModel.moveCost(dx, dy)
+            moves.append((k + 1, dx, dy, dx * height + dy, cost))
+        cellCosts = None
+        if (self.costModel is not None):
+            cellCosts = self.costModel.cellCosts(self.board())
+        distance[goal] = 0
+
+        if (cellCosts is None and len(set(m[4] for m in moves)) == 1):
+            # Every move costs the same, so breadth-first order is
+            # cheapest-first order
+            cost  = moves[0][4]
+            queue = deque([goal])
+            while (len(queue) > 0):
+                n = queue.popleft()
+                x, y = divmod(n, height)
+                d = distance[n] + cost
+                for (k, dx, dy, offset, c) in moves:
+                    px = x - dx
+                    py = y - dy
+                    if (px < 0 or px >= width or py < 0 or py >= height):
+                        continue
+                    p = n - offset
+                    if (blocked[p] or distance[p] <= d):
+                        continue
+                    distance[p] = d
+                    step[p]     = k
+                    queue.append(p)
+            return
+
+        heap = [(0, goal)]
+        while (len(heap) > 0):
+            d, n = heappop(heap)
+            if (d > distance[n]):
+                continue
+            x, y = divmod(n, height)
+            if (cellCosts is not None):
+                d += cellCosts[n]
+            for (k, dx, dy, offset, c) in moves:
+                px = x - dx
+                py = y - dy
+                if (px < 0 or px >= width or py < 0 or py >= height):
+                    continue
+                p = n - offset
+                if (blocked[p] or distance[p] <= d + c):
+                    continue
+                distance[p] = d + c
+                step[p]     = k
+                heappush(heap, (d + c, p))
+
+    # Whether the walls are still the ones this field was built for
+    def isCurrent(self):
+        board = self.board()
+        return board is not None and board.blockedMask(self.priority) is self.mask
+
+    # The cost of getting from (x,y) to the goal, or None if it can't
+    # be done
+    def distanceAt(self, x, y):
+        if (not (0 <= x < self.width and 0 <= y < self.height)):
+            return None
+        d = self.distance[x * self.height + y]
+        if (d == float("inf")):
+            return None
+        return d
+
+    # The first move (dx, dy) on a cheapest path from (x,y) to the
+    # goal, or None if there is no such move (because (x,y) is the
+    # goal or can't reach it)
+    def nextStep(self, x, y):
+        if (not (0 <= x < self.width and 0 <= y < self.height)):
+            return None
+        k = self.step[x * self.height + y]
+        if (k == 0):
+            return None
+        return DistanceField.allMoves[k - 1]
+
+    # A cheapest path from (x,y) to the goal, in the form returned by
+    # `PathFinder.findPath`, or False if there is none
+    def findPath(self, x, y):
+        if (self.nextStep(x, y) is None):
+            return False
+        path = [(x, y)]
+        move = self.nextStep(x, y)
+        while (move is not None):
+            path.append(move)
+            x += move[0]
+            y += move[1]
+            move = self.nextStep(x, y)
+        return path
+
+# The distance fields built for each board, by (goal, priority,
+# connectivity, cost model), least recently used first
+distanceFields = weakref.WeakKeyDictionary()
+
+# The most distance fields kept for one board. A field takes about 9
+# bytes per cell, and a game that keeps picking new goals would
+# otherwise keep every field it ever built.
+fieldCapacity = 8
+
+# Get a current distance field to `goal` on `board`, building one only
+# if no current one is cached. Players that pass the same arguments
+# (including the same cost model object) share one field. Once a board
+# has `fieldCapacity` fields, the least recently used is dropped to
+# make room for a new one.
+def distanceFieldFor(board, goal, priority, connectivity=4, costModel=None):
+    fields = distanceFields.get(board)
+    if (fields is None):
+        fields = distanceFields[board] = OrderedDict()
+    key   = (tuple(goal), priority, connectivity, costModel)
+    field = fields.get(key)
+    if (field is None or not field.isCurrent()):
+        field = fields[key] = DistanceField(board, goal, priority,
+                                            connectivity, costModel)
+        while (len(fields) > fieldCapacity):
+            fields.popitem(last=False)
+    fields.move_to_end(key)
+    return field
+
+# A path finder that answers from the shared distance field to its
+# goal, so that after the first query for a goal, every later query
+# for it (from any player with the same priority) only follows the
+# field's steps
+class DistanceFieldPathFinder(PathFinder):
+    def solve(self,toCoordinate):
+        self.to = toCoordinate
+        self.expanded = 0
+        field = distanceFieldFor(self.board, toCoordinate, self.player.getPriority())
+        # As with PathFinder, there is no path from a cell to itself
+        path = field.findPath(self.startX, self.startY)
+        if (path == False):
+            return False
+        # Turn the moves back into the cells `solve` returns
+        x, y  = self.startX, self.startY
+        cells = [(x, y)]
+        for (dx, dy) in path[1:]:
+            x += dx
+            y += dy
+            cells.append((x, y))
+        cells.reverse()
+        return cells
+
+# A hierarchical view of one board, for path finding on very large
+# maps (HPA*, Botea, Mueller and Schaeffer, 2004).
+# 
+# The board is cut into square clusters of `clusterSize` cells. Where
+# two clusters meet, each run of cells that is open on both sides of
+# the border is an entrance, crossed at its middle or, for runs of
+# `longEntrance` cells or more, at both of its ends. These transition
+# cells are the nodes of an abstract graph, linked across each border
+# by a single step and, inside each cluster, by the length of the
+# shortest path that stays in the cluster. A query searches the much
+# smaller abstract graph and then fills in the steps along only the
+# abstract path it chose, so its paths are close to, though not
+# always, the shortest. Moves are 4-way and cost 1, as in PathFinder.
+# 
+# A cluster's entrances and distances are worked out the first time a
+# search reaches it (or for every cluster at once by `build`) and then
+# kept. The graph listens to the board for cell changes, and when a
+# cell becomes blocked or clear it forgets only what that cell
+# affects: the distances inside its cluster and, for a cell on a
+# border, the entrances on that border and both clusters beside it.
+# Call `close` when done with the graph, so the board stops telling it
+# about changes.
+class ClusterGraph:
+    def __init__(self, board, priority, clusterSize=16, longEntrance=6):
+        if (clusterSize < 2):
+            raise ValueError("clusterSize must be at least 2")
+        # Only a weak reference, so the graph doesn't keep the board
+        # alive through the cache in `clusterGraphFor`
+        self.board        = weakref.ref(board)
+        self.topPriority  = board.topPriority
+        self.priority     = priority
+        self.clusterSize  = clusterSize
+        self.longEntrance = longEntrance
+        self.width        = board.width
+        self.height       = board.height
+        self.clustersX    = -(-self.width // clusterSize)
+        self.clustersY    = -(-self.height // clusterSize)
+        # Which cells are blocked, kept up to date by `handleCellChange`
+        self.blocked      = bytearray(board.blockedMask(priority))
+        self.buffers      = buffersFor(board)
+
+        # (vertical, cx, cy) -> the transitions across the border
+        # between cluster (cx, cy) and the next cluster right (if
+        # `vertical`) or down, as (cell, cell across) pairs
+        self.borders = {}
+        # cluster -> {transition cell: [cells across its borders]}
+        self.nodes   = {}
+        # cluster -> {transition cell: [(cell, distance)]}, linking
+        # each transition to the others in its cluster and to the
+        # cells across its borders
+        self.edges   = {}
+
+        # The number of abstract nodes expanded by the last search
+        self.expanded = 0
+
+        board.registerForCellChanges(self)
+
+    # Stop listening to the board
+    def close(self):
+        board = self.board()
+        if (board is not None):
+            board.unregisterForCellChanges(self)
+
+    # The number of the cluster holding cell `c`
+    def clusterOf(self, c):
+        x, y = divmod(c, self.height)
+        return (x // self.clusterSize) * self.clustersY + y // self.clusterSize
+
+    # The cells of cluster `cluster`, as x0 <= x < x1, y0 <= y < y1
+    def bounds(self, cluster):
+        cx, cy = divmod(cluster, self.clustersY)
+        size = self.clusterSize
+        return (cx * size, min((cx + 1) * size, self.width),
+                cy * size, min((cy + 1) * size, self.height))
+
+    # The transitions across one border (see `borders`)
+    def border(self, vertical, cx, cy):
+        key   = (vertical, cx, cy)
+        pairs = self.borders.get(key)
+        if (pairs is not None):
+            return pairs
+        height  = self.height
+        size    = self.clusterSize
+        blocked = self.blocked
+        if (vertical):
+            x     = (cx + 1) * size - 1
+            y0    = cy * size
+            first = x * height + y0
+            count = min(y0 + size, height) - y0
+            step, across = 1, height
+        else:
+            y     = (cy + 1) * size - 1
+            x0    = cx * size
+            first = x0 * height + y
+            count = min(x0 + size, self.width) - x0
+            step, across = height, 1
+        pairs = []
+        run = 0
+        for i in range(count + 1):
+            a = first + i * step
+            if (i < count and not blocked[a] and not blocked[a + across]):
+                run += 1
+                continue
+            if (run > 0):
+                start = a - run * step
+                end   = a - step
+                if (run >= self.longEntrance):
+                    pairs.append((start, start + across))
+                    pairs.append((end, end + across))
+                else:
+                    middle = start + (run // 2) * step
+                    pairs.append((middle, middle + across))
+                run = 0
+        self.borders[key] = pairs
+        return pairs
+
+    # The transition cells of `cluster` (see `nodes`)
+    def clusterNodes(self, cluster):
+        nodes = self.nodes.get(cluster)
+        if (nodes is not None):
+            return nodes
+        nodes = {}
+        cx, cy = divmod(cluster, self.clustersY)
+        if (cx + 1 < self.clustersX):
+            for (a, b) in self.border(True, cx, cy):
+                nodes.setdefault(a, []).append(b)
+        if (cx > 0):
+            for (a, b) in self.border(True, cx - 1, cy):
+                nodes.setdefault(b, []).append(a)
+        if (cy + 1 < self.clustersY):
+            for (a, b) in self.border(False, cx, cy):
+                nodes.setdefault(a, []).append(b)
+        if (cy > 0):
+            for (a, b) in self.border(False, cx, cy - 1):
+                nodes.setdefault(b, []).append(a)
+        self.nodes[cluster] = nodes
+        return nodes
+
+    # The links from the transition cells of `cluster` (see `edges`)
+    def clusterEdges(self, cluster):
+        edges = self.edges.get(cluster)
+        if (edges is not None):
+            return edges
+        nodes = self.clusterNodes(cluster)
+        cells = list(nodes)
+        edges = {c: [(n, 1) for n in nodes[c]] for c in cells}
+        stamp = self.buffers.stamp
+        cost  = self.buffers.cost
+        # Distances are symmetric, so each pair needs only one search
+        for i in range(len(cells) - 1):
+            a = cells[i]
+            generation = self.searchCluster(a, cluster)
+            for b in cells[i + 1:]:
+                if (stamp[b] == generation):
+                    d = int(cost[b])
+                    edges[a].append((b, d))
+                    edges[b].append((a, d))
+        self.edges[cluster] = edges
+        return edges
+
+    # Work out the entrances and distances of every cluster now,
+    # rather than as searches reach them
+    def build(self):
+        for cluster in range(self.clustersX * self.clustersY):
+            self.clusterEdges(cluster)
+
+    # Breadth-first search from cell `start` without leaving `cluster`,
+    # filling in `stamp`, `parent` and `cost` in the graph's buffers
+    # for every cell reached. Returns the search's generation.
+    def searchCluster(self, start, cluster):
+        x0, x1, y0, y1 = self.bounds(cluster)
+        height  = self.height
+        blocked = self.blocked
+        buffers = self.buffers
+        generation = buffers.nextGeneration()
+        stamp  = buffers.stamp
+        parent = buffers.parent
+        cost   = buffers.cost
+        queue  = buffers.queue
+        stamp[start] = generation
+        cost[start]  = 0
+        queue.append(start)
+        while (len(queue) > 0):
+            c = queue.popleft()
+            d = cost[c] + 1
+            x, y = divmod(c, height)
+            if (x + 1 < x1):
+                n = c + height
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n] = generation; parent[n] = c; cost[n] = d
+                    queue.append(n)
+            if (x > x0):
+                n = c - height
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n] = generation; parent[n] = c; cost[n] = d
+                    queue.append(n)
+            if (y + 1 < y1):
+                n = c + 1
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n] = generation; parent[n] = c; cost[n] = d
+                    queue.append(n)
+            if (y > y0):
+                n = c - 1
+                if (stamp[n] != generation and not blocked[n]):
+                    stamp[n] = generation; parent[n] = c; cost[n] = d
+                    queue.append(n)
+        return generation
+
+    # Cell change event from the board
+    def handleCellChange(self, x, y):
+        i = x * self.height + y
+        blocked = 1 if self.topPriority[i] < self.priority else 0
+        if (self.blocked[i] == blocked):
+            return
+        self.blocked[i] = blocked
+        size   = self.clusterSize
+        cx, cy = x // size, y // size
+        self.edges.pop(cx * self.clustersY + cy, None)
+        if (x % size == size - 1 and cx + 1 < self.clustersX):
+            self.dropBorder(True, cx, cy)
+        if (x % size == 0 and cx > 0):
+            self.dropBorder(True, cx - 1, cy)
+        if (y % size == size - 1 and cy + 1 < self.clustersY):
+            self.dropBorder(False, cx, cy)
+        if (y % size == 0 and cy > 0):
+            self.dropBorder(False, cx, cy - 1)
+
+    # Forget the transitions across a border, and everything about the
+    # clusters on either side of it
+    def dropBorder(self, vertical, cx, cy):
+        self.borders.pop((vertical, cx, cy), None)
+        cluster = cx * self.clustersY + cy
+        if (vertical):
+            other = cluster + self.clustersY
+        else:
+            other = cluster + 1
+        for c in (cluster, other):
+            self.nodes.pop(c, None)
+            self.edges.pop(c, None)
+
+    # A path between cells `start` and `goal`, as the list of cells on
+    # it from start to goal, or None if there is none
+    def findCells(self, start, goal):
+        self.expanded = 0
+        if (self.blocked[goal]):
+            return None
+        height = self.height
+        stamp  = self.buffers.stamp
+        cost   = self.buffers.cost
+        startCluster = self.clusterOf(start)
+        goalCluster  = self.clusterOf(goal)
+
+        # Link the start to the transitions of its cluster (and to the
+        # goal, if it is in the same cluster), and the transitions of
+        # the goal's cluster to the goal
+        generation = self.searchCluster(start, startCluster)
+        startLinks = [(n, int(cost[n])) for n in self.clusterNodes(startCluster)
+                      if stamp[n] == generation]
+        if (goalCluster == startCluster and stamp[goal] == generation):
+            startLinks.append((goal, int(cost[goal])))
+        generation = self.searchCluster(goal, goalCluster)
+        goalLinks = {n: int(cost[n]) for n in self.clusterNodes(goalCluster)
+                     if stamp[n] == generation}
+
+        # A* over the abstract graph
+        gx, gy = divmod(goal, height)
+        best   = {start: 0}
+        parent = {start: None}
+        heap   = [(0, 0, start)]
+        expanded = 0
+        while (len(heap) > 0):
+            f, g, u = heappop(heap)
+            g = -g
+            if (g > best[u]):
+                continue
+            if (u == goal):
+                break
+            expanded += 1
+            cluster = self.clusterOf(u)
+            links = self.edges.get(cluster)
+            if (links is None):
+                links = self.clusterEdges(cluster)
+            links = links.get(u, ())
+            if (u == start):
+                links = startLinks + list(links)
+            if (cluster == goalCluster and u in goalLinks):
+                links = list(links) + [(goal, goalLinks[u])]
+            for (v, d) in links:
+                ng = g + d
+                if (ng < best.get(v, ng + 1)):
+                    best[v]   = ng
+                    parent[v] = u
+                    vx, vy = divmod(v, height)
+                    heappush(heap, (ng + abs(vx - gx) + abs(vy - gy), -ng, v))
+        self.expanded = expanded
+        if (goal not in parent):
+            return None
+
+        # Fill in the steps between the abstract nodes
+        nodes = []
+        u = goal
+        while (u is not None):
+            nodes.append(u)
+            u = parent[u]
+        nodes.reverse()
+        cells = [start]
+        for i in range(1, len(nodes)):
+            a, b = nodes[i - 1], nodes[i]
+            if (best[b] - best[a] == 1):
+                cells.append(b)
+            else:
+                cells.extend(self.clusterPath(a, b, self.clusterOf(a)))
+        return cells
+
+    # A shortest path from cell `a` to cell `b` that stays in
+    # `cluster`, found by A*, as the cells after `a` up to `b`
+    def clusterPath(self, a, b, cluster):
+        x0, x1, y0, y1 = self.bounds(cluster)
+        height  = self.height
+        blocked = self.blocked
+        buffers = self.buffers
+        generation = buffers.nextGeneration()
+        stamp  = buffers.stamp
+        parent = buffers.parent
+        cost   = buffers.cost
+        bx, by = divmod(b, height)
+        ax, ay = divmod(a, height)
+        stamp[a] = generation
+        cost[a]  = 0
+        heap = [(abs(ax - bx) + abs(ay - by), 0, a)]
+        while (len(heap) > 0):
+            f, g, c = heappop(heap)
+            g = -g
+            if (c == b):
+                break
+            if (g > cost[c]):
+                continue
+            x, y = divmod(c, height)
+            ng = g + 1
+            for (n, nx, ny) in ((c + height, x + 1, y), (c - height, x - 1, y),
+                                (c + 1, x, y + 1), (c - 1, x, y - 1)):
+                if (nx < x0 or nx >= x1 or ny < y0 or ny >= y1 or blocked[n]):
+                    continue
+                if (stamp[n] != generation or ng < cost[n]):
+                    stamp[n]  = generation
+                    cost[n]   = ng
+                    parent[n] = c
+                    heappush(heap, (ng + abs(nx - bx) + abs(ny - by), -ng, n))
+        path = []
+        c = b
+        while (c != a):
+            path.append(c)
+            c = parent[c]
+        path.reverse()
+        return path
+
+# The ClusterGraphs for each board, by (priority, cluster size)
+clusterGraphs = weakref.WeakKeyDictionary()
+
+# Get the ClusterGraph for `board`, creating one the first time
+def clusterGraphFor(board, priority, clusterSize=16):
+    graphs = clusterGraphs.get(board)
+    if (graphs is None):
+        graphs = clusterGraphs[board] = {}
+    graph = graphs.get((priority, clusterSize))
+    if (graph is None):
+        graph = graphs[(priority, clusterSize)] = ClusterGraph(board, priority, clusterSize)
+    return graph
+
+# A path finder that searches the board's shared ClusterGraph, for
+# maps too large for a flat search. Its paths may be a little longer
+# than the shortest.
+class HierarchicalPathFinder(PathFinder):
+    def __init__(self, board, player, clusterSize=16):
+        super().__init__(board, player)
+        self.graph = clusterGraphFor(board, player.getPriority(), clusterSize)
+
+    def solve(self,toCoordinate):
+        self.to = toCoordinate
+        self.expanded = 0
+        tx, ty = toCoordinate
+        if (not (0 <= tx < self.width and 0 <= ty < self.height)):
+            return False
+        start = self.startX * self.height + self.startY
+        goal  = tx * self.height + ty
+        # As with PathFinder, there is no path from a cell to itself
+        if (start == goal):
+            return False
+        cells = self.graph.findCells(start, goal)
+        self.expanded = self.graph.expanded
+        if (cells is None):
+            return False
+        return [divmod(c, self.height) for c in reversed(cells)]
+
+# A bounded cache of the paths found on one board. Paths are keyed on
+# (start, goal, connectivity, player priority), and each is kept with
+# the board's blocked mask for that priority when it was found. The
+# board makes a new mask whenever a cell becomes blocked or clear for
+# that priority, so a cached path is never out of date: once that
+# happens, the old entries stop matching, and are found again when
+# next asked for. When the cache holds `capacity` paths, the least
+# recently used one is evicted to make room.
+# 
+# With connectivity 4 paths are found by breadth-first search (as by
+# PathFinder), and with 8 by AStarPathFinder.
+# 
+# `hits`, `misses` and `evictions` count what the cache has done since
+# it was made (or last cleared).
+class PathCache:
+    def __init__(self, board, capacity=256):
+        if (capacity < 1):
+            raise ValueError("capacity must be at least 1")
+        # Only a weak reference, so the cache doesn't keep the board
+        # alive through `pathCacheFor`
+        self.board     = weakref.ref(board)
+        self.capacity  = capacity
+        # key -> path (or False), least recently used first
+        self.entries   = OrderedDict()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def __len__(self): return len(self.entries)
+
+    # Forget every path and reset the counters
+    def clear(self):
+        self.entries.clear()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    # The counters and size, e.g., for printing under load
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self.entries)}
+
+    # A path from `player` to `toCoordinate`, in the form returned by
+    # `PathFinder.findPath`, or False if there is none
+    def findPath(self, player, toCoordinate, connectivity=4):
+        if (connectivity != 4 and connectivity != 8):
+            raise ValueError("connectivity must be 4 or 8")
+        priority = player.getPriority()
+        key  = ((player.getX(), player.getY()), tuple(toCoordinate),
+                connectivity, priority)
+        # A path holds for as long as the board's mask for the player's
+        # priority is the one it was found with (see
+        # `GameBoard.blockedMask`); players of other priorities are
+        # stopped by other tiles, and so have paths of their own
+        board = self.board()
+        mask  = board.blockedMask(priority)
+        entry = self.entries.get(key)
+        if (entry is not None and entry[0] is mask):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            path = entry[1]
+        else:
+            self.misses += 1
+            if (connectivity == 4):
+                path = PathFinder(board, player).findPath(toCoordinate)
+            else:
+                path = AStarPathFinder(board, player, 8).findPath(toCoordinate)
+            self.entries[key] = (mask, path)
+            self.entries.move_to_end(key)
+            if (len(self.entries) > self.capacity):
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        # Hand out a copy, so callers can't change the cached path
+        if (path == False):
+            return False
+        return list(path)
+
+    # The number of moves from `player` to `toCoordinate`, or None if
+    # there is no path
+    def distance(self, player, toCoordinate, connectivity=4):
+        path = self.findPath(player, toCoordinate, connectivity)
+        if (path == False):
+            return None
+        return len(path) - 1
+
+# The PathCache for each board
+pathCaches = weakref.WeakKeyDictionary()
+
+# Get the PathCache for `board`, creating one the first time
+def pathCacheFor(board, capacity=256):
+    cache = pathCaches.get(board)
+    if (cache is None):
+        cache = pathCaches[board] = PathCache(board, capacity)
+    return cache
+
+# A path finder that answers breadth-first search queries from the
+# board's shared PathCache, so asking for the same path again (until
+# the walls change) doesn't search at all
+class CachedPathFinder(PathFinder):
+    def findPath(self, toCoordinate):
+        return pathCacheFor(self.board).findPath(self.player, toCoordinate)
+
+# Make a RiskPathFinder (see riskmap.py). The risk map needs NumPy, so
+# riskmap.py is only loaded when this strategy is picked.
+def riskPathFinder(board, player):
+    from riskmap import RiskPathFinder
+    return RiskPathFinder(board, player)
+
+# The path finding strategies, by the name used to pick one (e.g., on
+# the `game.py solve` command line)
+strategies = {
+    "bfs":   PathFinder,
+    "astar": AStarPathFinder,
+    "jps":   JumpPointPathFinder,
+    "field": DistanceFieldPathFinder,
+    "cached": CachedPathFinder,
+    "hpa":    HierarchicalPathFinder,
+    "bidir":  BidirectionalPathFinder,
+    "risk":   riskPathFinder,
+}
+
+# Make a path finder for `player` on `board` using the named strategy
+def makePathFinder(board, player, strategy="bfs"):
+    if (strategy not in strategies):
+        raise ValueError("unknown path finding strategy {}".format(strategy))
+    return strategies[strategy](board, player)
@@ -1,5 +1,7 @@
 # Tiles, Players, and NPCs
 import pygame, sys, os, json, random
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
 from pygame.locals import *
 
 # The priorities of various elements
@@ -10,6 +12,104 @@ class Priority:
     arrow      = 1
     wall       = 1
 
+# Whether tiles load their pictures. The headless simulator (see
+# simulate.py) turns this off, so that games can run with no display
+# and without reading any image files; tiles then have no image.
+loadImages = True
+
+# The pictures loaded so far, by file name. Every tile showing a
+# picture shares the one surface, so a ferret firing a stone doesn't
+# read the stone's picture from disk again.
+images = {}
+
+# The file names of pictures in `images` loaded before the display
+# mode was set, and so not converted to its pixel format yet
+unconverted = set()
+
+# The pictures being read in the background by `preloadImages`, as
+# file name -> future, and the thread reading them
+preloads  = {}
+preloader = None
+
+# The pictures the players load for themselves (the tiles' come from
+# config.json, see `imageFiles`)
+playerImages = ["imgs/nuts.png", "imgs/stone0.png", "imgs/hospital.png",
+                "imgs/squirrelright.png", "imgs/ferret.png"]
+
+# Load the picture in `filename`, or return None if pictures are
+# turned off. Each picture is read once and then shared, so it must
+# not be drawn on. Once the display mode has been set, pictures are
+# converted to the display's pixel format, so that blitting them is a
+# plain copy; one loaded before then is converted the next time it is
+# asked for.
+def loadImage(filename):
+    if (not loadImages):
+        return None
+    image = images.get(filename)
+    if (image is None):
+        future = preloads.pop(filename, None)
+        if (future is not None):
+            image = future.result()
+        else:
+            image = pygame.image.load(os.path.join(filename))
+        unconverted.add(filename)
+    if (filename in unconverted):
+        if (pygame.display.get_surface() is not None):
+            unconverted.discard(filename)
+            if (image.get_flags() & pygame.SRCALPHA):
+                image = image.convert_alpha()
+            else:
+                image = image.convert()
+        images[filename] = image
+    return image
+
+# Start reading the pictures in `filenames` on a thread of their own,
+# so that they are ready by the time tiles ask for them. They are
+# converted, as usual, by `loadImage`. Does nothing if pictures are
+# turned off.
+def preloadImages(filenames):
+    global preloader
+    if (not loadImages):
+        return
+    if (preloader is None):
+        preloader = ThreadPoolExecutor(1)
+    for filename in filenames:
+        if (filename not in images and filename not in preloads):
+            preloads[filename] = preloader.submit(pygame.image.load, os.path.join(filename))
+
+# The file names of every picture the game shows with configuration
+# `cfg`
+def imageFiles(cfg):
+    return [tileData["filename"] for tileData in cfg["tiles"]] + playerImages
+
+# The names of the fields of tiles of class `cls`, i.e., the slots of
+# it and its ancestors, worked out once per class (see
+# `Tile.saveState`)
+fieldNamesOf = {}
+
+def fieldNames(cls):
+    names = fieldNamesOf.get(cls)
+    if (names is None):
+        names = []
+        for c in reversed(cls.__mro__):
+            slots = c.__dict__.get("__slots__", ())
+            if (isinstance(slots, str)):
+                slots = (slots,)
+            names.extend(s for s in slots if s not in ("__dict__", "__weakref__"))
+        names = fieldNamesOf[cls] = tuple(names)
+        fieldGetters[cls] = attrgetter(*names)
+    return names
+
+# Class -> a function returning the tuple of a tile's fields, for tiles
+# that have all of them set
+fieldGetters = {}
+
+# Stands for a field that has not been set yet
+unset = object()
+
+# The types of field value that can't refer to a tile or a board
+plainTypes = {int, float, bool, str, tuple, type(None)}
+
 # An exception that gets thrown when a player executes an
 # invalid move.
 class InvalidMoveException(Exception):
@@ -17,6 +117,11 @@ class InvalidMoveException(Exception):
 
 # The representation of a single tile on the game board
 class Tile:
+    # Tiles are numerous, so they keep their fields in slots rather
+    # than a per-object dictionary
+    __slots__ = ("xPosition", "yPosition", "priority", "observers",
+                 "tileType", "id", "image", "collisionObservers")
+
     def __init__(self, tileType):
         # The (x,y) position on the board
         self.xPosition = None
@@ -31,6 +136,10 @@ class Tile:
         # The type of this tile. This is a string.
         self.tileType  = tileType
 
+        # The id of this kind of tile from config.json, if it was
+        # made by the TileFactory
+        self.id        = None
+
         # The image to render the tile
         self.image     = None
         
@@ -50,6 +159,10 @@ class Tile:
     # Is this tile a "Squirrel" object
     def isSquirrel(self): return False
 
+    # Is this tile static scenery that never moves (e.g., grass or a
+    # wall)? The board keeps static tiles in its compact terrain layer.
+    def isStatic(self): return True
+
     # Register for collision events
     def registerCollisionObserver(self,o):
         self.collisionObservers.append(o)
@@ -64,22 +177,73 @@ class Tile:
             observer.handleCollisionWith(collidedTile)
 
     # Get a copy of this object. All object parameters are copied
-    # deeply, but image object is reused (i.e., shallow copy).
+    # deeply, but image object is reused (i.e., shallow copy). The
+    # copy starts with no observers of its own.
     def clone(self):
         t = Tile(self.tileType)
         t.xPosition = self.xPosition
+        t.yPosition = self.yPosition
         t.priority  = self.priority
-        # Should observers be copied..?
-        t.observers = self.observers
         t.tileType  = self.tileType
         t.image     = self.image
+        t.id        = self.id
         return t
 
+    # The state of this tile, for a snapshot of the board (see
+    # gameboard.py): the values of its fields, and a copy of its
+    # __dict__ if it has one (as AI squirrels, with fields of their
+    # own, do). Lists are copied, so the state doesn't change when the
+    # tile does; anything else is shared.
+    def saveState(self):
+        cls = type(self)
+        getter = fieldGetters.get(cls)
+        if (getter is None):
+            fieldNames(cls)
+            getter = fieldGetters[cls]
+        try:
+            values = getter(self)
+        except AttributeError:
+            values = [getattr(self, name, unset) for name in fieldNames(cls)]
+        values = tuple([v[:] if type(v) is list else v for v in values])
+        fields = getattr(self, "__dict__", None)
+        if (fields is not None):
+            fields = {k: v[:] if type(v) is list else v for k, v in fields.items()}
+        return (values, fields)
+
+    # Put back a state from `saveState`. Each value (or element of a
+    # list) is passed through `translate`, if given, which is how a
+    # copy of a board points its tiles at the copy instead.
+    def loadState(self, state, translate=None):
+        values, fields = state
+        for name, v in zip(fieldNamesOf[type(self)], values):
+            if (type(v) in plainTypes):
+                pass
+            elif (translate):
+                v = [translate(e) for e in v] if type(v) is list else translate(v)
+            elif (type(v) is list):
+                v = v[:]
+            if (v is unset):
+                if (hasattr(self, name)):
+                    delattr(self, name)
+            else:
+                setattr(self, name, v)
+        if (fields is not None):
+            own = self.__dict__
+            own.clear()
+            for k, v in fields.items():
+                if (type(v) in plainTypes):
+                    pass
+                elif (translate):
+                    v = [translate(e) for e in v] if type(v) is list else translate(v)
+                elif (type(v) is list):
+                    v = v[:]
+                own[k] = v
+
     # Set and load the image file for this tile, also firing the
     # observers to update the game board based on this
     def setImage(self,filename):
         try:
-            self.image = pygame.image.load(os.path.join(filename))
+            self.image = loadImage(filename)
         except:
             print("Cannot load tile image file {}".format(filename))
             exit(1)
@@ -112,8 +276,13 @@ class Tile:
     # Turn this object into a string
     def __str__(self): return "tile"
 
-# A tile factory that returns new tiles based on the character given
+# A tile factory that returns tiles based on the character given
 # Takes as input a configuration given as a Python dictionary.
+# 
+# The tiles it hands out are flyweights: there is exactly one tile per
+# map character, shared by every cell that uses it. They have no
+# position of their own (the board supplies it, see
+# `GameBoard.addTileAt`) and must not be modified.
 class TileFactory:
     def __init__(self,cfg):
         self.tiles = {}
@@ -126,16 +295,24 @@ class TileFactory:
             self.tiles[tileData["mapCharacter"]] = tile
         return
 
-    # Create a fresh new tile from the character with the specified
-    # coordinate
-    def fromChar(self,character,x,y):
-        tile = self.tiles[character].clone()
+    # Get the shared tile for the character. Given a position (the
+    # old way of calling this), it returns a copy placed there
+    # instead, as it used to, for callers that add it with
+    # `GameBoard.addTile`; the board stores it as the same terrain as
+    # the shared tile.
+    def fromChar(self,character,x=None,y=None):
+        tile = self.tiles[character]
+        if (x is None and y is None):
+            return tile
+        tile = tile.clone()
         tile.setPosition(x,y)
         return tile
 
 # Abstract Player class representing all of the common properties
 # shared by a character
 class Player(Tile):
+    __slots__ = ("board", "hp", "speed", "ticks", "canMove")
+
     def __init__(self, coordinate, board):
         super(Player, self).__init__("player")
         self.setPosition(coordinate[0], coordinate[1])
@@ -269,12 +446,17 @@ class Player(Tile):
             # is there
             return False
 
+    # Players move around, so they live in the board's entity layer
+    def isStatic(self): return False
+
     def __str__(self): return "player"
 
 
 # The "exit" tile in the game, a picture of a nut (i.e., when you get
 # here you win).
 class Exit(Player):
+    __slots__ = ()
+
     def __init__(self, coordinate, board):
         super(Exit, self).__init__(coordinate, board)
         self.setImage("imgs/nuts.png")
@@ -291,10 +473,12 @@ class Exit(Player):
 # A stone is a floating sprite on the board that moves and eventually
 # might hit another player.
 class Stone(Player):
+    __slots__ = ("nuts", "pic")
+
     def __init__(self, coordinate, board):
         super(Stone, self).__init__(coordinate, board)
         self.nuts = 0
-        self.pic = pygame.image.load(os.path.join("imgs/stone0.png"))
+        self.pic = loadImage("imgs/stone0.png")
         self.priority = Priority.player
         self.tileType = "stone"
 
@@ -326,10 +510,12 @@ class Stone(Player):
 
 # A health pack gives the player life once they touch it.
 class Health(Player):
+    __slots__ = ("nuts", "pic")
+
     def __init__(self, coordinate, board):
         super(Health, self).__init__(coordinate, board)
         self.nuts = 0
-        self.pic = pygame.image.load(os.path.join("imgs/hospital.png"))
+        self.pic = loadImage("imgs/hospital.png")
         self.priority = Priority.item
         self.setSpeed((0,0))
         self.tileType = "healthpack"
@@ -356,12 +542,23 @@ class Health(Player):
 
     def __str__(self): return "healthpack"
 
+# The fuel every move of a Squirrel costs (see `Squirrel.move`)
+stepFuel = 1
+
+# The fuel an AISquirrel uses to move by (dx, dy): the `stepFuel` that
+# `Squirrel.move` takes, plus |dx| + |dy| taken by `AISquirrel.move`.
+# It works on NumPy arrays too.
+def moveFuel(dx, dy):
+    return stepFuel + abs(dx) + abs(dy)
+
 # The main player in the game (i.e., the squirrel)
 class Squirrel(Player):
+    __slots__ = ("nuts", "pic", "movementVector", "STONESPEED")
+
     def __init__(self, coordinate, board):
         super(Squirrel, self).__init__(coordinate, board)
         self.nuts = 0
-        self.pic = pygame.image.load(os.path.join("imgs/squirrelright.png"))
+        self.pic = loadImage("imgs/squirrelright.png")
         self.priority = Priority.player
         self.setSpeed((0,0))
         self.movementVector = (1,0)
@@ -430,6 +627,7 @@ class Squirrel(Player):
             self.board.addTile(stone)
             self.board.registerForClockTick(stone)
             self.board.state.decrementFuel(10)
+            self.board.state.countStoneFired()
         return
 
     def move(self,x,y):
@@ -438,7 +636,7 @@ class Squirrel(Player):
         # Once we've performed the move, we need to update the player
         # statistics. Specifically, we:
         #   - Subtract one fuel
-        self.board.state.decrementFuel(1)
+        self.board.state.decrementFuel(stepFuel)
         
     def getImage(self):
         return self.pic
@@ -457,6 +655,7 @@ class Squirrel(Player):
             self.board.state.decrementFuel(15)
         if (other.tileType == "stone"):
             self.board.state.decrementFuel(10)
+        self.board.state.countHit(other.tileType)
 
 
     def __str__(self): return "squirrel"
@@ -464,18 +663,24 @@ class Squirrel(Player):
 # A "square" AI player. This AI player is a ferret that walks around
 # the board. 
 
+# The directions SquareAIFerret.fireStone picks from at random, and
+# the speeds (per unit of direction) it gives the stone
+fireDirections = [(1, 0), (0, 1), (-1, 0), (0, -1), (-1, -1), (1, 1), (1, -1), (-1, 1)]
+stoneSpeed     = (8, 4)
+
 class SquareAIFerret(Player):
+    __slots__ = ("nuts", "pic", "numTicks", "ticksSinceFire")
+
     def __init__(self, coordinate, board):
         super(SquareAIFerret, self).__init__(coordinate, board)
         self.nuts = 0
-        self.pic = pygame.image.load(os.path.join("imgs/ferret.png"))
+        self.pic = loadImage("imgs/ferret.png")
         self.priority = Priority.player
         self.setSpeed((5,0))
         self.numTicks = 0
         self.ticksSinceFire = 0
         self.hp = 30
         self.tileType = "ferret"
-        self.STONESPEED = 8
 
     # --------------------------------------------------------------
     # TASK 6 [7 points]
@@ -519,24 +724,8 @@ class SquareAIFerret(Player):
     
 
     def fireStone(self):
-        movementVector = [0,0]
-        ri = random.randint(0,7)
-        if (ri == 0):
-            movementVector = [1,0]
-        elif (ri == 1):
-            movementVector = [0,1]
-        elif (ri == 2):
-            movementVector = [-1, 0]
-        elif (ri == 3):
-            movementVector = [0, -1]
-        elif (ri == 4):
-            movementVector = [-1, -1]
-        elif (ri == 5):
-            movementVector = [1, 1]
-        elif (ri == 6):
-            movementVector = [1, -1]
-        elif (ri == 7):
-            movementVector = [-1, 1]
+        ri = self.board.rng.randint(0, len(fireDirections) - 1)
+        movementVector = fireDirections[ri]
 
         startingTile = (self.getX()+movementVector[0],
                         self.getY()+movementVector[1])
@@ -546,8 +735,8 @@ class SquareAIFerret(Player):
         if (self.canMoveTo(startingTile[0], startingTile[1])):
             stone = Stone(startingTile,self.board)
             stone.setPosition(startingTile[0], startingTile[1])
-            stone.setSpeed((movementVector[0] * self.STONESPEED,
-                            movementVector[1] * 4))
+            stone.setSpeed((movementVector[0] * stoneSpeed[0],
+                            movementVector[1] * stoneSpeed[1]))
             self.board.addTile(stone)
             self.board.registerForClockTick(stone)
             self.board.stones.append(stone)
@@ -1,33 +1,112 @@
 # CS 107, Fall 2018
 # Map Class for HaverQuest
 
+from bisect import insort
+
 class PriorityQueue:
     """
     An implementation of a priority queue
+
+    Entries are grouped into one bucket per priority. Lower numbers
+    are higher priority, and iteration runs from the lowest priority
+    (largest number) to the highest, which is the order tiles are
+    drawn in. Within a bucket, the most recently added entry comes
+    first.
+
+    `add` returns a handle that can be passed to `removeHandle` to
+    remove that exact entry in O(1).
     """
     def __init__(self):
-        self.lst = []
+        # priority -> {handle: element}, in insertion order
+        self.buckets    = {}
+        # The priorities that have a bucket, sorted from highest
+        # priority (lowest number) to lowest
+        self.priorities = []
+        # handle -> (priority, element)
+        self.entries    = {}
+        # id(element) -> list of live handles for that element
+        self.handles    = {}
+        # Next handle to give out
+        self.counter    = 0
+        # The sorted `lst` view, rebuilt lazily after a change
+        self.cache      = None
+
+    # The entries as a list of (priority, element) pairs, in
+    # iteration order
+    @property
+    def lst(self):
+        if (self.cache is None):
+            self.cache = [(priority, element)
+                          for priority in reversed(self.priorities)
+                          for element in reversed(self.buckets[priority].values())]
+        return self.cache
 
     # Number of items in the queue
-    def length(self): return len(self.lst)
+    def length(self): return len(self.entries)
+
+    def __len__(self): return len(self.entries)
 
     # Clear the queue
-    def clear(self): self.lst.clear()
+    def clear(self):
+        self.buckets.clear()
+        self.priorities.clear()
+        self.entries.clear()
+        self.handles.clear()
+        self.cache = None
+
+    # The highest priority (lowest number) in the queue, or None if
+    # the queue is empty
+    def topPriority(self):
+        if (len(self.priorities) == 0):
+            return None
+        return self.priorities[0]
 
-    # Add an element to the priority queue
+    # Add an element to the priority queue, returning a handle for
+    # the new entry
     def add(self,element,priority):
-        i = 0
-        while (i < len(self.lst) and self.lst[i][0] > priority):
-            i += 1
-        self.lst = self.lst[0:i] + [(priority,element)] + self.lst[i:]
+        handle = self.counter
+        self.counter += 1
+        bucket = self.buckets.get(priority)
+        if (bucket is None):
+            bucket = self.buckets[priority] = {}
+            insort(self.priorities, priority)
+        bucket[handle] = element
+        self.entries[handle] = (priority, element)
+        self.handles.setdefault(id(element), []).append(handle)
+        self.cache = None
+        return handle
+
+    # Remove the entry named by `handle`
+    def removeHandle(self,handle):
+        entry = self.entries.pop(handle, None)
+        if (entry is None):
+            return
+        priority, element = entry
+        bucket = self.buckets[priority]
+        del bucket[handle]
+        if (len(bucket) == 0):
+            del self.buckets[priority]
+            self.priorities.remove(priority)
+        handles = self.handles[id(element)]
+        handles.remove(handle)
+        if (len(handles) == 0):
+            del self.handles[id(element)]
+        self.cache = None
 
     # Remove an element from the queue
     def remove(self,element):
-        i = 0
-        while (i < len(self.lst) and self.lst[i][1] != element):
-            i += 1
-        self.lst = self.lst[0:i] + self.lst[i+1:]
+        handles = self.handles.get(id(element))
+        if (handles is None):
+            return
+        # Remove the entry that iterates first, as a linear scan
+        # would: lowest priority, then most recent
+        handle = handles[-1]
+        if (len(handles) > 1):
+            handle = max(handles, key=lambda h: (self.entries[h][0], h))
+        self.removeHandle(handle)
+
+    def __contains__(self,element):
+        return id(element) in self.handles
 
     def __iter__(self):
         return iter(self.lst)
-    
@@ -0,0 +1,262 @@
+# Incremental path planning for HaverQuest
+#
+# A PathFinder searches the whole board again every time it is asked.
+# When the board only changes a little between questions (a stone
+# flies past, a ferret takes a step, a health pack is used up) most of
+# that search comes out the same as last time. The planner here keeps
+# its search tree between questions and repairs only the parts that a
+# change affects.
+
+from array import array
+from heapq import heappush, heappop
+
+from pathfinder import CostModel, AStarPathFinder
+
+INF = float("inf")
+
+# An incremental planner using D* Lite (Koenig and Likhachev, 2002).
+#
+# The planner searches backwards from a fixed goal to wherever its
+# player currently is, keeping, for every cell, its cost to the goal
+# (`g`) and a one-step lookahead of that cost (`rhs`). It registers
+# with the board for cell change events. When a cell becomes blocked
+# or clear, only the costs that run through that cell are updated the
+# next time a path is asked for, so the work done scales with the size
+# of the change rather than the size of the board.
+#
+# A cell is blocked if it holds a higher-priority tile than the player
+# (e.g., a wall), or a tile whose `tileType` is in `avoid`, so by
+# default the planner steers around ferrets and stones. Moves and
+# costs work as in AStarPathFinder, and by default every 4-way move
+# costs 1, as in PathFinder.
+#
+# Call `close` when done with the planner, so the board stops telling
+# it about changes.
+class IncrementalPlanner:
+    def __init__(self, board, player, goal, connectivity=4, costModel=None,
+                 avoid=("ferret", "stone")):
+        if (connectivity != 4 and connectivity != 8):
+            raise ValueError("connectivity must be 4 or 8")
+        self.board        = board
+        self.player       = player
+        self.priority     = player.getPriority()
+        self.connectivity = connectivity
+        self.costModel    = costModel or CostModel()
+        self.avoid        = set(avoid)
+        self.width        = board.width
+        self.height       = board.height
+        size = self.width * self.height
+
+        # The moves, as (dx, dy, index offset, cost)
+        moves = AStarPathFinder.straightMoves
+        if (connectivity == 8):
+            moves = moves + AStarPathFinder.diagonalMoves
+        self.moves = [(dx, dy, dx * self.height + dy, self.costModel.moveCost(dx, dy))
+                      for (dx, dy) in moves]
+        self.cellCosts = self.costModel.cellCosts(board)
+
+        # Which cells the planner may not enter, kept up to date by
+        # `handleCellChange`
+        self.blocked = bytearray(board.blockedMask(self.priority))
+        for (x, y) in board.entities:
+            if (self.cellBlocked(x, y)):
+                self.blocked[x * self.height + y] = 1
+        # Cells whose `blocked` value has changed since the last plan
+        self.changed = set()
+
+        self.g   = array('d', [INF]) * size
+        self.rhs = array('d', [INF]) * size
+        # The open list. `keys` holds the current key of every cell
+        # on it; heap entries whose key doesn't match are stale.
+        self.heap = []
+        self.keys = {}
+        # The D* Lite key modifier, which grows as the player moves so
+        # that keys queued earlier stay valid
+        self.km = 0
+
+        self.goal  = goal[0] * self.height + goal[1]
+        self.start = self.playerCell()
+        self.last  = self.start
+        self.rhs[self.goal] = 0
+        self.push(self.goal)
+
+        # The number of cells expanded by the last plan, and in total
+        self.expanded      = 0
+        self.totalExpanded = 0
+
+        board.registerForCellChanges(self)
+
+    # Stop listening to the board
+    def close(self):
+        self.board.unregisterForCellChanges(self)
+
+    def playerCell(self):
+        return self.player.getX() * self.height + self.player.getY()
+
+    # Whether the planner should keep out of (x,y)
+    def cellBlocked(self, x, y):
+        if (self.board.topPriority[x * self.height + y] < self.priority):
+            return True
+        queue = self.board.entities.get((x, y))
+        if (queue is not None):
+            for (priority, tile) in queue:
+                if (tile.tileType in self.avoid):
+                    return True
+        return False
+
+    # Cell change event from the board
+    def handleCellChange(self, x, y):
+        i = x * self.height + y
+        blocked = 1 if self.cellBlocked(x, y) else 0
+        if (self.blocked[i] != blocked):
+            self.blocked[i] = blocked
+            self.changed.add(i)
+
+    # Estimated cost between cells `a` and `b`
+    def heuristic(self, a, b):
+        ax, ay = divmod(a, self.height)
+        bx, by = divmod(b, self.height)
+        return self.costModel.heuristic(abs(ax - bx), abs(ay - by), self.connectivity)
+
+    # The cost of moving from a cell into cell `v` by move `c`
+    def enterCost(self, v, c):
+        if (self.blocked[v]):
+            return INF
+        if (self.cellCosts is not None):
+            return c + self.cellCosts[v]
+        return c
+
+    # The cells one move away from cell `u`
+    def neighbours(self, u):
+        x, y = divmod(u, self.height)
+        for (dx, dy, offset, c) in self.moves:
+            if (0 <= x + dx < self.width and 0 <= y + dy < self.height):
+                yield (u + offset, c)
+
+    def calculateKey(self, u):
+        m = min(self.g[u], self.rhs[u])
+        return (m + self.heuristic(self.start, u) + self.km, m)
+
+    # Put `u` on the open list with its current key
+    def push(self, u):
+        key = self.calculateKey(u)
+        self.keys[u] = key
+        heappush(self.heap, (key[0], key[1], u))
+
+    # Recompute `rhs` for `u` and put it on (or take it off) the open
+    # list accordingly
+    def updateVertex(self, u):
+        if (u != self.goal):
+            best = INF
+            g = self.g
+            for (v, c) in self.neighbours(u):
+                cost = self.enterCost(v, c) + g[v]
+                if (cost < best):
+                    best = cost
+            self.rhs[u] = best
+        if (self.g[u] != self.rhs[u]):
+            self.push(u)
+        else:
+            self.keys.pop(u, None)
+
+    # The key of the first live entry on the open list, or None
+    def topKey(self):
+        heap = self.heap
+        while (len(heap) > 0):
+            k1, k2, u = heap[0]
+            if (self.keys.get(u) == (k1, k2)):
+                return (k1, k2)
+            heappop(heap)
+        return None
+
+    def computeShortestPath(self):
+        g     = self.g
+        rhs   = self.rhs
+        start = self.start
+        expanded = 0
+        while True:
+            top = self.topKey()
+            if (top is None):
+                break
+            if (top >= self.calculateKey(start) and rhs[start] == g[start]):
+                break
+            k1, k2, u = heappop(self.heap)
+            del self.keys[u]
+            expanded += 1
+            newKey = self.calculateKey(u)
+            if ((k1, k2) < newKey):
+                self.keys[u] = newKey
+                heappush(self.heap, (newKey[0], newKey[1], u))
+            elif (g[u] > rhs[u]):
+                g[u] = rhs[u]
+                for (p, c) in self.neighbours(u):
+                    self.updateVertex(p)
+            else:
+                g[u] = INF
+                for (p, c) in self.neighbours(u):
+                    self.updateVertex(p)
+                self.updateVertex(u)
+        self.expanded = expanded
+        self.totalExpanded += expanded
+
+    # Bring the search up to date with the player's position and the
+    # changes to the board since the last plan
+    def plan(self):
+        start = self.playerCell()
+        if (start != self.start):
+            self.km   += self.heuristic(self.last, start)
+            self.last  = start
+            self.start = start
+        for v in self.changed:
+            # Only the moves into `v` changed cost
+            for (p, c) in self.neighbours(v):
+                self.updateVertex(p)
+        self.changed.clear()
+        self.computeShortestPath()
+
+    # The cost of the cheapest path from the player to the goal, or
+    # None if there is none
+    def pathCost(self):
+        self.plan()
+        if (self.g[self.start] == INF):
+            return None
+        return self.g[self.start]
+
+    # The cell to move to from `u` on a cheapest path to the goal, or
+    # None if there is none
+    def bestNeighbour(self, u):
+        best, bestV = INF, None
+        for (v, c) in self.neighbours(u):
+            cost = self.enterCost(v, c) + self.g[v]
+            if (cost < best):
+                best, bestV = cost, v
+        return bestV
+
+    # A cheapest path from the player to the goal, in the form returned
+    # by `PathFinder.findPath`, or False if there is none (including,
+    # as with PathFinder, when the player is already at the goal)
+    def findPath(self):
+        self.plan()
+        start = self.start
+        if (start == self.goal or self.g[start] == INF):
+            return False
+        path = [divmod(start, self.height)]
+        u = start
+        while (u != self.goal):
+            v = self.bestNeighbour(u)
+            ux, uy = divmod(u, self.height)
+            vx, vy = divmod(v, self.height)
+            path.append((vx - ux, vy - uy))
+            u = v
+        return path
+
+    # The first move on a cheapest path from the player to the goal,
+    # or None if there is none
+    def nextStep(self):
+        self.plan()
+        start = self.start
+        if (start == self.goal or self.g[start] == INF):
+            return None
+        ux, uy = divmod(start, self.height)
+        vx, vy = divmod(self.bestNeighbour(start), self.height)
+        return (vx - ux, vy - uy)
@@ -0,0 +1,266 @@
+# Risk maps for HaverQuest: how much fuel the squirrel can expect to
+# lose by standing in each cell, using NumPy
+#
+# A SquareAIFerret walks round a fixed square and, on every seventh
+# move, fires a stone in one of the 8 directions at random. A ferret
+# moving onto the squirrel costs it 15 fuel and a stone 10 (see
+# `Squirrel.handleCollisionWith`). Where a ferret or stone will be at
+# any moment can be forecast (see spacetime.py), but which way a stone
+# will go can't, so the map here works with averages instead: how
+# often, in the long run, a ferret or a stone moves into each cell.
+
+import weakref
+
+import numpy as np
+
+from pathfinder import AStarPathFinder, FuelCostModel
+from spacetime import MoverForecast
+from players import fireDirections, stoneSpeed
+
+# Play out `ferret`'s patrol on `board` until it repeats (or for at
+# most `maxTicks` ticks), returning (ticks, entries, fires): the length
+# of the repeating part in ticks, and two dictionaries over cell
+# numbers counting how many times during it the ferret moves into each
+# cell and moves (and so may fire) from each cell.
+#
+# A ferret that walks into a wall never turns (it only turns when it
+# moves), so it stays where it is for good; its patrol is then one
+# tick long with no moves at all.
+def patrolOf(ferret, board, fps=10, num=1, maxTicks=1000):
+    mover  = MoverForecast(ferret, board)
+    height = board.height
+    seen   = {}
+    moves  = []
+    t = 0
+    while (t < maxTicks):
+        state = (mover.x, mover.y, mover.speed, mover.ticks[0], mover.ticks[1],
+                 mover.numTicks)
+        if (state in seen):
+            break
+        seen[state] = t
+        before = mover.x * height + mover.y
+        mover.step(fps, num)
+        after = mover.x * height + mover.y
+        moves.append((before, after))
+        t += 1
+    start = seen.get(state, 0)
+    entries = {}
+    fires   = {}
+    for (before, after) in moves[start:]:
+        if (after != before):
+            entries[after] = entries.get(after, 0) + 1
+            fires[before]  = fires.get(before, 0) + 1
+    return (t - start, entries, fires)
+
+# The cells that stones fired from `origins` (an array of cell
+# numbers) in the directions `dx`, `dy` move into before they hit a
+# wall, as a pair of arrays (ray, cell): the stone fired by ray `ray`
+# moves into `cell`. `open` is a flat boolean array of the cells a
+# stone can move to.
+#
+# Every stone is moved at once, one clock tick at a time, using the
+# arithmetic of `Player.clockTick`, so diagonal stones (which move
+# across faster than down) take the same crooked lines they do in the
+# game. A stone's speed doesn't change which cells it passes through,
+# so ticks here don't have to line up with ticks in the game.
+def stoneLanes(origins, dx, dy, open, width, height, fps=10, num=1):
+    x = origins // height + dx
+    y = origins % height + dy
+    ray = np.arange(len(origins))
+    # A stone is only fired if its first cell is open
+    ok = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    ok[ok] = open[x[ok] * height + y[ok]]
+    x, y, ray = x[ok], y[ok], ray[ok]
+    sx = (dx * stoneSpeed[0])[ok].astype(float)
+    sy = (dy * stoneSpeed[1])[ok].astype(float)
+    signX = np.where(sx >= 0, 1, -1)
+    signY = np.where(sy >= 0, 1, -1)
+    tx = np.zeros(len(x))
+    ty = np.zeros(len(x))
+    rays  = []
+    cells = []
+    while (len(x) > 0):
+        tx += sx / fps * num
+        ty += sy / fps * num
+        mx = np.where(np.abs(tx) > 1, signX, 0)
+        my = np.where(np.abs(ty) > 1, signY, 0)
+        tx -= mx
+        ty -= my
+        nx = x + mx
+        ny = y + my
+        ok = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+        ok[ok] = open[nx[ok] * height + ny[ok]]
+        moved = ok & ((mx != 0) | (my != 0))
+        rays.append(ray[moved])
+        cells.append(nx[moved] * height + ny[moved])
+        x, y, ray = nx[ok], ny[ok], ray[ok]
+        tx, ty, sx, sy = tx[ok], ty[ok], sx[ok], sy[ok]
+        signX, signY = signX[ok], signY[ok]
+    if (len(rays) == 0):
+        return (np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+    return (np.concatenate(rays), np.concatenate(cells))
+
+# The fuel the squirrel can expect to lose for each tick it spends in
+# each cell of `board`, from the ferrets on the board and the stones
+# they fire.
+#
+#   - risk -- A float array indexed [x, y]: the expected number of
+#   times per tick a ferret moves into the cell, times `ferretDamage`,
+#   plus the expected number of stones moving into it, times
+#   `stoneDamage`. Each ferret fires a stone on one move in
+#   `fireEvery`, from the cell it is moving out of, in each of the 8
+#   directions equally often.
+#
+#   - flat -- The same numbers as a flat view indexed x * height + y.
+#
+# Each ferret's share of the risk is kept, so when one dies (see
+# `SquareAIFerret.subtractHp`) `update` just takes its share away
+# rather than working everything out again. If the walls change,
+# `update` starts over.
+#
+# The map holds the board only through a weak reference, and its
+# ferrets only by id (they are listed in `board.ferrets` for as long as
+# the board lives), so the cache in `riskMapFor` doesn't keep the board
+# alive.
+class RiskMap:
+    def __init__(self, board, fps=10, num=1, ferretDamage=15, stoneDamage=10,
+                 fireEvery=7):
+        self.board        = weakref.ref(board)
+        self.width        = board.width
+        self.height       = board.height
+        self.fps          = fps
+        self.num          = num
+        self.ferretDamage = ferretDamage
+        self.stoneDamage  = stoneDamage
+        self.fireEvery    = fireEvery
+        # Goes up every time the risk changes
+        self.generation   = 0
+        self.build()
+
+    # Work out the risk from every live ferret on the board
+    def build(self):
+        board  = self.board()
+        width  = self.width
+        height = self.height
+        size   = width * height
+        ferrets = [f for f in board.ferrets if f.hp > 0 and f.getX() is not None]
+        self.mask = None
+        open = np.ones(size, dtype=bool)
+        if (len(ferrets) > 0):
+            self.priority = ferrets[0].getPriority()
+            self.mask = board.blockedMask(self.priority)
+            open = np.frombuffer(self.mask, dtype=np.uint8) == 0
+        # Every contribution as (ferret number, cell, amount)
+        owners  = []
+        cells   = []
+        amounts = []
+        # The stones, as (ferret number, origin, dx, dy, stones per tick)
+        origins = []
+        for i, ferret in enumerate(ferrets):
+            ticks, entries, fires = patrolOf(ferret, board, self.fps, self.num)
+            for c, n in entries.items():
+                owners.append(i)
+                cells.append(c)
+                amounts.append(self.ferretDamage * n / ticks)
+            rate = 1 / (self.fireEvery * ticks * len(fireDirections))
+            for c, n in fires.items():
+                for (dx, dy) in fireDirections:
+                    origins.append((i, c, dx, dy, n * rate))
+        if (len(origins) > 0):
+            o = np.array(origins)
+            rays, laneCells = stoneLanes(o[:, 1].astype(int), o[:, 2].astype(int),
+                                         o[:, 3].astype(int), open, width, height,
+                                         self.fps, self.num)
+            owners  = np.concatenate([owners, o[rays, 0].astype(int)])
+            cells   = np.concatenate([cells, laneCells])
+            amounts = np.concatenate([amounts, self.stoneDamage * o[rays, 4]])
+        owners  = np.asarray(owners, dtype=int)
+        cells   = np.asarray(cells, dtype=int)
+        amounts = np.asarray(amounts, dtype=float)
+        # Add up each ferret's contributions cell by cell
+        keys, inverse = np.unique(owners * size + cells, return_inverse=True)
+        totals = np.bincount(inverse, weights=amounts, minlength=len(keys))
+        self.flat = np.bincount(keys % size, weights=totals, minlength=size)
+        self.risk = self.flat.reshape(width, height)
+        bounds = np.searchsorted(keys, np.arange(len(ferrets) + 1) * size)
+        # id of the ferret -> (cells, amounts) of its share of the risk
+        self.shares = {}
+        for i, ferret in enumerate(ferrets):
+            share = slice(bounds[i], bounds[i + 1])
+            self.shares[id(ferret)] = (keys[share] % size, totals[share])
+        self.generation += 1
+
+    # Whether the walls are still the ones the map was built for
+    def isCurrent(self):
+        if (self.mask is None):
+            return True
+        board = self.board()
+        return board is not None and board.blockedMask(self.priority) is self.mask
+
+    # Take away the risk from ferrets that have died since the last
+    # update, or start over if the walls have changed
+    def update(self):
+        if (not self.isCurrent()):
+            self.build()
+            return
+        for ferret in self.board().ferrets:
+            if (ferret.hp <= 0 and id(ferret) in self.shares):
+                self.removeFerret(ferret)
+
+    # Take away `ferret`'s share of the risk
+    def removeFerret(self, ferret):
+        cells, amounts = self.shares.pop(id(ferret))
+        flat = self.flat
+        np.subtract.at(flat, cells, amounts)
+        # Don't leave rounding errors behind where the risk is gone
+        left = flat[cells]
+        flat[cells] = np.where(left < 1e-9, 0, left)
+        self.generation += 1
+
+    # The expected fuel lost per tick spent at (x,y)
+    def riskAt(self, x, y):
+        if (not (0 <= x < self.width and 0 <= y < self.height)):
+            return 0
+        return float(self.risk[x, y])
+
+# The risk maps built for each board
+riskMaps = weakref.WeakKeyDictionary()
+
+# Get an up-to-date risk map for `board`, building one the first time
+def riskMapFor(board):
+    riskMap = riskMaps.get(board)
+    if (riskMap is None):
+        riskMap = riskMaps[board] = RiskMap(board)
+    else:
+        riskMap.update()
+    return riskMap
+
+# A cost model that charges fuel for moves, as FuelCostModel does, plus
+# `weight` times the expected fuel lost in each cell entered, so a
+# search under it trades distance against risk: with a weight of 1 the
+# cost of a path is the fuel it can be expected to use in all. Its
+# cell costs always come from the up-to-date risk map.
+class RiskCostModel(FuelCostModel):
+    def __init__(self, riskMap, weight=1.0):
+        self.riskMap    = riskMap
+        self.weight     = weight
+        self.generation = None
+        self.costs      = None
+
+    def cellCosts(self, board):
+        riskMap = self.riskMap
+        riskMap.update()
+        if (self.generation != riskMap.generation):
+            self.costs      = (riskMap.flat * self.weight).tolist()
+            self.generation = riskMap.generation
+        return self.costs
+
+# An AStarPathFinder searching under a RiskCostModel for the board's
+# risk map. Risk only ever adds to a path's cost, so the usual
+# heuristic still never overestimates and the paths found are the
+# cheapest, just as a plain Dijkstra search over the weighted cells
+# would find them.
+class RiskPathFinder(AStarPathFinder):
+    def __init__(self, board, player, connectivity=8, weight=1.0):
+        super().__init__(board, player, connectivity,
+                         RiskCostModel(riskMapFor(board), weight))
@@ -0,0 +1,329 @@
+# Planning a whole level's route for HaverQuest: which health packs to
+# pick up, in which order, on the way to the exit
+#
+# Every move costs fuel, the squirrel gets a little fuel back every few
+# ticks, and each health pack is worth a fixed amount. Waiting in place
+# is always allowed, so any route can be walked without running out
+# of fuel; what a good route saves is waiting. The planner looks for
+# the route that reaches the exit soonest (waits included), and of
+# those, the one with the most fuel left.
+
+from pathfinder import PathFinder
+from players import moveFuel
+
+# Just enough of a player for a PathFinder to search from (x,y)
+class Position:
+    def __init__(self, x, y, priority):
+        self.x        = x
+        self.y        = y
+        self.priority = priority
+
+    def getX(self): return self.x
+    def getY(self): return self.y
+    def getPriority(self): return self.priority
+
+# The number of 4-way moves between every pair of `points` (a list of
+# (x,y) coordinates) on `board`, for tiles of priority `priority`, as
+# a matrix in which None means there is no path.
+#
+# This is one breadth-first search from all of the points at once.
+# Each cell holds a bit mask of the points whose searches have reached
+# it, and each level of the search passes the newly arrived bits on to
+# the neighbouring cells, so where several searches travel together
+# they share the work. The search stops as soon as every pair has its
+# distance.
+def pairwiseDistances(board, points, priority):
+    height  = board.height
+    width   = board.width
+    blocked = board.blockedMask(priority)
+    count   = len(points)
+    distance = [[None] * count for i in range(count)]
+    # cell -> the bit mask of the points at that cell
+    waypoints = {}
+    frontier  = {}
+    for i, (x, y) in enumerate(points):
+        c = x * height + y
+        waypoints[c] = waypoints.get(c, 0) | (1 << i)
+        frontier[c]  = frontier.get(c, 0) | (1 << i)
+    reached = dict(frontier)
+    missing = count * count
+    level = 0
+    while (len(frontier) > 0 and missing > 0):
+        for c, bits in frontier.items():
+            here = waypoints.get(c)
+            if (here is None):
+                continue
+            for i in range(count):
+                if (bits >> i & 1):
+                    for j in range(count):
+                        if (here >> j & 1 and distance[i][j] is None):
+                            distance[i][j] = level
+                            missing -= 1
+        level += 1
+        arriving = {}
+        for c, bits in frontier.items():
+            x, y = divmod(c, height)
+            for (ok, n) in ((x + 1 < width, c + height), (x > 0, c - height),
+                            (y + 1 < height, c + 1), (y > 0, c - 1)):
+                if (ok and not blocked[n]):
+                    new = bits & ~reached.get(n, 0)
+                    if (new):
+                        arriving[n] = arriving.get(n, 0) | new
+        for n, bits in arriving.items():
+            reached[n] = reached.get(n, 0) | bits
+        frontier = arriving
+    return distance
+
+# A planned route. `order` is the list of coordinates it visits,
+# starting with the player's and ending with the exit; `path` is in the
+# form returned by `PathFinder.findPath`, beginning with `waits` (0, 0)
+# moves spent gathering fuel. `arrival` is the tick the exit is reached
+# on, `fuelLeft` the fuel left then, and `packs` the number of health
+# packs picked up on the way.
+class Route:
+    def __init__(self, order, path, waits, arrival, fuelLeft, packs):
+        self.order    = order
+        self.path     = path
+        self.waits    = waits
+        self.arrival  = arrival
+        self.fuelLeft = fuelLeft
+        self.packs    = packs
+
+# A planner for the route from `player` to `exit` by way of any of the
+# health packs at `packs`. Fuel works as for the AISquirrel: starting
+# from `fuel`, each move costs what `moveFuel` says (the planner keeps
+# to 4-way moves, so that is the same for every move), each pack is
+# worth `packFuel`, and `regenFuel` comes back every `regenTicks`
+# ticks, the squirrel's own tick counter now standing at `regenPhase`.
+# The player makes at most one move per tick and must never be left
+# with no fuel.
+#
+# The distances between the points all come from one search (see
+# `pairwiseDistances`). With up to `exactLimit` packs the best order
+# is found exactly, by dynamic programming over the sets of packs
+# visited; beyond that it is built up by cheapest insertion and then
+# improved by reversing stretches of the route and dropping packs.
+class RoutePlanner:
+    def __init__(self, board, player, exit, packs, fuel, packFuel=15,
+                 regenFuel=3, regenTicks=5, regenPhase=0, exactLimit=10):
+        self.board      = board
+        self.priority   = player.getPriority()
+        self.start      = (player.getX(), player.getY())
+        self.exit       = tuple(exit)
+        # Packs at the start or the exit, or listed twice, add nothing
+        self.packs = []
+        for pack in packs:
+            pack = tuple(pack)
+            if (pack != self.start and pack != self.exit and pack not in self.packs):
+                self.packs.append(pack)
+        self.fuel       = fuel
+        self.packFuel   = packFuel
+        self.regenFuel  = regenFuel
+        self.regenTicks = regenTicks
+        self.regenPhase = regenPhase
+        self.exactLimit = exactLimit
+        self.moveFuel   = moveFuel(1, 0)
+        self.lookback   = self.movesToCheck()
+        # Points are numbered: the start is 0, the packs 1..k, and the
+        # exit k + 1
+        self.points   = [self.start] + self.packs + [self.exit]
+        self.distance = pairwiseDistances(board, self.points, self.priority)
+
+    # The fuel regenerated over the first `ticks` ticks from now
+    def regenerated(self, ticks):
+        if (ticks <= 0):
+            return 0
+        return self.regenFuel * ((self.regenPhase + ticks - 1) // self.regenTicks)
+
+    # The first tick on which the fuel regenerated will be more than
+    # `need`
+    def readyAt(self, need):
+        if (need < 0):
+            return 0
+        return (need // self.regenFuel + 1) * self.regenTicks - self.regenPhase + 1
+
+    # How many moves before the last of a leg `leg` needs to check, or
+    # None if it must check them all. A move `d` moves further back
+    # needs `d` moves' fuel less, so `regenTicks` ticks less of
+    # regeneration for every `regenFuel` of that, but leaves `d` more
+    # moves to go; it can be skipped once the first outweighs the
+    # second. Going `regenFuel` moves further back always gains more
+    # ticks than moves when moves use fuel faster than it comes back,
+    # so if that holds for `regenFuel` moves in a row it holds for the
+    # rest.
+    def movesToCheck(self):
+        if (self.moveFuel * self.regenTicks <= self.regenFuel):
+            return None
+        d, run = 1, 0
+        while (run < self.regenFuel):
+            if (self.regenTicks * (self.moveFuel * d // self.regenFuel) >= d):
+                run += 1
+            else:
+                run = 0
+            d += 1
+        return d - run
+
+    # Walk one leg of `moves` moves, ending with a gain of `gain` fuel,
+    # having arrived at its start on tick `arrival` with `spent` fuel
+    # spent (net of gains). Returns the new (arrival, spent).
+    #
+    # Waiting is best done up front, since that leaves the most fuel at
+    # every move after, so each move only puts a lower bound on the
+    # arrival: the tick fuel allows that move, plus the moves after it.
+    # The bound is tightest for the last few moves of a leg (see
+    # `movesToCheck`), so only those are checked.
+    def leg(self, arrival, spent, moves, gain):
+        base = spent - self.fuel
+        latest = arrival + moves
+        first = 1 if self.lookback is None else max(1, moves - self.lookback)
+        for j in range(first, moves + 1):
+            need = base + j * self.moveFuel
+            if (j == moves):
+                need -= gain
+            latest = max(latest, self.readyAt(need) + moves - j)
+        return (latest, spent + moves * self.moveFuel - gain)
+
+    # The (arrival, spent) of visiting the points numbered in `order`,
+    # starting from the player at tick 0, or None if some leg has no
+    # path
+    def evaluate(self, order):
+        arrival, spent = 0, 0
+        for i in range(1, len(order)):
+            moves = self.distance[order[i - 1]][order[i]]
+            if (moves is None):
+                return None
+            gain = self.packFuel if 0 < order[i] <= len(self.packs) else 0
+            arrival, spent = self.leg(arrival, spent, moves, gain)
+        return (arrival, spent)
+
+    # The best order to visit the points in, as point numbers, or None
+    # if the exit can't be reached
+    def bestOrder(self):
+        if (self.distance[0][len(self.points) - 1] is None):
+            return None
+        if (len(self.packs) <= self.exactLimit):
+            return self.exactOrder()
+        return self.heuristicOrder()
+
+    # Dynamic programming over (packs visited, last point). Arrival
+    # and fuel spent trade off against one another, so each state keeps
+    # every (arrival, spent) pair that no other pair beats on both.
+    def exactOrder(self):
+        packs = len(self.packs)
+        exit  = packs + 1
+        distance = self.distance
+        # (mask, last) -> list of (arrival, spent, route so far), with
+        # the route as a linked list of (point, rest)
+        states = {(0, 0): [(0, 0, (0, None))]}
+        best = None
+        for mask in range(1 << packs):
+            for last in range(packs + 1):
+                front = states.pop((mask, last), None)
+                if (front is None):
+                    continue
+                for (arrival, spent, route) in front:
+                    moves = distance[last][exit]
+                    if (moves is not None):
+                        end = self.leg(arrival, spent, moves, 0)
+                        if (best is None or end < best[:2]):
+                            best = (end[0], end[1], (exit, route))
+                    for j in range(1, packs + 1):
+                        bit = 1 << (j - 1)
+                        moves = distance[last][j]
+                        if (mask & bit or moves is None):
+                            continue
+                        a, s = self.leg(arrival, spent, moves, self.packFuel)
+                        self.addToFront(states, (mask | bit, j), (a, s, (j, route)))
+        order = []
+        route = best[2]
+        while (route is not None):
+            order.append(route[0])
+            route = route[1]
+        order.reverse()
+        return order
+
+    # Add `entry` to the front of `states[key]` unless it is beaten,
+    # dropping whatever it beats
+    def addToFront(self, states, key, entry):
+        front = states.get(key)
+        if (front is None):
+            states[key] = [entry]
+            return
+        a, s = entry[0], entry[1]
+        for (fa, fs, r) in front:
+            if (fa <= a and fs <= s):
+                return
+        front[:] = [e for e in front if not (a <= e[0] and s <= e[1])]
+        front.append(entry)
+
+    # Cheapest insertion followed by local improvement, for when there
+    # are too many packs to try every set of them
+    def heuristicOrder(self):
+        exit  = len(self.points) - 1
+        order = [0, exit]
+        score = self.evaluate(order)
+        unused = set(range(1, exit))
+        # Insert whichever pack, wherever, helps most, until none helps
+        while True:
+            best = None
+            for j in unused:
+                for i in range(1, len(order)):
+                    candidate = order[:i] + [j] + order[i:]
+                    s = self.evaluate(candidate)
+                    if (s is not None and s < score and (best is None or s < best[0])):
+                        best = (s, candidate, j)
+            if (best is None):
+                break
+            score, order, j = best
+            unused.discard(j)
+        # Reverse stretches of the route, or drop packs, while that helps
+        improved = True
+        while (improved):
+            improved = False
+            for i in range(1, len(order) - 1):
+                for k in range(i + 1, len(order) - 1):
+                    candidate = order[:i] + order[i:k + 1][::-1] + order[k + 1:]
+                    s = self.evaluate(candidate)
+                    if (s is not None and s < score):
+                        score, order, improved = s, candidate, True
+            for i in range(1, len(order) - 1):
+                candidate = order[:i] + order[i + 1:]
+                s = self.evaluate(candidate)
+                if (s is not None and s < score):
+                    score, order, improved = s, candidate, True
+                    break
+        return order
+
+    # Plan the route, returning a Route or None if the exit can't be
+    # reached
+    def plan(self):
+        order = self.bestOrder()
+        if (order is None):
+            return None
+        # Join up the legs
+        moves = []
+        for i in range(1, len(order)):
+            ax, ay = self.points[order[i - 1]]
+            leg = PathFinder(self.board, Position(ax, ay, self.priority)).findPath(
+                self.points[order[i]])
+            moves.extend(leg[1:])
+        # Walk the joined path to see when fuel runs short, counting
+        # each pack the first time the path enters its cell (which may
+        # be before the planned visit, if a leg happens to pass over
+        # it)
+        packs = set(self.packs)
+        x, y = self.start
+        spent, waits, gained = 0, 0, 0
+        for j, (dx, dy) in enumerate(moves):
+            x += dx
+            y += dy
+            spent += moveFuel(dx, dy)
+            if ((x, y) in packs):
+                packs.discard((x, y))
+                spent -= self.packFuel
+                gained += 1
+            waits = max(waits, self.readyAt(spent - self.fuel) - (j + 1))
+        arrival = waits + len(moves)
+        path = [self.start] + [(0, 0)] * waits + moves
+        return Route([self.points[i] for i in order], path, waits, arrival,
+                     self.fuel + self.regenerated(arrival) - spent, gained)
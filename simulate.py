@@ -0,0 +1,176 @@
+# Headless simulation of HaverQuest
+#
+# `game.py` needs a display, loads every picture, and ticks the board
+# in step with the wall clock, ten times a second. To try an AI over
+# many games, this module plays levels with none of that: no window,
+# no images, a fixed step of one clock tick at a time run as fast as
+# the CPU allows, and a seeded random number generator for the
+# ferrets and the AI, so that a game can be played again exactly.
+#
+# Usage: python simulate.py [games] [level] [seed]
+
+import sys, os, json, time, random
+from contextlib import redirect_stdout
+
+import players
+from players import Exit, InvalidMoveException
+from ai import MyAISquirrel, InvalidRequestException
+from map import Map
+from gameboard import GameBoard
+
+# Build the board for level number `n` of `cfg`, with its squirrel (of
+# class `squirrelClass`), exit, characters and map, returning (board,
+# squirrel, exit tile). The start and end coordinates come from the
+# level unless given.
+def buildLevel(cfg, tileFactory, n, startX=None, startY=None, endX=None,
+               endY=None, squirrelClass=MyAISquirrel):
+    level  = cfg["levels"][n - 1]
+    width  = level["width"]
+    height = level["height"]
+    board  = GameBoard(cfg, width, height)
+    startX = startX or level["startX"]
+    startY = startY or level["startY"]
+    endX   = endX or level["endX"]
+    endY   = endY or level["endY"]
+
+    # The main character, and the exit (a picture of a nut): once the
+    # character reaches it, they win the game
+    squirrel = squirrelClass((startX,startY), board)
+    endTile  = Exit((endX,endY), board)
+    board.endTile = endTile
+    board.addTile(squirrel)
+    board.addTile(endTile)
+
+    # The enemies / healthpacks / etc...
+    if 'characters' in level:
+        board.setupCharacters(level["characters"])
+
+    levelMap = Map(tileFactory, level["file"], width, height)
+    levelMap.loadMap()
+    levelMap.loadToBoard(board)
+    return (board, squirrel, endTile)
+
+# One headless game of level `level`, ticked `fps` times per game
+# second (as in `Game.gameLoop`) for at most `maxTicks` ticks. With a
+# `seed`, the game plays out the same way every time: the ferrets,
+# and MyAISquirrel, draw their random numbers from the board's
+# generator (`board.rng`), seeded with `seed`, rather than from the
+# `random` module, which is left alone. An AI that calls the `random`
+# module itself plays differently each time.
+#
+# Whatever the AI prints is thrown away unless `quiet` is False. An AI
+# that makes an illegal move ends its game, which then counts as lost,
+# with the exception kept in `error`.
+class Simulation:
+    def __init__(self, cfg, tileFactory, level=1, seed=None, fps=10,
+                 maxTicks=10000, squirrelClass=MyAISquirrel, quiet=True):
+        self.fps      = fps
+        self.maxTicks = maxTicks
+        self.quiet    = quiet
+        # Nothing is drawn, so tiles needn't load their pictures
+        loadImages = players.loadImages
+        players.loadImages = False
+        try:
+            self.board, self.squirrel, self.endTile = buildLevel(
+                cfg, tileFactory, level, squirrelClass=squirrelClass)
+        finally:
+            players.loadImages = loadImages
+        self.board.rng = random.Random(seed)
+        self.seed      = seed
+
+        # Filled in by `run`
+        self.ticks   = 0
+        self.seconds = 0
+        self.error   = None
+
+    # Play until the game is over or `maxTicks` ticks have passed,
+    # returning self
+    def run(self):
+        board = self.board
+        state = board.state
+        fps   = self.fps
+        out   = open(os.devnull, "w") if self.quiet else sys.stdout
+        start = time.perf_counter()
+        try:
+            with redirect_stdout(out):
+                while (not state.gameOver() and self.ticks < self.maxTicks):
+                    self.ticks += 1
+                    board.clockTick(fps, 1)
+        except (InvalidRequestException, InvalidMoveException) as e:
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - start
+            if (self.quiet):
+                out.close()
+        return self
+
+    def won(self):  return self.board.state.hasWon()
+    def fuel(self): return self.board.state.getFuel()
+
+    # The outcome of the game as a dictionary of plain values (so it
+    # can be sent between processes or written out as JSON)
+    def summary(self):
+        state = self.board.state
+        return {
+            "won":         state.hasWon(),
+            "over":        state.gameOver(),
+            "fuel":        state.getFuel(),
+            "ticks":       self.ticks,
+            "stonesFired": state.stonesFired,
+            "ferretHits":  state.ferretHits,
+            "stoneHits":   state.stoneHits,
+            "error":       None if self.error is None else repr(self.error),
+            "seconds":     self.seconds,
+        }
+
+    # The number of clock ticks simulated per second of CPU time
+    def ticksPerSecond(self):
+        if (self.seconds == 0):
+            return 0
+        return self.ticks / self.seconds
+
+# Play `games` games of level `level`, game i seeded with seed + i,
+# printing a line per game and a summary. Returns the Simulations.
+def runGames(cfg, games, level=1, seed=0, **options):
+    from players import TileFactory
+    players.loadImages = False
+    tileFactory = TileFactory(cfg)
+    results = []
+    start = time.perf_counter()
+    for i in range(games):
+        sim = Simulation(cfg, tileFactory, level, seed + i, **options).run()
+        results.append(sim)
+        outcome = "won" if sim.won() else "lost"
+        if (sim.error is not None):
+            outcome = "illegal move"
+        elif (not sim.board.state.gameOver()):
+            outcome = "unfinished"
+        print("game {:>5} (seed {}): {:<12} after {:>6} ticks, fuel {:>5}".format(
+            i + 1, seed + i, outcome, sim.ticks, sim.fuel()))
+    seconds = time.perf_counter() - start
+    ticks = sum(sim.ticks for sim in results)
+    wins  = sum(1 for sim in results if sim.won())
+    print("{} games, {} won, {:.1f} ticks per game on average".format(
+        games, wins, ticks / max(games, 1)))
+    print("{} ticks in {:.2f} s: {:.0f} ticks/s".format(
+        ticks, seconds, ticks / seconds if seconds > 0 else 0))
+    return results
+
+if __name__ == "__main__":
+    try:
+        cfg = json.loads(open(os.path.join("./config.json")).read())
+    except Exception as e:
+        print("Could not load configuration file, possible JSON error")
+        print(e)
+        exit(1)
+    try:
+        games = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+        level = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        seed  = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    except ValueError:
+        print("Usage: python simulate.py [games] [level] [seed]")
+        exit(1)
+    if (not 1 <= level <= len(cfg["levels"])):
+        print("There is no level {}".format(level))
+        exit(1)
+    runGames(cfg, games, level, seed)
@@ -0,0 +1,341 @@
+# Planning around moving stones and ferrets for HaverQuest
+#
+# Stones and ferrets move deterministically: each one has a speed
+# vector and the tick accumulator from `Player.clockTick`. Given where
+# they are now, we can work out where they will be for the next few
+# ticks, and then search for a path through space *and* time that is
+# never in the same place as one of them.
+
+from heapq import heappush, heappop
+
+from pathfinder import AStarPathFinder, CostModel, FuelCostModel, distanceFieldFor
+
+INF = float("inf")
+
+# A cost model that adds `timeCost` to every move of `base`, giving
+# the cost of one tick's move in the space-time search. Two of them
+# with the same base and time cost are equal, so they share one
+# distance field (see `distanceFieldFor`).
+class TimedCostModel(CostModel):
+    def __init__(self, base, timeCost):
+        self.base     = base
+        self.timeCost = timeCost
+
+    def moveCost(self, dx, dy):
+        return self.base.moveCost(dx, dy) + self.timeCost
+
+    def cellCosts(self, board):
+        return self.base.cellCosts(board)
+
+    def heuristic(self, dx, dy, connectivity):
+        steps = max(dx, dy) if connectivity == 8 else dx + dy
+        return self.base.heuristic(dx, dy, connectivity) + self.timeCost * steps
+
+    def __eq__(self, other):
+        return (isinstance(other, TimedCostModel) and self.base is other.base
+                and self.timeCost == other.timeCost)
+
+    def __hash__(self):
+        return hash((id(self.base), self.timeCost))
+
+# The cost model planners use when not given one
+fuelCosts = FuelCostModel()
+
+# The predicted course of one stone or ferret. `step` advances it by
+# one call of its `clockTick`, repeating the arithmetic of
+# `Player.clockTick` (and, for ferrets, the turns of
+# `SquareAIFerret.move`).
+#
+# A stone that can't move is taken off the board and stops listening
+# for clock ticks, as in `Stone.clockTick`; `step` returns True when
+# that happens. Stones are registered for clock ticks twice (once by
+# `Player.__init__` and again by `fireStone`), so a stone taken off
+# the board still gets another tick, and will come back onto the board
+# if that one moves it.
+class MoverForecast:
+    def __init__(self, tile, board):
+        self.x        = tile.getX()
+        self.y        = tile.getY()
+        self.speed    = tile.speed
+        self.ticks    = list(tile.ticks)
+        self.tileType = tile.tileType
+        self.numTicks = getattr(tile, "numTicks", 0)
+        self.hp       = tile.hp
+        self.width    = board.width
+        self.height   = board.height
+        self.blocked  = board.blockedMask(tile.getPriority())
+        self.onBoard  = tile in board.entities.get((self.x, self.y), ())
+
+    def sign(self, num):
+        if num >= 0: return 1
+        else:        return -1
+
+    def canMoveTo(self, x, y):
+        return (0 <= x < self.width and 0 <= y < self.height
+                and not self.blocked[x * self.height + y])
+
+    def step(self, fps, num):
+        self.ticks[0] += self.speed[0]/fps*num
+        self.ticks[1] += self.speed[1]/fps*num
+        move = [0,0]
+        if (abs(self.ticks[0]) > 1):
+            self.ticks[0] -= 1 * self.sign(self.speed[0])
+            move[0]       =  self.sign(self.speed[0])
+        if (abs(self.ticks[1]) > 1):
+            self.ticks[1] -= 1 * self.sign(self.speed[1])
+            move[1]       =  self.sign(self.speed[1])
+        canMove = self.canMoveTo(self.x + move[0], self.y + move[1])
+        if ((move[0] != 0 or move[1] != 0) and canMove):
+            if (self.tileType == "ferret"):
+                self.turn()
+            self.x += move[0]
+            self.y += move[1]
+            self.onBoard = True
+        if (self.tileType == "stone" and not canMove):
+            self.onBoard = False
+            return True
+        return False
+
+    # The ferret's change of direction every 5 moves
+    def turn(self):
+        if (self.numTicks % 5 == 0):
+            if (self.speed == (5,0)):
+                self.speed = (0,-5)
+            elif (self.speed == (0,-5)):
+                self.speed = (-5,0)
+            elif (self.speed == (-5,0)):
+                self.speed = (0,5)
+            elif (self.speed == (0,5)):
+                self.speed = (5,0)
+            self.numTicks = 0
+        self.numTicks += 1
+
+# A table of the cells that stones and ferrets are predicted to occupy
+# at the end of each of the next `horizon` ticks (tick 0 is now),
+# worked out tick by tick as far as it is needed.
+#
+# Each tick is played out over a copy of the board's clock tick
+# listeners, in the same order as `GameBoard.clockTick`, and including
+# its quirks: a tile registered twice moves twice, and when a stone
+# unregisters itself partway through a tick the listener after it
+# misses that tick. Other listeners (the squirrel, health packs) are
+# assumed to stay put. Stones that ferrets fire in the future go in
+# random directions and are not predicted, so plans should be
+# refreshed as the game goes on.
+#
+# A stone that moves onto a ferret takes 15 HP off it, and a ferret
+# with no HP left is taken off the board, as in
+# `SquareAIFerret.handleCollisionWith`.
+class Forecast:
+    def __init__(self, board, horizon, fps=10, num=1, tileTypes=("stone", "ferret")):
+        self.horizon = horizon
+        height = board.height
+        movers = {}
+        order  = []
+        for listener in board.clockTickListeners:
+            mover = None
+            if (getattr(listener, "tileType", None) in tileTypes
+                and listener.getX() is not None):
+                mover = movers.get(listener)
+                if (mover is None):
+                    mover = movers[listener] = MoverForecast(listener, board)
+            order.append(mover)
+        self.movers = list(movers.values())
+        self.order  = order
+        # The ferrets on the board, by cell number
+        self.ferrets = {}
+        for mover in self.movers:
+            if (mover.tileType == "ferret" and mover.onBoard):
+                self.ferrets.setdefault(mover.x * height + mover.y, []).append(mover)
+        self.fps    = fps
+        self.num    = num
+        self.height = height
+        # occupied[t] is the set of cell numbers occupied at tick t,
+        # worked out only as far as someone has asked
+        self.occupied = []
+        self.record()
+
+    # Note down where the movers are now
+    def record(self):
+        occupied = set()
+        height = self.height
+        for mover in self.movers:
+            if (mover.onBoard):
+                occupied.add(mover.x * height + mover.y)
+        self.occupied.append(occupied)
+
+    # Work out the occupied cells up to tick `t` (or the horizon)
+    def extendTo(self, t):
+        order = self.order
+        while (len(self.occupied) <= min(t, self.horizon)):
+            i = 0
+            while (i < len(order)):
+                mover = order[i]
+                i += 1
+                if (mover is None):
+                    continue
+                before = mover.x * self.height + mover.y
+                if (mover.step(self.fps, self.num)):
+                    order.remove(mover)
+                    continue
+                after = mover.x * self.height + mover.y
+                if (after != before):
+                    self.moved(mover, before, after)
+            self.record()
+
+    # Keep track of the ferrets, and of stones hitting them, after
+    # `mover` moves from cell `before` to cell `after`
+    def moved(self, mover, before, after):
+        if (mover.tileType == "ferret"):
+            ferrets = self.ferrets.get(before, ())
+            if (mover in ferrets):
+                ferrets.remove(mover)
+            self.ferrets.setdefault(after, []).append(mover)
+            return
+        for ferret in list(self.ferrets.get(after, ())):
+            ferret.hp -= 15
+            if (ferret.hp <= 0):
+                ferret.onBoard = False
+                self.ferrets[after].remove(ferret)
+                self.order.remove(ferret)
+
+    # Whether cell number `cell` is predicted to be occupied at tick
+    # `t`. Nothing is known past the horizon.
+    def isOccupied(self, cell, t):
+        if (t > self.horizon):
+            return False
+        self.extendTo(t)
+        return cell in self.occupied[t]
+
+# A planner that searches over (x, y, tick) states for a path to a goal
+# that stays clear of predicted stones and ferrets, moving one tile (or
+# waiting in place) per tick.
+#
+# A move into a cell at tick t is ruled out if a stone or ferret is
+# predicted there at tick t or t + 1. Each step costs its fuel (from
+# the cost model, FuelCostModel by default) plus `timeCost`, so waiting
+# is cheap but not free.
+#
+# The search looks `horizon` ticks ahead. Its heuristic is the board's
+# shared distance field to the goal under the same costs (see
+# `distanceFieldFor`), which is the exact cost when nothing is moving,
+# so the search heads almost straight for the goal, and a state at the
+# horizon can be judged by its distance to go. If the goal can't be
+# reached within the horizon the path returned ends at the most
+# promising state on the horizon, and `reachesGoal` is False.
+class SpaceTimePlanner:
+    def __init__(self, board, player, horizon=40, connectivity=8,
+                 costModel=None, timeCost=0.5, fps=10, num=1):
+        if (connectivity != 4 and connectivity != 8):
+            raise ValueError("connectivity must be 4 or 8")
+        self.board        = board
+        self.player       = player
+        self.horizon      = horizon
+        self.connectivity = connectivity
+        self.costModel    = costModel or fuelCosts
+        self.timeCost     = timeCost
+        self.fps          = fps
+        self.num          = num
+
+        # Filled in by `findPath`
+        self.forecast    = None
+        self.reachesGoal = False
+        self.pathCost    = None
+        self.expanded    = 0
+
+    # Plan from the player's position to `toCoordinate`, returning the
+    # moves in the form of `PathFinder.findPath`, with (0, 0) for a
+    # tick spent waiting. Returns False if there is no way forward.
+    def findPath(self, toCoordinate):
+        board  = self.board
+        width  = board.width
+        height = board.height
+        tx, ty = toCoordinate
+        sx, sy = self.player.getX(), self.player.getY()
+        self.reachesGoal = False
+        self.pathCost    = None
+        self.expanded    = 0
+        if (not (0 <= tx < width and 0 <= ty < height) or (sx, sy) == (tx, ty)):
+            return False
+
+        priority  = self.player.getPriority()
+        blocked   = board.blockedMask(priority)
+        field     = distanceFieldFor(board, toCoordinate, priority, self.connectivity,
+                                     TimedCostModel(self.costModel, self.timeCost))
+        distance  = field.distance
+        cellCosts = self.costModel.cellCosts(board)
+        forecast  = Forecast(board, self.horizon, self.fps, self.num)
+        occupied  = forecast.occupied
+        self.forecast = forecast
+        horizon  = self.horizon
+        timeCost = self.timeCost
+        goal  = tx * height + ty
+        start = sx * height + sy
+
+        moves = [(0, 0, 0, 0)]
+        for (dx, dy) in AStarPathFinder.straightMoves + AStarPathFinder.diagonalMoves:
+            if (dx != 0 and dy != 0 and self.connectivity == 4):
+                continue
+            moves.append((dx, dy, dx * height + dy, self.costModel.moveCost(dx, dy)))
+
+        if (distance[start] == INF):
+            return False
+        # States are numbered t * size + cell
+        size   = width * height
+        best   = {start: 0}
+        parent = {}
+        heap   = [(distance[start], 0, start)]
+        expanded = 0
+        found = None
+        while (len(heap) > 0):
+            f, g, state = heappop(heap)
+            g = -g
+            if (g > best[state]):
+                continue
+            t, c = divmod(state, size)
+            if (c == goal or t == horizon):
+                found = state
+                break
+            expanded += 1
+            x, y = divmod(c, height)
+            if (t + 1 >= len(occupied)):
+                forecast.extendTo(t + 1)
+            now  = occupied[t]
+            then = occupied[t + 1]
+            for (dx, dy, offset, cost) in moves:
+                nx = x + dx
+                ny = y + dy
+                if (nx < 0 or nx >= width or ny < 0 or ny >= height):
+                    continue
+                n = c + offset
+                if (blocked[n] or distance[n] == INF or n in then
+                    or (offset != 0 and n in now)):
+                    continue
+                ng = g + cost + timeCost
+                if (cellCosts is not None and offset != 0):
+                    ng += cellCosts[n]
+                nstate = state + size + offset
+                if (ng < best.get(nstate, INF)):
+                    best[nstate]   = ng
+                    parent[nstate] = state
+                    heappush(heap, (ng + distance[n], -ng, nstate))
+        self.expanded = expanded
+        if (found is None):
+            return False
+
+        t, c = divmod(found, size)
+        self.reachesGoal = c == goal
+        self.pathCost    = best[found]
+        cells = []
+        state = found
+        while (state != start):
+            cells.append(state % size)
+            state = parent[state]
+        cells.append(start)
+        cells.reverse()
+        path = [(sx, sy)]
+        for i in range(1, len(cells)):
+            ax, ay = divmod(cells[i - 1], height)
+            bx, by = divmod(cells[i], height)
+            path.append((bx - ax, by - ay))
+        return path
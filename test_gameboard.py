@@ -0,0 +1,69 @@
+# Checks that drawing only the dirty cells gives the same picture as
+# drawing everything
+
+import os, json
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pytest
+import pygame
+
+import players
+from players import TileFactory, SquareAIFerret
+from ai import AISquirrel
+from gameboard import GameBoard
+from benchmark import fullRender
+from conftest import here
+
+# The config, with pictures loaded (and converted for a display)
+@pytest.fixture
+def pictures(monkeypatch):
+    monkeypatch.setattr(players, "loadImages", True)
+    pygame.init()
+    pygame.display.set_mode((160, 160))
+    with open(os.path.join(here, "config.json")) as f:
+        yield json.load(f)
+    pygame.display.quit()
+
+# A 5x5 grass board with a squirrel and a ferret sharing (2,2)
+def makeBoard(cfg):
+    board = GameBoard(cfg, 5, 5)
+    grass = TileFactory(cfg).fromChar('G')
+    for x in range(5):
+        for y in range(5):
+            board.addTileAt(grass, x, y)
+    squirrel = AISquirrel((2, 2), board)
+    ferret   = SquareAIFerret((2, 2), board)
+    board.addTile(squirrel)
+    board.addTile(ferret)
+    return board, squirrel, ferret
+
+# Whether the dirty drawing on `screen` matches a full redraw
+def matchesFullRender(board, screen):
+    full = pygame.Surface(screen.get_size())
+    fullRender(board, full)
+    return (pygame.image.tostring(screen, "RGB")
+            == pygame.image.tostring(full, "RGB"))
+
+def test_dirty_render_matches_full_render(pictures):
+    board, squirrel, ferret = makeBoard(pictures)
+    screen = pygame.Surface((160, 160))
+    board.renderScreen(screen)
+    assert matchesFullRender(board, screen)
+    for (x, y) in [(3, 2), (3, 3), (2, 3), (2, 2)]:
+        squirrel.setPosition(x, y)
+        board.renderScreen(screen)
+        assert matchesFullRender(board, screen)
+
+# Moving to the same cell takes a tile out of the cell and puts it back
+# in, which changes which of the cell's tiles is drawn on top
+def test_same_cell_move_is_drawn(pictures):
+    board, squirrel, ferret = makeBoard(pictures)
+    screen = pygame.Surface((160, 160))
+    board.renderScreen(screen)
+    for tile in [squirrel, ferret, squirrel]:
+        before = pygame.image.tostring(screen, "RGB")
+        tile.setPosition(2, 2)
+        board.renderScreen(screen)
+        assert pygame.image.tostring(screen, "RGB") != before
+        assert matchesFullRender(board, screen)
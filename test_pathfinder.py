@@ -0,0 +1,189 @@
+# Checks that the path finders' fuel costs are what the game charges
+
+import random
+
+import pytest
+
+import players
+from players import TileFactory, moveFuel
+from ai import AISquirrel
+from gameboard import GameBoard
+from pathfinder import AStarPathFinder, CostModel, FuelCostModel
+
+# A `size` x `size` board with a brick in about one cell in `walls`,
+# and an AI squirrel at (0, 0) with plenty of fuel
+def makeBoard(cfg, size, seed, walls=4):
+    rng   = random.Random(seed)
+    brick = TileFactory(cfg).fromChar('B')
+    board = GameBoard(cfg, size, size)
+    for x in range(size):
+        for y in range(size):
+            if ((x, y) != (0, 0) and rng.randrange(walls) == 0):
+                board.addTileAt(brick, x, y)
+    squirrel = AISquirrel((0, 0), board)
+    board.addTile(squirrel)
+    board.state.hp = 10000
+    return board, squirrel
+
+# Walk `path` (in the form of `findPath`) with the squirrel, returning
+# the fuel it used
+def walk(board, squirrel, path):
+    before = board.state.getFuel()
+    for (dx, dy) in path[1:]:
+        squirrel.move(dx, dy)
+    return before - board.state.getFuel()
+
+def test_move_cost_matches_aisquirrel(cfg, capsys):
+    model = FuelCostModel()
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            board, squirrel = makeBoard(cfg, 3, 0, walls=10 ** 9)
+            squirrel.setPosition(1, 1)
+            assert walk(board, squirrel, [(1, 1), (dx, dy)]) == model.moveCost(dx, dy)
+            assert model.moveCost(dx, dy) == moveFuel(dx, dy)
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_path_cost_is_fuel_used(cfg, capsys, connectivity):
+    walked = 0
+    for seed in range(10):
+        board, squirrel = makeBoard(cfg, 15, seed)
+        finder = AStarPathFinder(board, squirrel, connectivity)
+        path = finder.findPath((14, 14))
+        if (path == False):
+            continue
+        assert walk(board, squirrel, path) == finder.pathCost
+        walked += 1
+    assert walked > 0
+
+# A* with no heuristic is Dijkstra's search, so it finds the cheapest
+# path; with the heuristic it must find one just as cheap
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_heuristic_never_overestimates(cfg, connectivity):
+    class NoHeuristic(FuelCostModel):
+        def heuristic(self, dx, dy, connectivity):
+            return 0
+    model = FuelCostModel()
+    for seed in range(10):
+        board, squirrel = makeBoard(cfg, 15, seed)
+        for goal in [(14, 14), (7, 13), (13, 2)]:
+            exact = AStarPathFinder(board, squirrel, connectivity, NoHeuristic())
+            if (exact.findPath(goal) == False):
+                continue
+            finder = AStarPathFinder(board, squirrel, connectivity, model)
+            finder.findPath(goal)
+            assert finder.pathCost == exact.pathCost
+            assert model.heuristic(goal[0], goal[1], connectivity) <= exact.pathCost
+
+def test_diagonal_is_cheaper_than_two_straight_moves():
+    model = FuelCostModel()
+    assert model.moveCost(1, 1) < model.moveCost(1, 0) + model.moveCost(0, 1)
+    # On an open board the heuristic is the exact cost
+    assert model.heuristic(5, 2, 8) == 2 * model.moveCost(1, 1) + 3 * model.moveCost(1, 0)
+    assert model.heuristic(5, 2, 4) == 7 * model.moveCost(1, 0)
+    assert CostModel().heuristic(5, 2, 8) == 5
+
+def test_risk_cost_model_charges_fuel_too(cfg, capsys):
+    from riskmap import RiskPathFinder
+    walked = 0
+    for seed in range(5):
+        board, squirrel = makeBoard(cfg, 15, seed)
+        finder = RiskPathFinder(board, squirrel)
+        path = finder.findPath((14, 14))
+        if (path == False):
+            continue
+        # With no ferrets there is no risk, only fuel
+        assert walk(board, squirrel, path) == finder.pathCost
+        walked += 1
+    assert walked > 0
+
+def test_distance_fields_are_bounded(cfg):
+    import pathfinder
+    from pathfinder import distanceFieldFor, distanceFields
+    board, squirrel = makeBoard(cfg, 15, 0, walls=10 ** 9)
+    first = distanceFieldFor(board, (0, 0), 2)
+    for x in range(1, 3 * pathfinder.fieldCapacity):
+        distanceFieldFor(board, (x % 15, x // 15), 2)
+        # Keep using the first goal, so it is never the least recent
+        assert distanceFieldFor(board, (0, 0), 2) is first
+    assert len(distanceFields[board]) == pathfinder.fieldCapacity
+
+# A tile of priority `priority` at (x,y) to find paths for, which isn't
+# on the board itself
+def standIn(x, y, priority):
+    tile = players.Tile("player")
+    tile.setPriority(priority)
+    tile.setPosition(x, y)
+    return tile
+
+def test_path_cache_keeps_priorities_apart(cfg):
+    from players import SquareAIFerret
+    from pathfinder import PathCache
+    board = GameBoard(cfg, 5, 1)
+    ferret = SquareAIFerret((2, 0), board)
+    board.addTile(ferret)
+    cache = PathCache(board)
+    # A ferret doesn't stop a player, but does stop an item
+    assert cache.findPath(standIn(0, 0, players.Priority.player), (4, 0)) != False
+    assert cache.findPath(standIn(0, 0, players.Priority.item), (4, 0)) == False
+    # Moving the ferret away changes no walls (the player's mask stays
+    # the same), but clears the way for the item
+    walls = board.blockedMask(players.Priority.player)
+    ferret.setPosition(4, 0)
+    assert board.blockedMask(players.Priority.player) is walls
+    assert cache.findPath(standIn(0, 0, players.Priority.item), (3, 0)) != False
+    assert cache.findPath(standIn(0, 0, players.Priority.item), (4, 0)) == False
+
+def test_path_cache_sees_wall_changes(cfg):
+    from pathfinder import PathCache
+    board, squirrel = makeBoard(cfg, 5, 0, walls=10 ** 9)
+    cache = PathCache(board)
+    player = standIn(0, 0, players.Priority.player)
+    assert len(cache.findPath(player, (4, 0))) == 5
+    assert cache.findPath(player, (4, 0)) and cache.hits == 1
+    brick = TileFactory(cfg).fromChar('B')
+    for y in range(5):
+        board.addTileAt(brick, 2, y)
+    assert cache.findPath(player, (4, 0)) == False
+    board.removeTileAt(brick, 2, 3)
+    # Round through the gap: 3 down, 4 across and 3 back up
+    assert len(cache.findPath(player, (4, 0))) == 11
+
+# One finder kept while walls go up must search the new walls, as a
+# fresh breadth-first PathFinder does
+def test_jump_point_finder_sees_wall_changes(cfg):
+    from pathfinder import PathFinder, JumpPointPathFinder
+    brick = TileFactory(cfg).fromChar('B')
+    for seed in range(5):
+        board, squirrel = makeBoard(cfg, 20, seed, walls=8)
+        finder = JumpPointPathFinder(board, squirrel)
+        rng = random.Random(seed)
+        for i in range(30):
+            x, y = rng.randrange(20), rng.randrange(20)
+            if ((x, y) != (0, 0)):
+                board.addTileAt(brick, x, y)
+            for goal in [(19, 19), (10, 19), (19, 3)]:
+                path = finder.findPath(goal)
+                expected = PathFinder(board, squirrel).findPath(goal)
+                assert (path == False) == (expected == False)
+                if (path != False):
+                    assert len(path) == len(expected)
+
+# A board that the strategy's caches have seen is still freed once the
+# game is done with it
+@pytest.mark.parametrize("strategy", ["field", "cached", "risk"])
+def test_cached_strategies_free_boards(cfg, strategy):
+    import gc, weakref
+    from players import SquareAIFerret
+    from pathfinder import makePathFinder
+    board, squirrel = makeBoard(cfg, 15, 0, walls=10 ** 9)
+    ferret = SquareAIFerret((5, 5), board)
+    board.addTile(ferret)
+    board.ferrets.append(ferret)
+    for goal in [(14, 14), (14, 0)]:
+        assert makePathFinder(board, squirrel, strategy).findPath(goal) != False
+    ferret.subtractHp(100)
+    assert makePathFinder(board, squirrel, strategy).findPath((0, 14)) != False
+    freed = weakref.ref(board)
+    del board, squirrel, ferret
+    gc.collect()
+    assert freed() is None
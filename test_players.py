@@ -0,0 +1,23 @@
+# Checks that the rule constants match what the tiles really do
+
+from players import SquareAIFerret, fireDirections, stoneSpeed
+from gameboard import GameBoard
+
+# Always picks `value`
+class Fixed:
+    def __init__(self, value):
+        self.value = value
+
+    def randint(self, a, b):
+        return self.value
+
+def test_fire_directions_match_fire_stone(cfg):
+    for i, (dx, dy) in enumerate(fireDirections):
+        board = GameBoard(cfg, 5, 5)
+        board.rng = Fixed(i)
+        ferret = SquareAIFerret((2, 2), board)
+        board.addTile(ferret)
+        ferret.fireStone()
+        stone = board.stones[0]
+        assert (stone.getX(), stone.getY()) == (2 + dx, 2 + dy)
+        assert tuple(stone.speed) == (dx * stoneSpeed[0], dy * stoneSpeed[1])
@@ -0,0 +1,44 @@
+# Checks that planned routes can be walked with the fuel the game
+# really charges
+
+import pytest
+
+from players import Health
+from test_pathfinder import makeBoard
+from routeplanner import RoutePlanner
+
+# Walk `route` with `squirrel`, a tick at a time: the squirrel's clock
+# ticks (regenerating fuel), then it makes the route's next move.
+# Returns the fuel left after each tick.
+def walk(board, squirrel, route):
+    fuel = []
+    for (dx, dy) in route.path[1:]:
+        squirrel.clockTick(10, 1)
+        if ((dx, dy) != (0, 0)):
+            squirrel.move(dx, dy)
+        fuel.append(board.state.getFuel())
+    return fuel
+
+@pytest.mark.parametrize("exactLimit", [10, 0])
+def test_route_fuel_matches_a_walk(cfg, capsys, exactLimit):
+    walked = 0
+    for seed in range(8):
+        board, squirrel = makeBoard(cfg, 12, seed, walls=6)
+        board.state.hp = 6
+        free = [(x, y) for x in range(12) for y in range(12)
+                if board.topPriority[x * 12 + y] > 2]
+        packs = free[seed::len(free) // 4][:4]
+        for (x, y) in packs:
+            board.addTile(Health((x, y), board))
+        planner = RoutePlanner(board, squirrel, (11, 11), packs, fuel=6,
+                               exactLimit=exactLimit)
+        route = planner.plan()
+        if (route is None):
+            continue
+        fuel = walk(board, squirrel, route)
+        assert (squirrel.getX(), squirrel.getY()) == (11, 11)
+        assert min(fuel) > 0
+        assert fuel[-1] == route.fuelLeft
+        assert route.arrival == len(route.path) - 1
+        walked += 1
+    assert walked > 0
@@ -0,0 +1,118 @@
+# Checks that headless games repeat exactly, leave the rest of the
+# program alone, and play the same batched as on a GameBoard
+
+import random
+
+import players
+from players import TileFactory
+from simulate import Simulation
+
+def play(cfg, seed):
+    return Simulation(cfg, TileFactory(cfg), seed=seed, maxTicks=300).run()
+
+def test_games_repeat_and_leave_random_alone(cfg):
+    random.seed(1)
+    expected = [random.random() for i in range(3)]
+    random.seed(1)
+    first = play(cfg, 5).summary()
+    assert [random.random() for i in range(3)] == expected
+    # Whatever state the random module is in, the game is the same
+    second = play(cfg, 5).summary()
+    for result in (first, second):
+        del result["seconds"]
+    assert first == second
+
+def test_images_flag_is_left_alone(cfg, monkeypatch):
+    monkeypatch.setattr(players, "loadImages", True)
+    Simulation(cfg, TileFactory(cfg), seed=0, maxTicks=1)
+    assert players.loadImages
+
+# Batched games step for step against GameBoard games driven by the
+# same actions, with the same aim for the ferrets' stones
+def test_batched_games_match_gameboards(cfg):
+    import numpy as np
+    from players import Stone, fireDirections
+    from ai import AISquirrel, InvalidRequestException
+    from simulate import buildLevel
+    from batchsim import BatchedSimulation, Action
+
+    # Takes the actions in `plan` each tick
+    class Driven(AISquirrel):
+        def clockTick(self, fps, num):
+            super().clockTick(fps, num)
+            for action in self.plan:
+                if (1 <= action <= 8):
+                    self.move(*fireDirections[action - 1])
+                elif (9 <= action <= 16):
+                    self.fireStone(*fireDirections[action - 9])
+                elif (action == Action.getFerrets):
+                    self.getFerrets()
+                elif (action == Action.getHealthPacks):
+                    self.getHealthPacks()
+                elif (action == Action.getExit):
+                    self.getExit()
+
+    count = 12
+    cfg["initialfuel"] = 3000
+    tileFactory = TileFactory(cfg)
+    boards = []
+    for n in range(count):
+        board, squirrel, endTile = buildLevel(cfg, tileFactory, 1, squirrelClass=Driven)
+        board.rng = random.Random(n)
+        boards.append(board)
+    aims = [random.Random(n) for n in range(count)]
+
+    # Aims each game's stones as its board does
+    class Batched(BatchedSimulation):
+        def aim(self, g):
+            return np.array([aims[n].randint(0, 7) for n in g], dtype=int)
+
+    sim = Batched(cfg, tileFactory, count)
+    obs = sim.reset()
+    policy = np.random.default_rng(0)
+    playing = [True] * count
+    compared = 0
+    for t in range(400):
+        actions = np.zeros((count, 2), dtype=int)
+        for n in range(count):
+            for k in range(2):
+                r = policy.random()
+                ok = np.nonzero(obs["canMove"][n])[0]
+                if (r < 0.002):
+                    actions[n, k] = policy.integers(0, Action.count)
+                elif (r < 0.5 and len(ok) > 0):
+                    actions[n, k] = (1 if policy.random() < 0.8 else 9) + policy.choice(ok)
+                elif (r < 0.55):
+                    actions[n, k] = policy.integers(Action.getFerrets, Action.count)
+        obs, reward, done = sim.step(actions)
+        for n, board in enumerate(boards):
+            if (not playing[n]):
+                continue
+            squirrel = board.clockTickListeners[0]
+            squirrel.plan = list(actions[n])
+            error = False
+            try:
+                board.clockTick(10, 1)
+            except InvalidRequestException:
+                error = True
+            state = board.state
+            playing[n] = not (error or state.gameOver())
+            assert ((squirrel.getX(), squirrel.getY(), state.getFuel(), state.over,
+                     state.hasWon(), error, state.stonesFired, state.ferretHits,
+                     state.stoneHits)
+                    == (sim.x[n], sim.y[n], sim.fuel[n], sim.over[n], sim.won[n],
+                        sim.error[n], sim.stonesFired[n], sim.ferretHits[n],
+                        sim.stoneHits[n]))
+            assert ([(f.getX(), f.getY(), f.hp) if f.hp > 0 else None for f in board.ferrets]
+                    == [(sim.ferretX[n, i], sim.ferretY[n, i], sim.ferretHp[n, i])
+                        if sim.ferretAlive[n, i] else None for i in range(len(board.ferrets))])
+            assert ([(s.getX(), s.getY(), s.ticks[0], s.ticks[1])
+                     for s in board.clockTickListeners if isinstance(s, Stone)]
+                    == [(sim.stoneX[n, q], sim.stoneY[n, q], sim.stoneTicksX[n, q],
+                         sim.stoneTicksY[n, q]) for q in sim.queue[n, :sim.queueLength[n]]])
+            assert ([(s.getX(), s.getY()) for s in board.stones]
+                    == [tuple(p) for p in obs["stones"][n] if p[0] >= 0])
+            compared += 1
+        if (not any(playing)):
+            break
+    assert compared > 1000
@@ -0,0 +1,211 @@
+# Tournaments between HaverQuest AIs
+#
+# Plays every AI variant against every level in config.json, once for
+# each of a range of seeds for the ferrets' aim, as headless games
+# (see simulate.py) spread over a pool of worker processes. Each result
+# is written to a results file as soon as its game is over, one JSON
+# object per line, and a run that is stopped part way can be started
+# again with the same file: the games already in it aren't played
+# again. At the end the results are added up into a report per AI and
+# level.
+#
+# Usage: python tournament.py [-s SEEDS] [-w WORKERS] [-l LEVELS]
+#                             [-o FILE] [variant ...]
+#
+# where each variant names a squirrel class as module:Class, e.g.
+# ai:MyAISquirrel (the default).
+
+import sys, os, json, time, signal, argparse, importlib
+from multiprocessing import Pool
+
+from simulate import Simulation
+
+# What each worker process sets up once, in `startWorker`, and uses
+# for every game it plays
+worker = {}
+
+# The class named by `variant` (module:Class)
+def loadVariant(variant):
+    if (variant.count(":") != 1):
+        raise ValueError("AI variants are given as module:Class, not {}".format(variant))
+    module, name = variant.split(":")
+    return getattr(importlib.import_module(module), name)
+
+def startWorker(cfg, maxTicks):
+    import players
+    from players import TileFactory
+    players.loadImages = False
+    worker["cfg"]         = cfg
+    worker["tileFactory"] = TileFactory(cfg)
+    worker["maxTicks"]    = maxTicks
+    worker["variants"]    = {}
+
+# `startWorker` for a process of the pool. Ctrl-C reaches every
+# process, but only the main one should handle it (by stopping the
+# pool), so the workers ignore it.
+def startPoolWorker(cfg, maxTicks):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    startWorker(cfg, maxTicks)
+
+# Play the game `job`, a (variant, level, seed) triple, returning its
+# summary (see `Simulation.summary`) along with the job. An AI that
+# crashes loses its game, with the error recorded, rather than
+# stopping the tournament.
+def playGame(job):
+    variant, level, seed = job
+    result = {"variant": variant, "level": level, "seed": seed}
+    try:
+        cls = worker["variants"].get(variant)
+        if (cls is None):
+            cls = worker["variants"][variant] = loadVariant(variant)
+        sim = Simulation(worker["cfg"], worker["tileFactory"], level, seed,
+                         maxTicks=worker["maxTicks"], squirrelClass=cls)
+        result.update(sim.run().summary())
+    except Exception as e:
+        result.update(won=False, over=True, error=repr(e))
+    return result
+
+# The results already in the file at `path`. A line cut short when a
+# run was stopped is skipped (its game is played again).
+def loadResults(path):
+    results = []
+    if (not os.path.exists(path)):
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                pass
+    return results
+
+# Play the games of `jobs` that aren't in `results` yet, appending each
+# result to `results` and to the file at `path` as it comes in
+def playAll(cfg, jobs, results, path, workers, maxTicks):
+    done = set((r["variant"], r["level"], r["seed"]) for r in results)
+    todo = [job for job in jobs if job not in done]
+    print("{} games, {} already played, {} to play on {} worker{}".format(
+        len(jobs), len(jobs) - len(todo), len(todo), workers,
+        "" if workers == 1 else "s"))
+    if (len(todo) == 0):
+        return
+    out = open(path, "a")
+    # Start on a fresh line if the last run was stopped mid-line
+    if (out.tell() > 0):
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            if (f.read(1) != b"\n"):
+                out.write("\n")
+    pool = None
+    if (workers > 1):
+        pool = Pool(workers, startPoolWorker, (cfg, maxTicks))
+        # Games are short, so hand them out a few at a time to keep
+        # the cost of passing them between processes down
+        chunk = max(1, min(32, len(todo) // (workers * 8)))
+        stream = pool.imap_unordered(playGame, todo, chunk)
+    else:
+        startWorker(cfg, maxTicks)
+        stream = map(playGame, todo)
+    start = time.perf_counter()
+    last  = start
+    ticks = 0
+    try:
+        for i, result in enumerate(stream):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            results.append(result)
+            ticks += result.get("ticks", 0)
+            now = time.perf_counter()
+            if (now - last >= 5 or i + 1 == len(todo)):
+                last = now
+                print("  {:>7}/{} games, {:.1f} games/s, {:.0f} ticks/s".format(
+                    i + 1, len(todo), (i + 1) / (now - start), ticks / (now - start)))
+        if (pool is not None):
+            pool.close()
+    except KeyboardInterrupt:
+        print("Stopped; run again with the same results file to carry on")
+        if (pool is not None):
+            pool.terminate()
+        raise
+    finally:
+        out.close()
+        if (pool is not None):
+            pool.join()
+
+# Print the results added up per AI variant and level
+def report(results):
+    groups = {}
+    for r in results:
+        groups.setdefault((r["variant"], r["level"]), []).append(r)
+    print("{:<24} {:>5} {:>6} {:>6} {:>8} {:>9} {:>8} {:>8} {:>8} {:>6}".format(
+        "variant", "level", "games", "won %", "fuel", "ticks to", "stones", "ferret",
+        "stone", "errors"))
+    print("{:<24} {:>5} {:>6} {:>6} {:>8} {:>9} {:>8} {:>8} {:>8} {:>6}".format(
+        "", "", "", "", "left", "exit", "fired", "hits", "hits", ""))
+    def mean(values):
+        values = [v for v in values if v is not None]
+        if (len(values) == 0):
+            return "-"
+        return "{:.1f}".format(sum(values) / len(values))
+    for (variant, level), games in sorted(groups.items()):
+        wins = [r for r in games if r["won"]]
+        print("{:<24} {:>5} {:>6} {:>6.1f} {:>8} {:>9} {:>8} {:>8} {:>8} {:>6}".format(
+            variant, level, len(games), 100 * len(wins) / len(games),
+            mean(r.get("fuel") for r in games),
+            mean(r["ticks"] for r in wins),
+            mean(r.get("stonesFired") for r in games),
+            mean(r.get("ferretHits") for r in games),
+            mean(r.get("stoneHits") for r in games),
+            sum(1 for r in games if r.get("error") is not None)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Play HaverQuest AIs against every level")
+    parser.add_argument("variants", nargs="*", default=["ai:MyAISquirrel"],
+                        help="squirrel classes to play, as module:Class")
+    parser.add_argument("-s", "--seeds", type=int, default=100,
+                        help="number of ferret seeds per AI and level")
+    parser.add_argument("-l", "--levels", default=None,
+                        help="comma-separated level numbers (default: all)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    parser.add_argument("-t", "--max-ticks", type=int, default=10000,
+                        help="ticks after which an unfinished game is stopped")
+    parser.add_argument("-o", "--out", default="tournament.jsonl",
+                        help="results file, appended to and resumed from")
+    args = parser.parse_args()
+
+    try:
+        cfg = json.loads(open(os.path.join("./config.json")).read())
+    except Exception as e:
+        print("Could not load configuration file, possible JSON error")
+        print(e)
+        exit(1)
+    levels = list(range(1, len(cfg["levels"]) + 1))
+    if (args.levels is not None):
+        levels = [int(n) for n in args.levels.split(",")]
+        for n in levels:
+            if (not 1 <= n <= len(cfg["levels"])):
+                print("There is no level {}".format(n))
+                exit(1)
+    for variant in args.variants:
+        try:
+            loadVariant(variant)
+        except (ValueError, ImportError, AttributeError) as e:
+            print("Cannot load AI variant {}: {}".format(variant, e))
+            exit(1)
+
+    jobs = [(variant, level, seed) for variant in args.variants
+            for level in levels for seed in range(args.seeds)]
+    results = loadResults(args.out)
+    try:
+        playAll(cfg, jobs, results, args.out, max(1, args.workers), args.max_ticks)
+    except KeyboardInterrupt:
+        exit(1)
+    # The latest result for each game of this tournament
+    latest = {}
+    for r in results:
+        latest[(r["variant"], r["level"], r["seed"])] = r
+    report([latest[job] for job in jobs if job in latest])
+
+if __name__ == "__main__":
+    main()
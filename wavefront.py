@@ -0,0 +1,142 @@
+# Whole-map distance transforms for HaverQuest, using NumPy
+#
+# PathFinder and DistanceField visit one cell at a time in Python. For
+# questions about the whole map (how far is every cell from the exit?
+# can every open cell be reached? is a generated level solvable?) the
+# functions here do the same breadth-first search a whole wavefront at
+# a time: each step of the search moves every cell of the frontier one
+# cell in each direction at once, as NumPy array operations.
+
+import numpy as np
+
+from pathfinder import AStarPathFinder
+
+# A boolean array, indexed [x, y], that is True at each cell a tile of
+# priority `priority` can move to (see GameBoard.blockedMask)
+def walkable(board, priority):
+    mask = np.frombuffer(board.blockedMask(priority), dtype=np.uint8)
+    return mask.reshape(board.width, board.height) == 0
+
+# The moves at each connectivity, as in AStarPathFinder
+def movesFor(connectivity):
+    if (connectivity == 4):
+        return AStarPathFinder.straightMoves
+    if (connectivity == 8):
+        return AStarPathFinder.straightMoves + AStarPathFinder.diagonalMoves
+    raise ValueError("connectivity must be 4 or 8")
+
+# The number of moves from every cell to `goal` over the open cells of
+# `open` (a boolean array indexed [x, y]), as a flat int32 array laid
+# out like `open` with a border of one blocked cell all the way round,
+# so that index (x + 1) * (height + 2) + (y + 1) holds cell (x, y).
+# Cells that can't reach the goal, including blocked ones, hold -1.
+#
+# The frontier is kept as an array of cell indices. Because of the
+# border, moving to a neighbour is adding a fixed offset, so one step
+# of the search shifts the whole frontier by each move's offset, keeps
+# the cells that are open and not yet reached, and drops duplicates.
+# Every cell is handled once, so the work is proportional to the area
+# of the map rather than to its area times its longest path.
+def paddedDistances(open, goal, connectivity=4):
+    width, height = open.shape
+    stride = height + 2
+    padded = np.zeros((width + 2, height + 2), dtype=bool)
+    padded[1:-1, 1:-1] = open
+    free = padded.ravel()
+    distance = np.full(free.shape, -1, dtype=np.int32)
+    gx, gy = goal
+    if (not (0 <= gx < width and 0 <= gy < height) or not open[gx, gy]):
+        return distance
+    offsets = np.array([dx * stride + dy for (dx, dy) in movesFor(connectivity)])
+    start = (gx + 1) * stride + gy + 1
+    distance[start] = 0
+    free[start] = False
+    frontier = np.array([start])
+    # Scratch space for dropping duplicates from the frontier
+    mark = np.zeros(free.shape, dtype=np.int64)
+    d = 0
+    while (len(frontier) > 0):
+        d += 1
+        cells = (frontier[:, None] + offsets).ravel()
+        cells = cells[free[cells]]
+        free[cells] = False
+        # A cell reached from several frontier cells appears more than
+        # once. Of the positions written to `mark` for one cell, only
+        # one survives, so exactly one copy of each cell is kept.
+        order = np.arange(len(cells))
+        mark[cells] = order
+        cells = cells[mark[cells] == order]
+        distance[cells] = d
+        frontier = cells
+    return distance
+
+# The number of moves from every cell to `goal`, as an int32 array
+# indexed [x, y], with -1 at cells that can't reach it
+def distanceTransform(open, goal, connectivity=4):
+    width, height = open.shape
+    distance = paddedDistances(open, goal, connectivity)
+    return distance.reshape(width + 2, height + 2)[1:-1, 1:-1]
+
+# The distances from every cell of `board` to one goal, for tiles of
+# priority `priority`, along with a path extractor. It answers the
+# same questions as DistanceField (with every move costing 1), but is
+# built with array operations.
+#
+#   - distance -- An int32 array indexed [x, y] holding the number of
+#   moves from each cell to the goal, or -1 if it can't get there.
+class Wavefront:
+    def __init__(self, board, goal, priority, connectivity=4):
+        self.board        = board
+        self.goal         = tuple(goal)
+        self.priority     = priority
+        self.connectivity = connectivity
+        self.width        = board.width
+        self.height       = board.height
+        self.mask         = board.blockedMask(priority)
+        open = walkable(board, priority)
+        self.padded   = paddedDistances(open, goal, connectivity)
+        self.distance = self.padded.reshape(self.width + 2, self.height + 2)[1:-1, 1:-1]
+        self.moves    = [(dx, dy, dx * (self.height + 2) + dy)
+                         for (dx, dy) in movesFor(connectivity)]
+
+    # Whether the field is still good, i.e., the board's walls haven't
+    # changed since it was built
+    def isCurrent(self):
+        return self.board.blockedMask(self.priority) is self.mask
+
+    # The number of moves from (x,y) to the goal, or None if there is
+    # no path
+    def distanceAt(self, x, y):
+        if (not (0 <= x < self.width and 0 <= y < self.height)):
+            return None
+        d = int(self.distance[x, y])
+        if (d < 0):
+            return None
+        return d
+
+    # A boolean array, indexed [x, y], of the cells that can reach the
+    # goal
+    def reachable(self):
+        return self.distance >= 0
+
+    # A shortest path from (x,y) to the goal, in the form returned by
+    # `PathFinder.findPath`, or False if there is none (including, as
+    # with PathFinder, when (x,y) is the goal)
+    def findPath(self, x, y):
+        if (not (0 <= x < self.width and 0 <= y < self.height)):
+            return False
+        padded = self.padded
+        c = (x + 1) * (self.height + 2) + y + 1
+        d = int(padded[c])
+        if (d <= 0):
+            return False
+        path = [(x, y)]
+        while (d > 0):
+            d -= 1
+            # Step to the first neighbour that is one move closer
+            for (dx, dy, offset) in self.moves:
+                if (padded[c + offset] == d):
+                    c += offset
+                    path.append((dx, dy))
+                    break
+        return path